@@ -2,12 +2,11 @@ import os
 import re
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
 from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain.agents import create_openai_tools_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import AIMessage, HumanMessage
 from datetime import datetime
+from typing import AsyncIterator
 import pytz
 
 # --- 1. Importar as ferramentas da nova estrutura modular ---
@@ -21,11 +20,15 @@ from .tools.data_retrieval_tools import (
 )
 from .tools.analysis_tools import (
     get_asset_analytics,
-    compare_assets
+    compare_assets,
+    screen_technical_signals
 )
 from .tools.notification_tools import (
     notify_developer_of_missing_tool
 )
+from .tool_cache import tool_result_cache
+from .concurrent_executor import ConcurrentAgentExecutor
+from .session_store import session_store
 
 # --- 2. Montagem do Agente ---
 def create_agent_executor():
@@ -35,8 +38,9 @@ def create_agent_executor():
     """
     print("🧠 Inicializando o agente com capacidades analíticas avançadas...")
     
-    # Agrega todas as ferramentas importadas em uma única lista
-    all_tools = [
+    # Agrega todas as ferramentas importadas em uma única lista, com os resultados memoizados
+    # (chamadas repetidas, na mesma execução ou entre sessões, são respondidas pelo cache)
+    all_tools = [tool_result_cache.wrap(t) for t in [
         get_stock_data,
         get_volatility_cone,
         get_market_summary,
@@ -45,8 +49,9 @@ def create_agent_executor():
         list_available_tickers,
         get_asset_analytics,
         compare_assets,
+        screen_technical_signals,
         notify_developer_of_missing_tool
-    ]
+    ]]
     
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
     
@@ -102,7 +107,8 @@ def create_agent_executor():
     
     agent = create_openai_tools_agent(llm, all_tools, prompt)
     
-    agent_executor = AgentExecutor(
+    # Ferramentas pedidas no mesmo passo rodam simultaneamente (backend/concurrent_executor.py)
+    agent_executor = ConcurrentAgentExecutor(
         agent=agent, 
         tools=all_tools, 
         verbose=True,
@@ -113,26 +119,60 @@ def create_agent_executor():
 
 # --- 3. Função Principal de Consulta com Gerenciamento de Histórico ---
 agent_executor = create_agent_executor()
-chat_history_per_session = {}
 
 def query_agent(question: str, session_id: str = "default_user"):
     """
-    Executa uma consulta contra o agente, mantendo um histórico da conversa.
+    Executa uma consulta contra o agente, mantendo um histórico da conversa
+    (limitado por sessão e por orçamento de tokens em backend/session_store.py).
     """
     print(f"❓ Nova pergunta para o agente (Sessão: {session_id}): {question}")
     
-    chat_history = chat_history_per_session.get(session_id, [])
+    chat_history = session_store.history(session_id)
 
     response = agent_executor.invoke({
         "input": question,
         "chat_history": chat_history
     })
     
-    chat_history.extend([
-        HumanMessage(content=question),
-        AIMessage(content=response['output']),
-    ])
-    chat_history_per_session[session_id] = chat_history
+    session_store.append_turn(session_id, question, response['output'])
 
     # Retorna a resposta final, que pode ser um texto ou um JSON para gráficos
     return response['output']
+
+
+# Tamanho máximo da prévia do resultado de cada ferramenta enviada no stream
+TOOL_OUTPUT_PREVIEW_CHARS = 300
+
+
+async def stream_agent(question: str, session_id: str = "default_user") -> AsyncIterator[tuple]:
+    """
+    Versão em streaming de query_agent: gera (evento, dados) à medida que o agente trabalha.
+    'tool-start' e 'tool-end' marcam cada chamada de ferramenta, 'token' traz cada trecho da resposta
+    final assim que o modelo o produz e 'done' traz a resposta completa (já registrada no histórico).
+    """
+    print(f"❓ Nova pergunta para o agente em streaming (Sessão: {session_id}): {question}")
+
+    chat_history = session_store.history(session_id)
+    output = None
+    async for event in agent_executor.astream_events(
+        {"input": question, "chat_history": chat_history}, version="v2"
+    ):
+        kind, data = event["event"], event["data"]
+        if kind == "on_tool_start":
+            yield "tool-start", {"tool": event["name"], "input": data.get("input")}
+        elif kind == "on_tool_end":
+            preview = str(data.get("output"))
+            if len(preview) > TOOL_OUTPUT_PREVIEW_CHARS:
+                preview = preview[:TOOL_OUTPUT_PREVIEW_CHARS] + "…"
+            yield "tool-end", {"tool": event["name"], "output": preview}
+        elif kind == "on_chat_model_stream":
+            # Passos que só pedem ferramentas geram trechos sem texto; apenas o texto da resposta é enviado
+            content = data["chunk"].content
+            if content:
+                yield "token", {"text": content}
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            output = data["output"]["output"]
+
+    session_store.append_turn(session_id, question, output)
+    yield "done", {"answer": output}
+
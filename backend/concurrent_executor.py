@@ -0,0 +1,53 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction
+
+# --- Execução simultânea das ferramentas de um mesmo passo do agente ---
+# Quando o modelo pede várias ferramentas em um único passo (ex: get_asset_analytics para três
+# tickers), o AgentExecutor padrão as executa uma após a outra. Aqui, as chamadas de um mesmo passo
+# são independentes entre si por construção (o modelo as emitiu sem ver nenhum resultado), então são
+# despachadas juntas para um pool limitado e os resultados voltam na ordem em que foram pedidas:
+# o passo leva o tempo da ferramenta mais lenta, e não a soma de todas.
+AGENT_TOOL_WORKERS = int(os.getenv("AGENT_TOOL_WORKERS", "4"))
+
+# Pool compartilhado por todas as execuções, o que limita as chamadas simultâneas do processo inteiro
+_tool_pool = ThreadPoolExecutor(max_workers=AGENT_TOOL_WORKERS, thread_name_prefix="agent-tool")
+_deferred = threading.local()
+
+
+class ConcurrentAgentExecutor(AgentExecutor):
+    """AgentExecutor que executa simultaneamente as chamadas de ferramenta emitidas em um mesmo passo."""
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        steps = super()._iter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager)
+        actions, pending = 0, []
+        while True:
+            # O passo base anuncia todas as ações antes de executá-las; com mais de uma, cada execução
+            # vira uma tarefa no pool (ver _perform_agent_action) em vez de bloquear aqui
+            _deferred.active = actions > 1
+            try:
+                item = next(steps)
+            except StopIteration:
+                break
+            finally:
+                _deferred.active = False
+
+            if isinstance(item, Future):
+                pending.append(item)
+            else:
+                actions += isinstance(item, AgentAction)
+                yield item
+
+        for future in pending:
+            yield future.result()
+
+    def _perform_agent_action(self, *args, **kwargs):
+        if not getattr(_deferred, "active", False) or AGENT_TOOL_WORKERS <= 1:
+            return super()._perform_agent_action(*args, **kwargs)
+        # Copia o contexto (callbacks e rastreamento do LangChain usam contextvars) para a thread do pool
+        context = contextvars.copy_context()
+        return _tool_pool.submit(context.run, super()._perform_agent_action, *args, **kwargs)
@@ -0,0 +1,39 @@
+import os
+import threading
+import time
+
+from .config import supabase
+
+# --- Versão do conjunto de dados ---
+# O ETL (etl/dataset_version.py) grava uma nova versão na tabela 'etl_dataset_version' sempre que
+# termina uma carga. O backend consulta essa linha (uma leitura minúscula) no máximo a cada
+# VERSION_POLL_SECONDS e usa o valor para invalidar caches e ressincronizar o armazenamento local.
+VERSION_TABLE = 'etl_dataset_version'
+VERSION_POLL_SECONDS = int(os.getenv("DATASET_VERSION_POLL_SECONDS", "30"))
+
+_lock = threading.Lock()
+_version = 0
+_checked_at = float('-inf')
+
+
+def current_dataset_version() -> int:
+    """
+    Retorna a versão mais recente publicada pelo ETL.
+    Se a consulta falhar (ex: tabela ainda não criada), mantém a última versão conhecida.
+    """
+    global _version, _checked_at
+
+    with _lock:
+        now = time.monotonic()
+        if now - _checked_at < VERSION_POLL_SECONDS:
+            return _version
+        _checked_at = now
+
+        try:
+            response = supabase.table(VERSION_TABLE).select("version").eq('id', 1).limit(1).execute()
+            if response.data:
+                _version = int(response.data[0]['version'])
+        except Exception as e:
+            print(f"⚠️ Não foi possível consultar a versão dos dados: {e}")
+
+        return _version
@@ -0,0 +1,366 @@
+import json
+import math
+import os
+import threading
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from .market_store import market_store, format_day
+
+# --- Estado incremental dos indicadores ---
+# RSI (Wilder), EMA e MACD são recursivos e SMA/Bollinger são janelas móveis, então basta guardar um
+# pequeno estado por ticker (médias suavizadas e buffers circulares) para atualizar todos os
+# indicadores em O(1) a cada novo candle. Os parâmetros e as sementes (média simples dos primeiros
+# 'n' valores) são os mesmos do motor vetorizado em indicators.py, então os resultados coincidem.
+STATE_DIR = Path(os.getenv("INDICATOR_STATE_DIR", Path(__file__).resolve().parent / "data" / "indicator_state"))
+
+RSI_PERIOD = 14
+SMA_PERIOD = 21
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_PERIOD, BOLLINGER_K = 20, 2.0
+ATR_PERIOD = 14
+
+NAN = float('nan')
+
+
+class _Smoother:
+    """Média exponencial recursiva semeada com a média simples dos primeiros 'window' valores."""
+
+    def __init__(self, window: int, alpha: float):
+        self.window = window
+        self.alpha = alpha
+        self.seed_sum = 0.0
+        self.seen = 0
+        self.value = NAN
+
+    def _next(self, x: float) -> tuple:
+        seen = self.seen + 1
+        if seen < self.window:
+            return self.seed_sum + x, seen, NAN
+        if seen == self.window:
+            return self.seed_sum + x, seen, (self.seed_sum + x) / self.window
+        return self.seed_sum, seen, self.alpha * x + (1 - self.alpha) * self.value
+
+    def update(self, x: float) -> float:
+        self.seed_sum, self.seen, self.value = self._next(x)
+        return self.value
+
+    def peek(self, x: float) -> float:
+        return self._next(x)[2]
+
+    def to_dict(self) -> dict:
+        return {"seed_sum": self.seed_sum, "seen": self.seen, "value": self.value}
+
+    def load(self, data: dict):
+        self.seed_sum, self.seen, self.value = data["seed_sum"], data["seen"], data["value"]
+
+
+class _Window:
+    """Buffer circular com soma e soma dos quadrados correntes, para SMA e desvio padrão móveis."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def _next(self, x: float) -> tuple:
+        total, total_sq = self.total + x, self.total_sq + x * x
+        if len(self.values) == self.window:
+            total -= self.values[0]
+            total_sq -= self.values[0] ** 2
+        return total, total_sq, min(len(self.values) + 1, self.window)
+
+    def update(self, x: float):
+        self.total, self.total_sq, _ = self._next(x)
+        self.values.append(x)
+
+    def stats(self, x: float | None = None) -> tuple:
+        """(média, desvio padrão populacional) da janela atual, ou da janela com 'x' acrescentado."""
+        total, total_sq, size = self._next(x) if x is not None else (self.total, self.total_sq, len(self.values))
+        if size < self.window:
+            return NAN, NAN
+        mean = total / self.window
+        return mean, math.sqrt(max(total_sq / self.window - mean * mean, 0.0))
+
+    def to_dict(self) -> dict:
+        return {"values": list(self.values), "total": self.total, "total_sq": self.total_sq}
+
+    def load(self, data: dict):
+        self.values = deque(data["values"], maxlen=self.window)
+        self.total, self.total_sq = data["total"], data["total_sq"]
+
+
+class IndicatorState:
+    """Estado incremental de RSI, SMA, EMA, MACD, Bandas de Bollinger e ATR de uma série de candles."""
+
+    def __init__(self):
+        self.last_time = None
+        self.last_close = NAN
+        self.last_high = NAN
+        self.last_low = NAN
+        self.gain = _Smoother(RSI_PERIOD, 1.0 / RSI_PERIOD)
+        self.loss = _Smoother(RSI_PERIOD, 1.0 / RSI_PERIOD)
+        self.sma = _Window(SMA_PERIOD)
+        self.ema = _Smoother(SMA_PERIOD, 2.0 / (SMA_PERIOD + 1))
+        self.ema_fast = _Smoother(MACD_FAST, 2.0 / (MACD_FAST + 1))
+        self.ema_slow = _Smoother(MACD_SLOW, 2.0 / (MACD_SLOW + 1))
+        self.macd_signal = _Smoother(MACD_SIGNAL, 2.0 / (MACD_SIGNAL + 1))
+        self.bollinger = _Window(BOLLINGER_PERIOD)
+        self.true_range = _Smoother(ATR_PERIOD, 1.0 / ATR_PERIOD)
+
+    def _fill(self, close: float, high: float, low: float) -> tuple:
+        # Valores ausentes repetem o último conhecido, como no motor vetorizado
+        close = self.last_close if math.isnan(close) else close
+        high = self.last_high if math.isnan(high) else high
+        low = self.last_low if math.isnan(low) else low
+        return close, high, low
+
+    def _true_range(self, close: float, high: float, low: float) -> float:
+        if math.isnan(self.last_close):
+            return high - low
+        return max(high - low, abs(high - self.last_close), abs(low - self.last_close))
+
+    def update(self, timestamp, close: float, high: float = NAN, low: float = NAN):
+        """Incorpora um candle fechado. Custo O(1)."""
+        close, high, low = self._fill(close, high, low)
+        if math.isnan(close):
+            return
+        high = close if math.isnan(high) else high
+        low = close if math.isnan(low) else low
+
+        if not math.isnan(self.last_close):
+            delta = close - self.last_close
+            self.gain.update(max(delta, 0.0))
+            self.loss.update(max(-delta, 0.0))
+        self.sma.update(close)
+        self.ema.update(close)
+        fast, slow = self.ema_fast.update(close), self.ema_slow.update(close)
+        if not math.isnan(slow):
+            self.macd_signal.update(fast - slow)
+        self.bollinger.update(close)
+        self.true_range.update(self._true_range(close, high, low))
+
+        self.last_time = timestamp
+        self.last_close, self.last_high, self.last_low = close, high, low
+
+    def values(self) -> dict:
+        """Valores atuais dos indicadores, no mesmo formato de IndicatorSnapshot.latest()."""
+        return self._values(
+            close=self.last_close,
+            avg_gain=self.gain.value,
+            avg_loss=self.loss.value,
+            sma=self.sma.stats()[0],
+            ema=self.ema.value,
+            fast=self.ema_fast.value,
+            slow=self.ema_slow.value,
+            signal=self.macd_signal.value,
+            bollinger=self.bollinger.stats(),
+            atr=self.true_range.value,
+        )
+
+    def peek(self, close: float, high: float = NAN, low: float = NAN) -> dict:
+        """
+        Valores dos indicadores como se um candle ainda aberto (ex: o minuto corrente) fechasse em 'close',
+        sem alterar o estado. Custo O(1).
+        """
+        close, high, low = self._fill(close, high, low)
+        if math.isnan(close):
+            return self.values()
+        high = close if math.isnan(high) else high
+        low = close if math.isnan(low) else low
+
+        delta = close - self.last_close if not math.isnan(self.last_close) else NAN
+        fast, slow = self.ema_fast.peek(close), self.ema_slow.peek(close)
+        return self._values(
+            close=close,
+            avg_gain=self.gain.peek(max(delta, 0.0)) if not math.isnan(delta) else self.gain.value,
+            avg_loss=self.loss.peek(max(-delta, 0.0)) if not math.isnan(delta) else self.loss.value,
+            sma=self.sma.stats(close)[0],
+            ema=self.ema.peek(close),
+            fast=fast,
+            slow=slow,
+            signal=self.macd_signal.peek(fast - slow) if not math.isnan(slow) else self.macd_signal.value,
+            bollinger=self.bollinger.stats(close),
+            atr=self.true_range.peek(self._true_range(close, high, low)),
+        )
+
+    @staticmethod
+    def _values(close, avg_gain, avg_loss, sma, ema, fast, slow, signal, bollinger, atr) -> dict:
+        if math.isnan(avg_loss) or math.isnan(avg_gain):
+            rsi = NAN
+        elif avg_loss == 0:
+            # Série parada (sem ganhos nem perdas) é neutra, não sobrecomprada
+            rsi = 100.0 if avg_gain > 0 else 50.0
+        else:
+            rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        macd = fast - slow
+        middle, std = bollinger
+        return {
+            'close': close,
+            'rsi': rsi,
+            'sma': sma,
+            'ema': ema,
+            'atr': atr,
+            'macd': macd,
+            'macd_signal': signal,
+            'macd_hist': macd - signal,
+            'bb_lower': middle - BOLLINGER_K * std,
+            'bb_middle': middle,
+            'bb_upper': middle + BOLLINGER_K * std,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "last_time": self.last_time,
+            "last": [self.last_close, self.last_high, self.last_low],
+            "smoothers": {name: getattr(self, name).to_dict() for name in
+                          ('gain', 'loss', 'ema', 'ema_fast', 'ema_slow', 'macd_signal', 'true_range')},
+            "windows": {name: getattr(self, name).to_dict() for name in ('sma', 'bollinger')},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IndicatorState":
+        state = cls()
+        state.last_time = data["last_time"]
+        state.last_close, state.last_high, state.last_low = data["last"]
+        for name, values in data["smoothers"].items():
+            getattr(state, name).load(values)
+        for name, values in data["windows"].items():
+            getattr(state, name).load(values)
+        return state
+
+
+class DailyIndicatorStates:
+    """
+    Estado diário por ticker, persistido em disco e mantido em dia com o armazenamento local.
+    Quando um novo snapshot chega, cada ticker consome apenas os pregões posteriores ao último já
+    processado; se o histórico anterior tiver sido revisado, o estado daquele ticker é reconstruído.
+    Os preços são os ajustados por proventos: um dividendo novo muda o fechamento ajustado do último
+    pregão processado, o que também provoca a reconstrução.
+    Cada ticker tem seu próprio arquivo (directory/<TICKER>.json), lido na primeira consulta ao ticker
+    e regravado só quando o estado dele muda. O arquivo único de versões anteriores (daily.json, ao
+    lado do diretório) é dividido nos arquivos por ticker na primeira consulta e depois removido.
+    """
+
+    def __init__(self, directory: Path = STATE_DIR / "daily"):
+        self.directory = Path(directory)
+        self._states: dict[str, IndicatorState] = {}
+        self._synced_version: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._loaded: set[str] = set()
+        self._migrated = False
+
+    def _path(self, ticker: str) -> Path:
+        return self.directory / f"{ticker}.json"
+
+    def _migrate_legacy(self):
+        self._migrated = True
+        legacy_path = self.directory.with_suffix(".json")
+        if not legacy_path.exists():
+            return
+        try:
+            data = json.loads(legacy_path.read_text())
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for ticker, state in data.items():
+                path = self._path(ticker)
+                if not path.exists():
+                    tmp_path = path.with_suffix(".tmp")
+                    tmp_path.write_text(json.dumps(state))
+                    os.replace(tmp_path, path)
+            print(f"📦 Estado de indicadores migrado para um arquivo por ticker ({len(data)} tickers).")
+        except Exception as e:
+            # Os estados que não puderem ser migrados são reconstruídos a partir do armazenamento local
+            print(f"⚠️ Não foi possível migrar o estado de indicadores antigo, será reconstruído: {e}")
+        legacy_path.unlink(missing_ok=True)
+
+    def _load(self, ticker: str):
+        self._loaded.add(ticker)
+        path = self._path(ticker)
+        if not path.exists():
+            return
+        try:
+            self._states[ticker] = IndicatorState.from_dict(json.loads(path.read_text()))
+        except Exception as e:
+            print(f"⚠️ Estado de indicadores de {ticker} corrompido, será reconstruído: {e}")
+
+    def _save(self, ticker: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(ticker)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._states[ticker].to_dict()))
+        os.replace(tmp_path, path)
+
+    def _catch_up(self, ticker: str, series) -> bool:
+        """Aplica os pregões novos ao estado do ticker. Retorna True se o estado mudou."""
+        state = self._states.get(ticker)
+        start = 0
+        if state is not None and state.last_time is not None:
+            i = int(np.searchsorted(series.date, np.datetime64(state.last_time, 'D')))
+            unchanged = i < len(series) and format_day(series.date[i]) == state.last_time and \
+                math.isclose(float(series['close'][i]), state.last_close, rel_tol=1e-9)
+            if unchanged:
+                start = i + 1
+            else:
+                state = None
+
+        if state is None:
+            state = IndicatorState()
+            self._states[ticker] = state
+            start = 0
+
+        if start >= len(series):
+            return False
+
+        dates = np.datetime_as_string(series.date[start:], unit='D')
+        closes, highs, lows = (series[name][start:] for name in ('close', 'high', 'low'))
+        for date, close, high, low in zip(dates, closes, highs, lows):
+            state.update(str(date), float(close), float(high), float(low))
+        return True
+
+    def get(self, ticker: str) -> IndicatorState | None:
+        """Retorna o estado do ticker atualizado até o snapshot atual do armazenamento local."""
+        version = market_store.version
+        with self._lock:
+            if not self._migrated:
+                self._migrate_legacy()
+            if ticker not in self._loaded:
+                self._load(ticker)
+            if self._synced_version.get(ticker) != version:
+                series = market_store.series(ticker)
+                if series is None or not len(series):
+                    return None
+                if self._catch_up(ticker, series.adjusted()):
+                    self._save(ticker)
+                self._synced_version[ticker] = version
+            return self._states.get(ticker)
+
+
+class IntradayIndicatorStates:
+    """Estado por ticker para candles de 1 minuto, reiniciado a cada pregão e mantido em memória."""
+
+    def __init__(self):
+        self._states: dict[tuple, IndicatorState] = {}
+        self._lock = threading.Lock()
+
+    def state(self, ticker: str, session: str) -> IndicatorState:
+        with self._lock:
+            for key in [k for k in self._states if k[0] == ticker and k[1] != session]:
+                del self._states[key]
+            return self._states.setdefault((ticker, session), IndicatorState())
+
+
+daily_indicator_states = DailyIndicatorStates()
+intraday_indicator_states = IntradayIndicatorStates()
+
+
+def get_daily_indicators(ticker: str) -> dict | None:
+    """Leitura O(1) dos indicadores diários mais recentes de um ticker (parâmetros padrão)."""
+    state = daily_indicator_states.get(ticker)
+    if state is None or state.last_time is None:
+        return None
+    values = state.values()
+    values['date'] = state.last_time
+    return values
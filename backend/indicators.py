@@ -0,0 +1,198 @@
+import numpy as np
+
+from .market_store import market_store, format_day
+from .query_cache import query_cache
+
+# --- Motor vetorizado de indicadores técnicos ---
+# Todos os tickers são empilhados em uma matriz 2-D (tickers x pregões) alinhada à direita: a última
+# coluna é o pregão mais recente de cada ticker e históricos mais curtos recebem NaN à esquerda.
+# Assim cada indicador é calculado sobre a sequência de pregões do próprio ticker, em uma única
+# passada para o universo inteiro. As funções abaixo aceitam qualquer matriz nesse formato.
+
+
+def _valid_counts(values: np.ndarray) -> np.ndarray:
+    """Quantidade acumulada de valores válidos (não NaN) por linha, até cada coluna."""
+    return np.cumsum(~np.isnan(values), axis=1)
+
+
+def _window_sum(values: np.ndarray, window: int) -> tuple:
+    """Soma móvel de 'window' colunas e quantos valores válidos entraram em cada janela."""
+    filled = np.nan_to_num(values)
+    cum = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(filled, axis=1, out=cum[:, 1:])
+    counts = np.zeros_like(cum)
+    counts[:, 1:] = _valid_counts(values)
+
+    total = np.full(values.shape, np.nan)
+    count = np.zeros(values.shape)
+    if values.shape[1] >= window:
+        total[:, window - 1:] = cum[:, window:] - cum[:, :-window]
+        count[:, window - 1:] = counts[:, window:] - counts[:, :-window]
+    return total, count
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """Média móvel simples; NaN enquanto a janela não estiver completa."""
+    total, count = _window_sum(values, window)
+    return np.where(count == window, total / window, np.nan)
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Desvio padrão populacional móvel (ddof=0), como nas Bandas de Bollinger."""
+    total, count = _window_sum(values, window)
+    total_sq, _ = _window_sum(values ** 2, window)
+    with np.errstate(invalid='ignore'):
+        variance = total_sq / window - (total / window) ** 2
+    return np.where(count == window, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+
+def _smooth(values: np.ndarray, window: int, alpha: float) -> np.ndarray:
+    """
+    Suavização exponencial recursiva vetorizada entre tickers.
+    Cada linha é semeada com a média simples dos seus primeiros 'window' valores válidos e segue
+    com s[t] = alpha * x[t] + (1 - alpha) * s[t-1]. Valores NaN após a semente repetem o valor anterior.
+    """
+    seed = sma(values, window)
+    counts = _valid_counts(values)
+    seed_col = np.argmax(counts >= window, axis=1)
+    has_seed = counts[:, -1] >= window if values.shape[1] else np.zeros(values.shape[0], dtype=bool)
+
+    out = np.full(values.shape, np.nan)
+    state = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        seeding = has_seed & (seed_col == t)
+        running = has_seed & (seed_col < t)
+        state = np.where(seeding, seed[:, t], state)
+        state = np.where(running & ~np.isnan(x), alpha * x + (1 - alpha) * state, state)
+        out[:, t] = np.where(seeding | running, state, np.nan)
+    return out
+
+
+def ema(values: np.ndarray, window: int) -> np.ndarray:
+    """Média móvel exponencial (alpha = 2 / (n + 1)), semeada com a SMA inicial."""
+    return _smooth(values, window, 2.0 / (window + 1))
+
+
+def wilder(values: np.ndarray, window: int) -> np.ndarray:
+    """Suavização de Wilder (alpha = 1 / n), usada no RSI e no ATR."""
+    return _smooth(values, window, 1.0 / window)
+
+
+def _previous(values: np.ndarray) -> np.ndarray:
+    shifted = np.full(values.shape, np.nan)
+    shifted[:, 1:] = values[:, :-1]
+    return shifted
+
+
+def rsi(close: np.ndarray, window: int = 14) -> np.ndarray:
+    """
+    Índice de Força Relativa com médias de ganhos e perdas suavizadas pelo método de Wilder.
+    Sem perdas, é 100 se houve ganhos e 50 (neutro) se a série ficou parada.
+    """
+    delta = close - _previous(close)
+    average_gain = wilder(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0)), window)
+    average_loss = wilder(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0)), window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = 100.0 - 100.0 / (1.0 + average_gain / average_loss)
+    no_loss = np.where(np.isnan(average_gain), np.nan, np.where(average_gain > 0, 100.0, 50.0))
+    return np.where(average_loss == 0, no_loss, result)
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> tuple:
+    """Retorna (linha MACD, linha de sinal, histograma)."""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close: np.ndarray, window: int = 20, k: float = 2.0) -> tuple:
+    """Retorna (banda inferior, média, banda superior)."""
+    middle = sma(close, window)
+    width = k * rolling_std(close, window)
+    return middle - width, middle, middle + width
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 14) -> np.ndarray:
+    """Average True Range com suavização de Wilder."""
+    previous_close = _previous(close)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+    return wilder(true_range, window)
+
+
+# --- Universo alinhado e snapshot de indicadores ---
+
+def build_universe(all_series: dict) -> dict:
+    """
+    Empilha as séries do armazenamento local, com preços ajustados por proventos, em matrizes
+    (tickers x pregões) alinhadas à direita.
+    """
+    tickers = sorted(t for t, s in all_series.items() if len(s))
+    width = max((len(all_series[t]) for t in tickers), default=0)
+
+    universe = {name: np.full((len(tickers), width), np.nan) for name in ('high', 'low', 'close')}
+    universe['date'] = np.full((len(tickers), width), np.datetime64('NaT'), dtype='datetime64[D]')
+    for row, ticker in enumerate(tickers):
+        s = all_series[ticker].adjusted()
+        universe['date'][row, width - len(s):] = s.date
+        for name in ('high', 'low', 'close'):
+            universe[name][row, width - len(s):] = s[name]
+
+    # Preços ausentes no meio do histórico repetem o último valor conhecido
+    positions = np.arange(width)
+    for name in ('high', 'low', 'close'):
+        values = universe[name]
+        last_valid = np.maximum.accumulate(np.where(np.isnan(values), 0, positions), axis=1)
+        universe[name] = np.take_along_axis(values, last_valid, axis=1)
+
+    universe['tickers'] = tickers
+    return universe
+
+
+class IndicatorSnapshot:
+    """Resultado de uma passada do motor sobre o universo inteiro."""
+
+    def __init__(self, universe: dict, rsi_period: int, sma_period: int):
+        close, high, low = universe['close'], universe['high'], universe['low']
+        self.tickers = universe['tickers']
+        self.rsi_period = rsi_period
+        self.sma_period = sma_period
+        self._row = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.date = universe['date']
+        self.values = {
+            'close': close,
+            'rsi': rsi(close, rsi_period),
+            'sma': sma(close, sma_period),
+            'ema': ema(close, sma_period),
+            'atr': atr(high, low, close),
+        }
+        self.values['macd'], self.values['macd_signal'], self.values['macd_hist'] = macd(close)
+        self.values['bb_lower'], self.values['bb_middle'], self.values['bb_upper'] = bollinger(close)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(v.nbytes for v in self.values.values()) + self.date.nbytes
+
+    def latest(self, ticker: str) -> dict | None:
+        """Valores mais recentes de todos os indicadores de um ticker (None se o ticker não existir)."""
+        row = self._row.get(ticker)
+        if row is None or not self.date.shape[1]:
+            return None
+        latest = {name: float(values[row, -1]) for name, values in self.values.items()}
+        latest['date'] = format_day(self.date[row, -1])
+        return latest
+
+    def column(self, name: str) -> dict:
+        """Valor mais recente de um indicador para todos os tickers."""
+        return {ticker: float(self.values[name][row, -1]) for ticker, row in self._row.items()}
+
+
+def get_indicator_snapshot(rsi_period: int = 14, sma_period: int = 21) -> IndicatorSnapshot:
+    """
+    Retorna os indicadores do universo para o snapshot atual do armazenamento local.
+    O cálculo é feito uma vez por combinação de parâmetros e versão dos dados.
+    """
+    return query_cache.get_or_compute(
+        ('indicators', market_store.version, rsi_period, sma_period),
+        lambda: IndicatorSnapshot(build_universe(market_store.all_series()), rsi_period, sma_period),
+    )
@@ -1,72 +1,444 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from typing import AsyncIterator
+
 import yfinance as yf
 import pandas as pd
-import re
 import numpy as np # Import numpy para lidar com 'nan'
 
+from .indicator_state import intraday_indicator_states
+from .query_cache import query_cache
+from .intraday_store import intraday_store, minute_of_day, ROLLUP_INTERVALS
+
+# --- Feed intraday compartilhado ---
+# Cada ticker acompanhado tem um único poller em segundo plano que busca no yfinance apenas os
+# candles de 1 minuto a partir do último recebido e mantém as somas correntes ΣTP·V e ΣV, de modo que
+# o VWAP é atualizado incrementalmente. Todos os clientes que olham o mesmo ticker leem a mesma série
+# em memória; o poller para sozinho depois de um tempo sem leituras.
+POLL_INTERVAL_SECONDS = int(os.getenv("INTRADAY_POLL_SECONDS", "15"))
+IDLE_TIMEOUT_SECONDS = int(os.getenv("INTRADAY_IDLE_SECONDS", "300"))
+
+
+class IntradaySeries:
+    """
+    Candles de 1 minuto do pregão corrente com VWAP acumulado.
+    Os candles fechados entram nas somas correntes; o último candle (ainda em formação) fica à parte
+    e é substituído a cada atualização, sem precisar recalcular nada.
+    """
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.session = None
+        self.labels, self.price, self.vwap = [], [], []
+        self.last_closed = None
+        self.sum_tpv = 0.0
+        self.sum_volume = 0.0
+        self.provisional = None
+        self.indicators = None
+        self.tz = None
+
+    def _vwap(self, typical_price: float, volume: float) -> float:
+        sum_tpv, sum_volume = self.sum_tpv + typical_price * volume, self.sum_volume + volume
+        # Sem volume acumulado (ex: leilão de abertura), o VWAP é o próprio preço típico
+        return sum_tpv / sum_volume if sum_volume > 0 else typical_price
+
+    def _reset(self, session: str):
+        self.__init__(self.ticker)
+        self.session = session
+        self.indicators = intraday_indicator_states.state(self.ticker, session)
+
+    def _persist(self, hist: pd.DataFrame, stamps: pd.Index):
+        """Grava no armazenamento local os candles novos ou alterados (inclusive o que está em formação)."""
+        new = np.asarray(stamps > self.last_closed) if self.last_closed is not None else np.ones(len(stamps), dtype=bool)
+        if not new.any():
+            return
+        columns = {name.lower(): hist[name].to_numpy(dtype=float)[new] for name in ('Open', 'High', 'Low', 'Close', 'Volume')}
+        try:
+            intraday_store.write(self.ticker, self.session, minute_of_day(list(stamps[new])), columns)
+        except Exception as e:
+            print(f"⚠️ Não foi possível gravar os candles de {self.ticker} no armazenamento intraday: {e}")
+
+    def apply(self, hist: pd.DataFrame) -> bool:
+        """Incorpora candles recém-buscados (o último é considerado ainda em formação). Retorna True se algo mudou."""
+        hist = hist.dropna(subset=['Close'])
+        if hist.empty:
+            return False
+        before = (self.session, self.last_closed, self.provisional)
+        session = hist.index[-1].strftime('%Y-%m-%d')
+        if session != self.session:
+            self._reset(session)
+            hist = hist[hist.index.strftime('%Y-%m-%d') == session]
+
+        # Fuso da bolsa: os rótulos são horários locais e a próxima busca parte deles
+        self.tz = hist.index.tz
+        stamps = hist.index.strftime('%Y-%m-%dT%H:%M')
+        self._persist(hist, stamps)
+        typical = ((hist['High'] + hist['Low'] + hist['Close']) / 3).fillna(hist['Close']).to_numpy()
+        volume = hist['Volume'].fillna(0).to_numpy(dtype=float)
+        close, high, low = (hist[c].to_numpy(dtype=float) for c in ('Close', 'High', 'Low'))
+
+        for i, stamp in enumerate(stamps):
+            if self.last_closed is not None and stamp <= self.last_closed:
+                continue
+            bar = (stamp, close[i], high[i], low[i], typical[i], volume[i])
+            if i == len(stamps) - 1:
+                self.provisional = bar
+                continue
+            self.labels.append(stamp[-5:])
+            self.price.append(close[i])
+            self.vwap.append(self._vwap(typical[i], volume[i]))
+            self.sum_tpv += typical[i] * volume[i]
+            self.sum_volume += volume[i]
+            self.indicators.update(stamp, close[i], high[i], low[i])
+            self.last_closed = stamp
+        if self.provisional is not None and self.last_closed is not None and self.provisional[0] <= self.last_closed:
+            self.provisional = None
+        return before != (self.session, self.last_closed, self.provisional)
+
+    def snapshot(self, start: int = 0) -> dict:
+        """Série a partir do candle 'start' (0 = o dia inteiro), incluindo o candle em formação."""
+        labels, price, vwap = self.labels[start:], self.price[start:], self.vwap[start:]
+        if self.provisional is not None:
+            stamp, close, high, low, typical, volume = self.provisional
+            labels.append(stamp[-5:])
+            price.append(close)
+            vwap.append(self._vwap(typical, volume))
+            rsi = self.indicators.peek(close, high, low)['rsi']
+        else:
+            rsi = self.indicators.values()['rsi'] if self.indicators else np.nan
+        return {
+            'labels': labels,
+            'price': price,
+            'vwap': vwap,
+            'rsi': None if np.isnan(rsi) else round(rsi, 2)
+        }
+
+
+class IntradayPoller:
+    """Poller em segundo plano de um ticker, compartilhado por todos os clientes."""
+
+    def __init__(self, ticker: str, on_stop):
+        self.ticker = ticker
+        self.series = IntradaySeries(ticker)
+        self.error = None
+        self.revision = 0
+        self.last_read = time.monotonic()
+        self._lock = threading.Lock()
+        self._on_stop = on_stop
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        # Sinalizado quando a primeira busca termina (com ou sem sucesso)
+        self.ready = threading.Event()
+
+    def _fetch(self) -> pd.DataFrame:
+        stock = yf.Ticker(self.ticker)
+        if self.series.last_closed is None:
+            # Primeira busca: o dia inteiro
+            return stock.history(period="1d", interval="1m")
+        # Depois, apenas a partir do último candle fechado (o seguinte pode ter sido alterado).
+        # O yfinance só aceita 'start' em texto no formato 'AAAA-MM-DD'; com hora, vai como Timestamp no fuso da bolsa
+        start = pd.Timestamp(self.series.last_closed).tz_localize(self.series.tz) + pd.Timedelta(minutes=1)
+        return stock.history(start=start, interval="1m")
+
+    def poll(self):
+        try:
+            hist = self._fetch()
+            with self._lock:
+                # A recuperação de uma falha também é uma mudança para os clientes (o aviso some)
+                if self.series.apply(hist) or self.error is not None:
+                    self.revision += 1
+                self.error = None
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar dados intraday de {self.ticker}: {e}")
+            with self._lock:
+                if self.error != str(e):
+                    self.revision += 1
+                self.error = str(e)
+
+    def start(self):
+        """Faz a primeira busca (bloqueante) e inicia as atualizações em segundo plano."""
+        try:
+            self.poll()
+        finally:
+            self.ready.set()
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(POLL_INTERVAL_SECONDS):
+            if time.monotonic() - self.last_read > IDLE_TIMEOUT_SECONDS:
+                print(f"💤 Parando o poller intraday de {self.ticker} por inatividade.")
+                break
+            self.poll()
+        self._on_stop(self)
+
+    def stop(self):
+        self._stop.set()
+
+    def touch(self):
+        """Marca o poller como em uso (clientes de streaming chamam a cada verificação)."""
+        self.last_read = time.monotonic()
+
+    def _error(self) -> dict | None:
+        if not self.series.labels and self.series.provisional is None:
+            if self.error:
+                return {"error": f"Ocorreu um erro ao buscar os dados intraday: {self.error}"}
+            return {"error": f"Não foram encontrados dados intraday para {self.ticker}. O mercado pode estar fechado."}
+        return None
+
+    def _with_warning(self, data: dict) -> dict:
+        # Com a série já carregada, uma falha na última atualização não derruba o gráfico, mas é avisada
+        if self.error:
+            data['warning'] = f"Não foi possível atualizar os dados intraday; exibindo os últimos recebidos. Erro: {self.error}"
+        return data
+
+    def read(self) -> dict:
+        self.last_read = time.monotonic()
+        with self._lock:
+            return self._error() or self._with_warning(self.series.snapshot())
+
+    def read_since(self, session: str | None, sent: int) -> tuple:
+        """
+        Leitura incremental para clientes de streaming que já têm 'sent' candles fechados do pregão 'session'.
+        Retorna (tipo, dados, sessão, candles fechados enviados), onde tipo é 'snapshot', 'delta' ou 'error'.
+        Um delta traz só os candles a partir de 'start' (novos ou alterados), que substituem os do cliente.
+        """
+        self.last_read = time.monotonic()
+        with self._lock:
+            error = self._error()
+            if error:
+                return 'error', error, None, 0
+            series = self.series
+            closed = len(series.labels)
+            if session != series.session or sent > closed:
+                return 'snapshot', self._with_warning(series.snapshot()), series.session, closed
+            delta = self._with_warning(series.snapshot(start=sent))
+            delta['start'] = sent
+            return 'delta', delta, series.session, closed
+
+
+class IntradayFeed:
+    """Registro dos pollers ativos: cria um por ticker na primeira leitura e o remove quando para."""
+
+    def __init__(self):
+        self._pollers: dict[str, IntradayPoller] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, poller: IntradayPoller):
+        with self._lock:
+            if self._pollers.get(poller.ticker) is poller:
+                del self._pollers[poller.ticker]
+
+    def poller(self, ticker: str) -> IntradayPoller:
+        with self._lock:
+            poller = self._pollers.get(ticker)
+            created = poller is None
+            if created:
+                print(f"Iniciando o poller intraday para o ticker: {ticker}")
+                poller = IntradayPoller(ticker, self._remove)
+                self._pollers[ticker] = poller
+        # A primeira busca roda fora do lock (os outros tickers não esperam por ela); clientes
+        # simultâneos do mesmo ticker esperam por ela em vez de duplicá-la
+        if created:
+            poller.start()
+        else:
+            poller.ready.wait()
+        return poller
+
+    def find(self, ticker: str) -> IntradayPoller | None:
+        """Poller ativo e já carregado do ticker, sem criar um novo nem esperar a primeira busca."""
+        with self._lock:
+            poller = self._pollers.get(ticker)
+        return poller if poller is not None and poller.ready.is_set() else None
+
+    def active_tickers(self) -> list:
+        with self._lock:
+            return sorted(self._pollers)
+
+
+intraday_feed = IntradayFeed()
+
+
+def clean_intraday_ticker(ticker: str) -> str | None:
+    """Normaliza o ticker (ex: "petr4.sa" -> "PETR4.SA"); None se o formato for inválido."""
+    match = re.search(r"([A-Z0-9]+\.SA)", str(ticker).upper())
+    return match.group(1) if match else None
+
+
 def get_intraday_data_with_vwap(ticker: str):
     """
-    Busca dados intraday (intervalo de 1 minuto) para um ticker e calcula o VWAP.
-    
+    Retorna os dados intraday (intervalo de 1 minuto) e o VWAP de um ticker a partir do feed compartilhado.
+
     Args:
         ticker (str): O código do ativo (ex: "PETR4.SA").
-        
+
     Returns:
         dict: Um dicionário contendo os dados do gráfico ou uma mensagem de erro.
     """
-    print(f"Buscando dados intraday para o ticker: {ticker}")
+    cleaned_ticker = clean_intraday_ticker(ticker)
+    if not cleaned_ticker:
+        return {"error": f"Ticker inválido: {ticker}. O formato deve ser como 'PETR4.SA'."}
 
-    match = re.search(r"([A-Z0-9]+\.SA)", str(ticker).upper())
-    if not match:
+    return intraday_feed.poller(cleaned_ticker).read()
+
+
+def get_intraday_bars(ticker: str, interval: int = 5, session: str | None = None) -> dict:
+    """
+    Candles de 'interval' minutos (OHLCV) e VWAP do pregão a partir do armazenamento local de 1 minuto.
+    Sem 'session', usa o pregão mais recente; o pregão corrente é mantido em dia pelo poller do ticker.
+    """
+    cleaned_ticker = clean_intraday_ticker(ticker)
+    if not cleaned_ticker:
         return {"error": f"Ticker inválido: {ticker}. O formato deve ser como 'PETR4.SA'."}
-    cleaned_ticker = match.group(1)
+    if interval not in ROLLUP_INTERVALS:
+        return {"error": f"Intervalo inválido: {interval}. Use um destes: {', '.join(map(str, ROLLUP_INTERVALS))} minutos."}
 
-    try:
-        stock = yf.Ticker(cleaned_ticker)
-        # Busca dados do dia atual ('1d') com intervalo de 1 minuto ('1m')
-        hist = stock.history(period="1d", interval="1m")
+    if session is None:
+        # Mantém o pregão corrente atualizado (o poller só busca no yfinance os candles novos)
+        intraday_feed.poller(cleaned_ticker).touch()
 
-        if hist.empty:
-            return {"error": f"Não foram encontrados dados intraday para {cleaned_ticker}. O mercado pode estar fechado."}
-
-        # Cálculo do VWAP (Volume Weighted Average Price)
-        hist['Typical Price'] = (hist['High'] + hist['Low'] + hist['Close']) / 3
-        hist['TP x Volume'] = hist['Typical Price'] * hist['Volume']
-        hist['Cumulative TP x Volume'] = hist['TP x Volume'].cumsum()
-        hist['Cumulative Volume'] = hist['Volume'].cumsum()
-        hist['VWAP'] = hist['Cumulative TP x Volume'] / hist['Cumulative Volume']
-
-        # --- CORREÇÃO: Limpar valores inválidos antes de enviar ---
-        # Substitui qualquer 'nan' ou infinito por None, que é compatível com JSON (vira 'null')
-        hist.replace([np.inf, -np.inf, np.nan], None, inplace=True)
-        # Se algum 'None' permanecer após a limpeza, preenchemos com o valor anterior para não quebrar o gráfico
-        hist.ffill(inplace=True)
-        # E se o primeiro valor for None, preenchemos com o próximo
-        hist.bfill(inplace=True)
-
-        # Opcional: Adicionar a configuração para silenciar explicitamente futuros avisos do pandas
-        # Isso pode ser útil se outras operações no futuro gerarem avisos semelhantes.
-        pd.set_option('future.no_silent_downcasting', True)
-
-        # Preparar dados para o frontend
-        hist.reset_index(inplace=True)
-        
-        # Formatar 'Datetime' para string para evitar problemas de serialização JSON
-        hist['Datetime'] = hist['Datetime'].dt.strftime('%H:%M')
-
-        chart_data = {
-            'labels': hist['Datetime'].tolist(),
-            'price': hist['Close'].tolist(),
-            'vwap': hist['VWAP'].tolist()
-        }
-        
-        return chart_data
+    bars = intraday_store.rollup(cleaned_ticker, interval, session)
+    if bars is None:
+        return {"error": f"Não há candles intraday armazenados para {cleaned_ticker}" + (f" no pregão {session}." if session else ".")}
+    bars['sessions'] = intraday_store.sessions(cleaned_ticker)
+    return bars
+
+
+# --- Watchlist: vários tickers em um único download ---
+WATCHLIST_MAX_TICKERS = int(os.getenv("WATCHLIST_MAX_TICKERS", "50"))
+
+
+def _stacked_download(tickers: list) -> tuple:
+    """
+    Um único yf.download agrupado para todos os tickers. Retorna (índice de horários, tickers com dados,
+    dict de matrizes (candles x tickers) para High, Low, Close e Volume).
+    """
+    hist = yf.download(tickers, period="1d", interval="1m", group_by="column", auto_adjust=False,
+                       progress=False, threads=True, multi_level_index=True)
+    if hist.empty:
+        return hist.index, [], {}
+    found = [t for t in tickers if t in hist['Close'].columns and hist['Close'][t].notna().any()]
+    fields = {name: hist[name][found].to_numpy(dtype=float) for name in ('High', 'Low', 'Close', 'Volume')}
+    return hist.index, found, fields
+
+
+def _json_values(values: np.ndarray) -> list:
+    return [None if np.isnan(v) else round(float(v), 4) for v in values]
 
+
+def _build_watchlist(tickers: list) -> dict:
+    index, found, fields = _stacked_download(tickers)
+    missing = [t for t in tickers if t not in found]
+    if not found:
+        return {'labels': [], 'tickers': {}, 'missing': missing}
+
+    # VWAP de todos os tickers em uma passada sobre as matrizes empilhadas
+    close = fields['Close']
+    typical = (fields['High'] + fields['Low'] + close) / 3
+    volume = np.nan_to_num(fields['Volume'])
+    cum_tpv = np.cumsum(np.nan_to_num(typical) * volume, axis=0)
+    cum_volume = np.cumsum(np.where(np.isnan(typical), 0.0, volume), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = np.where(cum_volume > 0, cum_tpv / cum_volume, np.nan)
+
+    # Último valor válido de cada ticker (os tickers podem ter o último candle em minutos diferentes)
+    has_close = ~np.isnan(close)
+    last_row = len(close) - 1 - np.argmax(has_close[::-1], axis=0)
+    columns = np.arange(len(found))
+    last_close, last_vwap = close[last_row, columns], vwap[last_row, columns]
+    first_close = close[np.argmax(has_close, axis=0), columns]
+
+    return {
+        'labels': list(index.strftime('%H:%M')),
+        'tickers': {
+            ticker: {
+                'price': _json_values(close[:, i]),
+                'vwap': _json_values(vwap[:, i]),
+                'last': _json_values(last_close[i:i + 1])[0],
+                'last_vwap': _json_values(last_vwap[i:i + 1])[0],
+                'change_pct': _json_values((last_close[i:i + 1] / first_close[i:i + 1] - 1) * 100)[0],
+            }
+            for i, ticker in enumerate(found)
+        },
+        'missing': missing,
+    }
+
+
+def get_watchlist_intraday(tickers: list) -> dict:
+    """
+    Dados intraday (1 minuto) e VWAP de uma lista de tickers, com um único download agrupado no yfinance.
+    Listas iguais pedidas dentro do mesmo intervalo de atualização do feed compartilham o mesmo download.
+    """
+    cleaned_tickers = []
+    for ticker in tickers:
+        cleaned = clean_intraday_ticker(ticker)
+        if not cleaned:
+            return {"error": f"Ticker inválido: {ticker}. O formato deve ser como 'PETR4.SA'."}
+        if cleaned not in cleaned_tickers:
+            cleaned_tickers.append(cleaned)
+    if not cleaned_tickers:
+        return {"error": "Informe ao menos um ticker."}
+    if len(cleaned_tickers) > WATCHLIST_MAX_TICKERS:
+        return {"error": f"A watchlist aceita no máximo {WATCHLIST_MAX_TICKERS} tickers."}
+
+    print(f"Buscando dados intraday da watchlist: {', '.join(cleaned_tickers)}")
+    bucket = int(time.time() // POLL_INTERVAL_SECONDS)
+    try:
+        return query_cache.get_or_compute(
+            ('watchlist_intraday', tuple(sorted(cleaned_tickers)), bucket),
+            lambda: _build_watchlist(sorted(cleaned_tickers)),
+        )
     except Exception as e:
-        print(f"Erro ao buscar dados intraday: {e}")
+        print(f"Erro ao buscar dados intraday da watchlist: {e}")
         return {"error": f"Ocorreu um erro ao buscar os dados intraday: {e}"}
 
+
+# --- Streaming (Server-Sent Events) ---
+STREAM_CHECK_SECONDS = 1.0
+STREAM_HEARTBEAT_SECONDS = 15.0
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_intraday(cleaned_ticker: str, request) -> AsyncIterator[str]:
+    """
+    Gera eventos SSE para um ticker já normalizado: um 'snapshot' com a série do dia e, depois, apenas 'delta's com
+    os candles novos ou alterados (a partir do índice 'start'). Cada verificação custa O(1) enquanto
+    nada muda, e cada envio é proporcional aos candles alterados, não ao dia inteiro.
+    """
+    session, sent, revision, poller = None, 0, None, None
+    last_event = time.monotonic()
+    while not await request.is_disconnected():
+        current = intraday_feed.find(cleaned_ticker)
+        if current is None:
+            # Criar o poller (ou esperar a primeira busca feita para outro cliente) bloqueia; roda fora do event loop
+            current = await asyncio.to_thread(intraday_feed.poller, cleaned_ticker)
+        if current is not poller:
+            # Primeira conexão ou o poller foi recriado: o cliente recebe a série completa de novo
+            poller, session, revision = current, None, None
+        poller.touch()
+
+        if poller.revision != revision:
+            revision = poller.revision
+            kind, data, session, sent = poller.read_since(session, sent)
+            # 'error' é reservado pelo EventSource do navegador para falhas de conexão
+            yield _sse('feed-error' if kind == 'error' else kind, data)
+            last_event = time.monotonic()
+        elif time.monotonic() - last_event > STREAM_HEARTBEAT_SECONDS:
+            # Comentário SSE para manter a conexão aberta em proxies
+            yield ": keep-alive\n\n"
+            last_event = time.monotonic()
+
+        await asyncio.sleep(STREAM_CHECK_SECONDS)
+
+
 if __name__ == '__main__':
-    # Teste rápido
+    # Teste rápido (executar como módulo: python -m backend.intraday)
     petr4_data = get_intraday_data_with_vwap("PETR4.SA")
     if 'error' not in petr4_data:
         print("Dados da PETR4 obtidos com sucesso:")
@@ -0,0 +1,155 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# --- Armazenamento local de candles de 1 minuto ---
+# Cada ticker tem um arquivo .npy mapeado em memória com um anel de N pregões x 1440 minutos, em
+# registros de largura fixa (OHLCV). O candle de um minuto é gravado direto no seu slot (pregão,
+# minuto do dia), então novas gravações são O(candles novos) e um candle alterado apenas sobrescreve o
+# anterior. Quando chega um pregão novo e o anel está cheio, o pregão mais antigo é descartado.
+# Rollups (5m, 15m, 60m...) e o VWAP do pregão são calculados na hora a partir dos candles de 1 minuto.
+INTRADAY_STORE_DIR = Path(os.getenv("INTRADAY_STORE_DIR", Path(__file__).resolve().parent / "data" / "intraday"))
+INTRADAY_SESSIONS = int(os.getenv("INTRADAY_SESSIONS", "20"))
+MINUTES_PER_SESSION = 1440
+BAR_DTYPE = np.dtype([('open', 'f8'), ('high', 'f8'), ('low', 'f8'), ('close', 'f8'), ('volume', 'f8')])
+ROLLUP_INTERVALS = (1, 5, 15, 60)
+
+
+def minute_of_day(stamps: list) -> np.ndarray:
+    """Converte horários 'AAAA-MM-DDTHH:MM' (hora local da bolsa) no índice do minuto do dia."""
+    return np.array([int(s[11:13]) * 60 + int(s[14:16]) for s in stamps], dtype=np.int64)
+
+
+def _format_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+class IntradayStore:
+    """Anel de pregões de 1 minuto por ticker em arquivos mapeados em memória."""
+
+    def __init__(self, root: Path = INTRADAY_STORE_DIR, sessions: int = INTRADAY_SESSIONS):
+        self.root = Path(root)
+        self.capacity = sessions
+        self._bars: dict[str, np.memmap] = {}
+        self._sessions: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, ticker: str) -> tuple:
+        return self.root / f"{ticker}.bars.npy", self.root / f"{ticker}.sessions.npy"
+
+    def _open(self, ticker: str) -> tuple:
+        if ticker in self._bars:
+            return self._bars[ticker], self._sessions[ticker]
+
+        bars_path, sessions_path = self._paths(ticker)
+        bars = sessions = None
+        if bars_path.exists() and sessions_path.exists():
+            bars = np.load(bars_path, mmap_mode='r+')
+            sessions = np.load(sessions_path)
+            if bars.shape != (self.capacity, MINUTES_PER_SESSION) or bars.dtype != BAR_DTYPE:
+                print(f"⚠️ Formato do armazenamento intraday de {ticker} mudou; recriando o arquivo.")
+                bars = sessions = None
+
+        if bars is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            bars = np.lib.format.open_memmap(bars_path, mode='w+', dtype=BAR_DTYPE, shape=(self.capacity, MINUTES_PER_SESSION))
+            bars[:] = np.nan
+            bars.flush()
+            sessions = np.full(self.capacity, np.datetime64('NaT'), dtype='datetime64[D]')
+            np.save(sessions_path, sessions)
+
+        self._bars[ticker], self._sessions[ticker] = bars, sessions
+        return bars, sessions
+
+    def _slot_for_write(self, ticker: str, session: np.datetime64) -> int:
+        bars, sessions = self._open(ticker)
+        found = np.flatnonzero(sessions == session)
+        if len(found):
+            return int(found[0])
+
+        # Slot livre ou, com o anel cheio, o do pregão mais antigo
+        empty = np.flatnonzero(np.isnat(sessions))
+        slot = int(empty[0]) if len(empty) else int(np.argmin(sessions))
+        bars[slot] = np.nan
+        sessions[slot] = session
+        tmp_path = self._paths(ticker)[1].with_suffix('.tmp.npy')
+        np.save(tmp_path, sessions)
+        os.replace(tmp_path, self._paths(ticker)[1])
+        return slot
+
+    def write(self, ticker: str, session: str, minutes: np.ndarray, columns: dict):
+        """Grava (ou sobrescreve) os candles de 1 minuto de um pregão nos slots dos minutos informados."""
+        if not len(minutes):
+            return
+        with self._lock:
+            slot = self._slot_for_write(ticker, np.datetime64(session, 'D'))
+            bars = self._bars[ticker]
+            row = bars[slot]
+            for name in BAR_DTYPE.names:
+                row[name][minutes] = columns[name]
+            bars.flush()
+
+    def sessions(self, ticker: str) -> list:
+        """Pregões disponíveis para o ticker, do mais antigo ao mais recente."""
+        with self._lock:
+            if ticker not in self._bars and not self._paths(ticker)[0].exists():
+                return []
+            _, sessions = self._open(ticker)
+            return [str(d) for d in np.sort(sessions[~np.isnat(sessions)])]
+
+    def minute_bars(self, ticker: str, session: str | None = None) -> tuple:
+        """
+        Retorna (pregão, minutos, registros) dos candles de 1 minuto preenchidos de um pregão
+        (o mais recente se 'session' for None). Retorna (None, None, None) se não houver dados.
+        """
+        available = self.sessions(ticker)
+        if not available:
+            return None, None, None
+        session = session or available[-1]
+        if session not in available:
+            return None, None, None
+        with self._lock:
+            bars, sessions = self._open(ticker)
+            row = np.array(bars[int(np.flatnonzero(sessions == np.datetime64(session, 'D'))[0])])
+        minutes = np.flatnonzero(~np.isnan(row['close']))
+        return session, minutes, row[minutes]
+
+    def rollup(self, ticker: str, interval: int = 5, session: str | None = None) -> dict | None:
+        """
+        Agrega os candles de 1 minuto em candles de 'interval' minutos (OHLCV) e calcula o VWAP
+        acumulado do pregão ao fim de cada candle agregado.
+        """
+        session, minutes, bars = self.minute_bars(ticker, session)
+        if session is None or not len(minutes):
+            return None
+
+        buckets = minutes // interval
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(minutes)] - 1
+
+        volume = np.nan_to_num(bars['volume'])
+        high = np.where(np.isnan(bars['high']), bars['close'], bars['high'])
+        low = np.where(np.isnan(bars['low']), bars['close'], bars['low'])
+        typical = (high + low + bars['close']) / 3
+        cum_tpv, cum_volume = np.cumsum(typical * volume), np.cumsum(volume)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vwap = np.where(cum_volume > 0, cum_tpv / cum_volume, typical)
+
+        open_ = np.where(np.isnan(bars['open']), bars['close'], bars['open'])
+        return {
+            'ticker': ticker,
+            'session': session,
+            'interval': interval,
+            'labels': [_format_minute(int(b) * interval) for b in buckets[starts]],
+            'open': open_[starts].tolist(),
+            'high': np.maximum.reduceat(high, starts).tolist(),
+            'low': np.minimum.reduceat(low, starts).tolist(),
+            'close': bars['close'][ends].tolist(),
+            'volume': np.add.reduceat(volume, starts).tolist(),
+            'vwap': vwap[ends].tolist(),
+        }
+
+
+intraday_store = IntradayStore()
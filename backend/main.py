@@ -1,15 +1,24 @@
+import asyncio
 import os
 from pathlib import Path
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+import json
 import re
 
 # --- Importações centralizadas ---
 from .config import supabase
-from .agent import query_agent
-from .tools.data_retrieval_tools import get_volatility_cone
-from .intraday import get_intraday_data_with_vwap
+from .dataset_version import current_dataset_version
+from .query_cache import query_cache
+from .ticker_catalog import get_ticker_catalog
+from .agent import query_agent, stream_agent
+from .tool_cache import tool_result_cache
+from .session_store import session_store
+from .router import route_query
+from .volatility_cone import get_volatility_cone_data, get_volatility_cones
+from .intraday import get_intraday_data_with_vwap, get_intraday_bars, get_watchlist_intraday, clean_intraday_ticker, stream_intraday
 
 app = FastAPI(
     title="IaAndData API",
@@ -20,12 +29,14 @@ app = FastAPI(
 # --- FUNÇÃO DE PRÉ-VALIDAÇÃO ---
 def verificar_data_ambigua(texto: str) -> bool:
     """Verifica se há datas no formato DD/MM ou DD-MM sem um ano."""
-    # Padrão para DD/MM ou DD-MM não seguido por /YYYY ou -YYYY
-    padrao = r'\b(\d{1,2}[/-]\d{1,2})(?!([/-]\d{4}))\b'
+    # Padrão para DD/MM ou DD-MM não seguido por /YYYY ou -YYYY (nem parte de uma data AAAA-MM-DD)
+    padrao = r'(?<![\d/-])\b(\d{1,2}[/-]\d{1,2})(?!([/-]\d{4}))\b'
     if re.search(padrao, texto):
         return True
     return False
 
+MENSAGEM_DATA_AMBIGUA = "Notei que a data na sua pergunta não especifica o ano. Para garantir a precisão, por favor, reformule a pergunta incluindo o ano completo (ex: '18/09/2024')."
+
 # --- Configuração do CORS ---
 origins = [
     "http://localhost",
@@ -63,13 +74,18 @@ def run_agent_query(request: QueryRequest):
     
     # --- CAMADA DE VALIDAÇÃO ANTES DE CHAMAR O AGENTE ---
     if verificar_data_ambigua(request.question):
-        return {
-            "answer": "Notei que a data na sua pergunta não especifica o ano. Para garantir a precisão, por favor, reformule a pergunta incluindo o ano completo (ex: '18/09/2024')."
-        }
+        return {"answer": MENSAGEM_DATA_AMBIGUA}
 
     try:
-        # Passa a pergunta e o ID da sessão para a função do agente
         session_id = request.session_id or "default_user"
+
+        # --- ROTEADOR: perguntas simples são respondidas sem chamar o LLM ---
+        routed = route_query(request.question)
+        if routed is not None:
+            session_store.append_turn(session_id, request.question, routed)
+            return {"answer": routed}
+
+        # Passa a pergunta e o ID da sessão para a função do agente
         response = query_agent(request.question, session_id=session_id)
         
         # Se a resposta for um dicionário (nosso cone), retorne-o diretamente
@@ -81,19 +97,87 @@ def run_agent_query(request: QueryRequest):
         raise HTTPException(status_code=500, detail=f"Erro ao processar a pergunta: {e}")
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _stream_query_events(question: str, session_id: str):
+    # Respostas imediatas (data ambígua e roteador) saem como um único 'token' seguido de 'done'
+    if verificar_data_ambigua(question):
+        yield _sse('token', {"text": MENSAGEM_DATA_AMBIGUA})
+        yield _sse('done', {"answer": MENSAGEM_DATA_AMBIGUA})
+        return
+
+    try:
+        # O roteador consulta os dados de forma síncrona; roda fora do event loop
+        routed = await asyncio.to_thread(route_query, question)
+        if routed is not None:
+            session_store.append_turn(session_id, question, routed)
+            yield _sse('token', {"text": routed})
+            yield _sse('done', {"answer": routed})
+            return
+
+        async for event, data in stream_agent(question, session_id=session_id):
+            if event == 'done' and isinstance(data["answer"], dict):
+                data = {"chart_data": data["answer"]}
+            yield _sse(event, data)
+    except Exception as e:
+        # 'error' é reservado pelo EventSource para falhas de conexão
+        yield _sse('query-error', {"detail": f"Erro ao processar a pergunta: {e}"})
+
+
+@app.post("/api/v1/query/stream")
+def stream_agent_query(request: QueryRequest):
+    """
+    Versão em streaming (SSE) de /api/v1/query: envia 'tool-start' e 'tool-end' a cada ferramenta
+    chamada pelo agente, 'token' com cada trecho da resposta assim que é gerado e, no fim, 'done'
+    com a resposta completa ('answer', ou 'chart_data' para o cone). Falhas chegam como 'query-error'.
+    """
+    if not request.question:
+        raise HTTPException(status_code=400, detail="A pergunta não pode estar vazia.")
+
+    return StreamingResponse(
+        _stream_query_events(request.question, request.session_id or "default_user"),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/v1/volatility-cone")
+def get_volatility_cones_endpoint(tickers: str, days_to_predict: int = 30):
+    """
+    Retorna, em uma única chamada, os cones de volatilidade de vários tickers separados por vírgula
+    (ex: ?tickers=PETR4.SA,VALE3.SA). Tickers sem dados suficientes aparecem em 'errors'.
+    """
+    cleaned_tickers = []
+    for ticker in tickers.split(','):
+        match = re.search(r"([A-Z0-9]+\.SA)", ticker.strip().upper())
+        if not match:
+            raise HTTPException(status_code=400, detail=f"Ticker inválido: {ticker}. O formato deve ser como 'PETR4.SA'.")
+        if match.group(1) not in cleaned_tickers:
+            cleaned_tickers.append(match.group(1))
+
+    try:
+        cones, errors = get_volatility_cones(cleaned_tickers, days_to_predict)
+        return {"chart_data": cones, "errors": errors}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/v1/volatility-cone/{ticker}")
-def get_volatility_cone_endpoint(ticker: str):
+def get_volatility_cone_endpoint(ticker: str, days_to_predict: int = 30):
     """
     Retorna os dados para o gráfico de cone de volatilidade de uma ação específica.
     """
+    match = re.search(r"([A-Z0-9]+\.SA)", ticker.upper())
+    if not match:
+        raise HTTPException(status_code=400, detail=f"Ticker inválido: {ticker}. O formato deve ser como 'PETR4.SA'.")
+
     try:
-        # Reutiliza a lógica da ferramenta do agente diretamente
-        result = get_volatility_cone(ticker)
-        
-        if isinstance(result, str) and "Erro" in result:
-            raise HTTPException(status_code=500, detail=result)
-        
-        if isinstance(result, str) and "insuficientes" in result:
+        # Mesmo serviço (e mesmo cache) usado pela ferramenta do agente
+        result = get_volatility_cone_data(match.group(1), days_to_predict)
+
+        if isinstance(result, str):
             raise HTTPException(status_code=404, detail=result)
 
         return {"chart_data": result}
@@ -119,18 +203,104 @@ def get_intraday_endpoint(ticker: str):
         raise HTTPException(status_code=500, detail=f"Erro interno no servidor: {e}")
 
 
+@app.get("/api/v1/watchlist/intraday")
+def get_watchlist_intraday_endpoint(tickers: str):
+    """
+    Retorna dados intraday (1 minuto) e o VWAP de vários tickers separados por vírgula
+    (ex: ?tickers=PETR4.SA,VALE3.SA), buscados em um único download agrupado.
+    """
+    try:
+        data = get_watchlist_intraday([t for t in tickers.split(",") if t.strip()])
+        if "error" in data:
+            status = 500 if data["error"].startswith("Ocorreu") else 400
+            raise HTTPException(status_code=status, detail=data["error"])
+        return data
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno no servidor: {e}")
+
+
+@app.get("/api/v1/intraday/{ticker}/bars")
+def get_intraday_bars_endpoint(ticker: str, interval: int = 5, session: str | None = None):
+    """
+    Retorna candles intraday agregados (1, 5, 15 ou 60 minutos) e o VWAP do pregão, a partir do
+    armazenamento local de candles de 1 minuto (o pregão mais recente, ou 'session' no formato AAAA-MM-DD).
+    """
+    try:
+        data = get_intraday_bars(ticker, interval, session)
+        if "error" in data:
+            status = 404 if data["error"].startswith("Não há") else 400
+            raise HTTPException(status_code=status, detail=data["error"])
+        return data
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno no servidor: {e}")
+
+
+@app.get("/api/v1/intraday/{ticker}/stream")
+def stream_intraday_endpoint(ticker: str, request: Request):
+    """
+    Stream SSE dos dados intraday: envia a série do dia uma vez (evento 'snapshot') e depois apenas os
+    candles novos ou alterados (evento 'delta', com o índice 'start' a partir do qual substituir).
+    """
+    cleaned_ticker = clean_intraday_ticker(ticker)
+    if not cleaned_ticker:
+        raise HTTPException(status_code=400, detail=f"Ticker inválido: {ticker}. O formato deve ser como 'PETR4.SA'.")
+
+    return StreamingResponse(
+        stream_intraday(cleaned_ticker, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/v1/tickers")
+def get_tickers_endpoint():
+    """
+    Retorna o catálogo de tickers disponíveis, com primeira e última data, quantidade de registros e última atualização.
+    """
+    try:
+        catalog = get_ticker_catalog()
+        return {"total": len(catalog), "tickers": catalog}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/v1/acoes/{ticker}")
 def get_historico_acao(ticker: str):
     """
     Retorna o histórico de dados de uma ação específica.
     """
     try:
-        response = supabase.table('acoes_historico').select("*").eq('ticker', ticker.upper()).order('date', desc=True).limit(100).execute()
+        cleaned_ticker = ticker.upper()
+        cache_key = ('acoes', current_dataset_version(), cleaned_ticker)
+        data = query_cache.get_or_compute(
+            cache_key,
+            lambda: supabase.table('acoes_historico').select("*").eq('ticker', cleaned_ticker).order('date', desc=True).limit(100).execute().data,
+            cache_empty=False,
+        )
         
-        if not response.data:
+        if not data:
             raise HTTPException(status_code=404, detail=f"Dados não encontrados para o ticker {ticker}")
             
-        return {"ticker": ticker, "data": response.data}
+        return {"ticker": ticker, "data": data}
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/metrics")
+def get_metrics_endpoint():
+    """
+    Retorna os contadores dos caches: resultados das ferramentas do agente (acertos e falhas por
+    ferramenta), cache de consultas compartilhado e histórico das sessões (sessões, tokens e memória).
+    """
+    return {
+        "tool_cache": tool_result_cache.stats(),
+        "query_cache": query_cache.stats(),
+        "sessions": session_store.stats(),
+    }
@@ -0,0 +1,351 @@
+import os
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from .dataset_version import current_dataset_version
+from .supabase_reader import iter_ticker_histories
+
+# --- Configuração do armazenamento colunar local ---
+# O histórico completo de 'acoes_historico' (~85 tickers x 5 anos) cabe em poucas dezenas de MB.
+# Mantemos uma cópia local em arrays NumPy por ticker (um arquivo .npy por coluna), abertos com
+# memory-map, para que as ferramentas façam fatias de arrays em vez de consultas remotas.
+STORE_DIR = Path(os.getenv("MARKET_STORE_DIR", Path(__file__).resolve().parent / "data" / "market_store"))
+SYNC_TTL_SECONDS = int(os.getenv("MARKET_STORE_TTL_SECONDS", "3600"))
+# Espera antes de tentar de novo depois de uma sincronização que falhou ou não trouxe dados
+SYNC_RETRY_SECONDS = int(os.getenv("MARKET_STORE_RETRY_SECONDS", "60"))
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume", "adj_close")
+# Colunas corrigidas pelo fator de ajuste (adj_close / close) em TickerSeries.adjusted()
+ADJUSTED_COLUMNS = ("open", "high", "low", "close")
+
+
+def to_day(value) -> np.datetime64:
+    """Converte uma data 'AAAA-MM-DD' (ou datetime) em np.datetime64 com resolução de dia."""
+    return np.datetime64(str(value)[:10], 'D')
+
+
+def format_day(value: np.datetime64) -> str:
+    """Formata um np.datetime64 como 'AAAA-MM-DD'."""
+    return str(np.datetime_as_string(value, unit='D'))
+
+
+class TickerSeries:
+    """
+    Série histórica de um ticker em formato colunar.
+    'date' é um array datetime64[D] ordenado de forma crescente e cada coluna de preço/volume é um array float64.
+    """
+
+    def __init__(self, ticker: str, date: np.ndarray, columns: dict):
+        self.ticker = ticker
+        self.date = date
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.date)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def _take(self, start: int, stop: int) -> "TickerSeries":
+        return TickerSeries(
+            self.ticker,
+            self.date[start:stop],
+            {name: values[start:stop] for name, values in self.columns.items()},
+        )
+
+    def between(self, start_date: str | None = None, end_date: str | None = None) -> "TickerSeries":
+        """Retorna a fatia entre start_date e end_date (inclusivos) usando busca binária nas datas."""
+        start = np.searchsorted(self.date, to_day(start_date), side='left') if start_date else 0
+        stop = np.searchsorted(self.date, to_day(end_date), side='right') if end_date else len(self.date)
+        return self._take(start, stop)
+
+    def head(self, n: int) -> "TickerSeries":
+        return self._take(0, n)
+
+    def tail(self, n: int) -> "TickerSeries":
+        return self._take(max(len(self.date) - n, 0), len(self.date))
+
+    def adjusted(self) -> "TickerSeries":
+        """
+        Série com preços ajustados por proventos: open, high, low e close multiplicados pelo fator
+        adj_close / close materializado pelo ETL (pregões sem 'adj_close' ficam com fator 1).
+        """
+        close, adj_close = self.columns['close'], self.columns['adj_close']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = adj_close / close
+        factor = np.where(np.isfinite(factor), factor, 1.0)
+        columns = dict(self.columns)
+        for name in ADJUSTED_COLUMNS:
+            if name in columns:
+                columns[name] = self.columns[name] * factor
+        return TickerSeries(self.ticker, self.date, columns)
+
+    def to_records(self, descending: bool = False) -> list:
+        """Converte a série em uma lista de dicionários no mesmo formato retornado pelo Supabase."""
+        order = range(len(self.date) - 1, -1, -1) if descending else range(len(self.date))
+        dates = np.datetime_as_string(self.date, unit='D')
+        records = []
+        for i in order:
+            record = {'date': str(dates[i])}
+            for name in PRICE_COLUMNS:
+                value = float(self.columns[name][i])
+                if np.isnan(value):
+                    record[name] = None
+                elif name == 'volume':
+                    record[name] = int(value)
+                else:
+                    record[name] = value
+            records.append(record)
+        return records
+
+
+class _Snapshot(NamedTuple):
+    """Estado publicado de uma vez: as séries e os metadados do snapshot que as gerou."""
+    series: dict
+    synced_at: float = 0.0
+    dataset_version: int | None = None
+    snapshot_id: str | None = None
+
+
+class MarketStore:
+    """
+    Cópia local, colunar e mapeada em memória da tabela 'acoes_historico'.
+
+    Cada sincronização grava um novo snapshot em STORE_DIR/snapshot-<timestamp>/<TICKER>/<coluna>.npy
+    e o arquivo STORE_DIR/CURRENT aponta para o snapshot ativo. Os leitores sempre usam uma referência
+    imutável ao snapshot carregado, então uma sincronização em segundo plano nunca afeta uma leitura em curso;
+    séries e identificador do snapshot são trocados juntos, em um único objeto.
+
+    Quando o ETL publica uma nova versão dos dados, a leitura que percebe a mudança ressincroniza de
+    forma bloqueante, para não receber dados anteriores à carga; enquanto isso, as demais continuam
+    servindo o snapshot atual. A sincronização nunca roda sob o lock dos leitores.
+    """
+
+    def __init__(self, root: Path = STORE_DIR, ttl_seconds: int = SYNC_TTL_SECONDS):
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self._state = _Snapshot(series={})
+        self._lock = threading.Lock()
+        self._sync_lock = threading.RLock()  # reentrante: _run_sync o segura em volta de sync()
+        self._refreshing = False
+        self._loaded_from_disk = False
+        self._retry_at = 0.0
+
+    # --- Leitura do snapshot em disco ---
+
+    def _load_from_disk(self) -> _Snapshot | None:
+        """Abre o snapshot apontado por CURRENT (None se não houver); quem chama o publica."""
+        current_file = self.root / "CURRENT"
+        if not current_file.exists():
+            return None
+        snapshot_dir = self.root / current_file.read_text().strip()
+        manifest_path = snapshot_dir / "manifest.json"
+        if not manifest_path.exists():
+            return None
+
+        manifest = json.loads(manifest_path.read_text())
+        series = {}
+        for ticker in manifest["tickers"]:
+            ticker_dir = snapshot_dir / ticker
+            date = np.load(ticker_dir / "date.npy", mmap_mode='r')
+            # Snapshots gravados antes de 'adj_close' existir ficam com a coluna vazia (preço sem ajuste)
+            columns = {
+                name: np.load(ticker_dir / f"{name}.npy", mmap_mode='r')
+                if (ticker_dir / f"{name}.npy").exists() else np.full(len(date), np.nan)
+                for name in PRICE_COLUMNS
+            }
+            series[ticker] = TickerSeries(ticker, date, columns)
+
+        print(f"📦 Armazenamento local carregado com {len(series)} tickers ({snapshot_dir.name}).")
+        return _Snapshot(series, manifest["synced_at"], manifest.get("dataset_version"), snapshot_dir.name)
+
+    # --- Sincronização com o Supabase ---
+
+    def _write_snapshot(self, dataset_version: int) -> tuple:
+        """
+        Lê a tabela em streaming (um ticker por vez, via paginação por chave) e grava cada ticker
+        diretamente no novo snapshot. Retorna o diretório do snapshot e o total de linhas gravadas.
+        """
+        synced_at = time.time()
+        snapshot_dir = self.root / f"snapshot-{int(synced_at * 1000)}"
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+        tickers, total_rows = [], 0
+        for ticker, columns in iter_ticker_histories(columns=PRICE_COLUMNS):
+            ticker_dir = snapshot_dir / ticker
+            ticker_dir.mkdir(exist_ok=True)
+            np.save(ticker_dir / "date.npy", columns['date'])
+            for name in PRICE_COLUMNS:
+                np.save(ticker_dir / f"{name}.npy", columns[name])
+            tickers.append(ticker)
+            total_rows += len(columns['date'])
+
+        manifest = {
+            "tickers": sorted(tickers),
+            "synced_at": synced_at,
+            "rows": total_rows,
+            "dataset_version": dataset_version,
+        }
+        (snapshot_dir / "manifest.json").write_text(json.dumps(manifest))
+        return snapshot_dir, total_rows
+
+    def _cleanup_old_snapshots(self, keep: Path):
+        # Snapshots antigos podem continuar mapeados por leitores (ou bloqueados no Windows); ignoramos falhas.
+        for path in self.root.glob("snapshot-*"):
+            if path != keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def sync(self, dataset_version: int | None = None) -> bool:
+        """
+        Baixa o histórico completo do Supabase e publica um novo snapshot local.
+        Retorna False se o Supabase não devolveu nenhuma linha (o snapshot atual é mantido).
+        """
+        with self._sync_lock:
+            if dataset_version is None:
+                dataset_version = current_dataset_version()
+            # Outra thread pode ter concluído a mesma sincronização enquanto esperávamos o lock
+            state = self._state
+            if state.series and state.dataset_version == dataset_version and \
+                    time.time() - state.synced_at <= self.ttl_seconds:
+                return True
+            # ...ou ter acabado de tentar sem sucesso (tabela vazia ou erro): não repete a leitura completa
+            if time.monotonic() < self._retry_at:
+                return False
+
+            print("🔄 Sincronizando o armazenamento local com o Supabase...")
+            start = time.perf_counter()
+            snapshot_dir, rows = self._write_snapshot(dataset_version)
+            if not rows:
+                shutil.rmtree(snapshot_dir, ignore_errors=True)
+                print("⚠️ Nenhum dado retornado pelo Supabase. O snapshot atual foi mantido.")
+                return False
+
+            (self.root / "CURRENT.tmp").write_text(snapshot_dir.name)
+            os.replace(self.root / "CURRENT.tmp", self.root / "CURRENT")
+
+            state = self._load_from_disk()
+            with self._lock:
+                self._state = state
+            self._cleanup_old_snapshots(keep=snapshot_dir)
+            print(f"✅ Sincronização concluída: {rows} linhas em {time.perf_counter() - start:.1f}s.")
+            return True
+
+    def _run_sync(self, dataset_version: int | None = None, raise_errors: bool = False):
+        # Depois de uma sincronização vazia ou com erro, as próximas leituras não tentam de novo por
+        # SYNC_RETRY_SECONDS (sem isso, cada chamada de ferramenta refaria a leitura completa da tabela).
+        # O prazo é marcado ainda sob o _sync_lock, antes que a próxima leitura na fila o adquira.
+        try:
+            with self._sync_lock:
+                try:
+                    published = self.sync(dataset_version)
+                except Exception:
+                    published = False
+                    raise
+                finally:
+                    if not published and time.monotonic() >= self._retry_at:
+                        self._retry_at = time.monotonic() + SYNC_RETRY_SECONDS
+        except Exception as e:
+            print(f"🔥 Erro ao sincronizar o armazenamento local; servindo o snapshot atual: {e}")
+            if raise_errors:
+                raise
+        finally:
+            self._refreshing = False
+
+    def ensure_fresh(self):
+        """
+        Garante que há dados carregados. Se não houver snapshot ou se o ETL publicou uma nova versão,
+        sincroniza de forma bloqueante (leituras simultâneas continuam servindo o snapshot atual, se
+        houver um); se o snapshot apenas estiver vencido, dispara a sincronização em segundo plano.
+        """
+        dataset_version = current_dataset_version()
+        with self._lock:
+            if not self._loaded_from_disk:
+                self._loaded_from_disk = True
+                self._state = self._load_from_disk() or self._state
+
+            state = self._state
+            has_data = bool(state.series)
+            outdated = has_data and state.dataset_version != dataset_version
+            expired = has_data and time.time() - state.synced_at > self.ttl_seconds
+            if (has_data and not outdated and not expired) or time.monotonic() < self._retry_at:
+                return
+            # Com um snapshot para servir, só uma leitura sincroniza; sem nenhum, todas esperam a sincronização
+            if has_data and self._refreshing:
+                return
+            self._refreshing = True
+
+        if has_data and not outdated:
+            threading.Thread(target=self._run_sync, daemon=True).start()
+            return
+        # Sem dados, a falha chega a quem pediu; com um snapshot, ele continua sendo servido
+        self._run_sync(dataset_version, raise_errors=not has_data)
+
+    # --- Consultas ---
+
+    @property
+    def version(self) -> str | None:
+        """Identificador do snapshot servido; muda a cada sincronização e compõe as chaves de cache."""
+        self.ensure_fresh()
+        return self._state.snapshot_id
+
+    @property
+    def synced_at(self) -> float:
+        """Horário (epoch) da sincronização que gerou o snapshot servido."""
+        self.ensure_fresh()
+        return self._state.synced_at
+
+    def tickers(self) -> list:
+        self.ensure_fresh()
+        return sorted(self._state.series)
+
+    def series(self, ticker: str) -> TickerSeries | None:
+        self.ensure_fresh()
+        return self._state.series.get(ticker)
+
+    def all_series(self) -> dict:
+        self.ensure_fresh()
+        return self._state.series
+
+    def latest_date(self) -> np.datetime64 | None:
+        series = self.all_series()
+        if not series:
+            return None
+        return max(s.date[-1] for s in series.values() if len(s))
+
+    def session_on_or_before(self, date: str) -> np.datetime64 | None:
+        """Retorna o pregão mais recente com dados em 'date' ou antes dela."""
+        day = to_day(date)
+        sessions = [
+            s.date[i - 1]
+            for s in self.all_series().values()
+            if (i := np.searchsorted(s.date, day, side='right')) > 0
+        ]
+        return max(sessions) if sessions else None
+
+    def cross_section(self, date: str) -> dict:
+        """
+        Retorna as linhas de todos os tickers em uma data específica, como arrays alinhados por ticker.
+        Inclui 'prev_close', o fechamento do pregão anterior de cada ticker (NaN se não houver).
+        """
+        day = to_day(date)
+        tickers, rows = [], {name: [] for name in PRICE_COLUMNS + ('prev_close',)}
+        for ticker, s in self.all_series().items():
+            i = np.searchsorted(s.date, day)
+            if i < len(s) and s.date[i] == day:
+                tickers.append(ticker)
+                for name in PRICE_COLUMNS:
+                    rows[name].append(s[name][i])
+                rows['prev_close'].append(s['close'][i - 1] if i > 0 else np.nan)
+        section = {name: np.array(values, dtype=np.float64) for name, values in rows.items()}
+        section['ticker'] = np.array(tickers)
+        return section
+
+
+# Instância compartilhada usada pelas ferramentas e pela API
+market_store = MarketStore()
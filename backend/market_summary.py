@@ -0,0 +1,58 @@
+import numpy as np
+
+from .config import supabase
+from .dataset_version import current_dataset_version
+from .market_store import market_store, format_day
+from .query_cache import query_cache
+
+# --- Resumo diário do mercado ---
+# O ETL (etl/market_summary.py) mantém a tabela 'market_daily_summary' com uma linha agregada por
+# pregão. Qualquer data, ou o pregão anterior mais próximo, é respondida com uma única consulta
+# indexada pela chave primária 'date'.
+SUMMARY_TABLE = 'market_daily_summary'
+
+
+def _summary_from_store(date: str) -> dict | None:
+    """Calcula o resumo do pregão mais próximo (em ou antes de 'date') a partir do armazenamento local."""
+    session = market_store.session_on_or_before(date)
+    if session is None:
+        return None
+
+    section = market_store.cross_section(format_day(session))
+    valid = ~(np.isnan(section['close']) | np.isnan(section['volume']))
+    close, volume = section['close'][valid], section['volume'][valid]
+    change = close - section['prev_close'][valid]
+
+    return {
+        "date": format_day(session),
+        "total_volume_financeiro": float((close * volume).sum()),
+        "total_volume": int(volume.sum()),
+        "tickers_count": int(valid.sum()),
+        "advancers": int((change > 0).sum()),
+        "decliners": int((change < 0).sum()),
+        "unchanged": int((change == 0).sum()),
+    }
+
+
+def _load_market_day(date: str) -> dict | None:
+    try:
+        response = supabase.table(SUMMARY_TABLE) \
+            .select("date, total_volume_financeiro, total_volume, tickers_count, advancers, decliners, unchanged") \
+            .lte('date', date) \
+            .order('date', desc=True) \
+            .limit(1) \
+            .execute()
+        if response.data:
+            return response.data[0]
+        print(f"⚠️ Resumo diário não encontrado até {date}. Usando o armazenamento local.")
+    except Exception as e:
+        print(f"⚠️ Não foi possível ler o resumo diário ({e}). Usando o armazenamento local.")
+    return _summary_from_store(date)
+
+
+def get_market_day(date: str) -> dict | None:
+    """
+    Retorna os agregados do pregão em 'date' ou, se não houver pregão nessa data, do pregão anterior mais próximo.
+    O campo 'date' do resultado indica o pregão efetivamente usado. Retorna None se não houver dados até a data.
+    """
+    return query_cache.get_or_compute(('market_day', current_dataset_version(), date), lambda: _load_market_day(date))
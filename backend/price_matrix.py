@@ -0,0 +1,67 @@
+import numpy as np
+
+from .market_store import market_store, TickerSeries
+from .supabase_reader import iter_ticker_histories
+
+# --- Matriz de preços alinhada por data ---
+# Monta, para vários tickers de uma vez, uma matriz larga (datas x tickers) com um índice de datas
+# compartilhado. Os tickers presentes no armazenamento local são fatiados sem ida à rede; os que
+# ainda não chegaram a ele (ex: carregados pelo ETL após a última sincronização) são buscados todos
+# juntos em uma única leitura com filtro 'in' sobre 'ticker'.
+
+
+def _remote_histories(tickers: list, start_date: str | None, end_date: str | None, field: str,
+                      adjusted: bool) -> dict:
+    histories = {}
+    columns_needed = tuple(dict.fromkeys((field, 'close', 'adj_close'))) if adjusted else (field,)
+    for ticker, columns in iter_ticker_histories(
+        columns=columns_needed, tickers=tickers, start_date=start_date, end_date=end_date
+    ):
+        if adjusted:
+            series = TickerSeries(ticker, columns['date'], {name: columns[name] for name in columns_needed})
+            histories[ticker] = (series.date, series.adjusted()[field])
+        else:
+            histories[ticker] = (columns['date'], columns[field])
+    return histories
+
+
+def fetch_price_matrix(tickers: list, start_date: str | None = None, end_date: str | None = None, field: str = 'close',
+                       adjusted: bool = False) -> tuple:
+    """
+    Retorna (dates, tickers, matrix) para o período pedido, sem limite de linhas.
+
+    Args:
+        tickers (list): Tickers já normalizados (ex: ["PETR4.SA", "VALE3.SA"]).
+        start_date / end_date (str | None): Período inclusivo no formato 'AAAA-MM-DD'.
+        field (str): Coluna de preço a usar ('close' por padrão).
+        adjusted (bool): Se True, usa os preços ajustados por proventos (TickerSeries.adjusted()).
+
+    Returns:
+        tuple: 'dates' (datetime64[D], crescente), a lista de tickers com dados (na ordem pedida)
+               e 'matrix' com shape (len(dates), len(tickers)), com NaN nos dias sem negociação.
+    """
+    histories = {}
+    missing = []
+    for ticker in tickers:
+        series = market_store.series(ticker)
+        if series is None:
+            missing.append(ticker)
+            continue
+        window = series.between(start_date, end_date)
+        window = window.adjusted() if adjusted else window
+        histories[ticker] = (window.date, window[field])
+
+    if missing:
+        histories.update(_remote_histories(missing, start_date, end_date, field, adjusted))
+
+    found = [t for t in tickers if t in histories and len(histories[t][0])]
+    if not found:
+        return np.array([], dtype='datetime64[D]'), [], np.empty((0, 0))
+
+    dates = np.unique(np.concatenate([histories[t][0] for t in found]))
+    matrix = np.full((len(dates), len(found)), np.nan)
+    for col, ticker in enumerate(found):
+        ticker_dates, values = histories[ticker]
+        matrix[np.searchsorted(dates, ticker_dates), col] = values
+
+    return dates, found, matrix
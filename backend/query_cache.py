@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# --- Cache compartilhado de resultados de consultas ---
+# As mesmas consultas (ticker, start_date, end_date) chegam repetidamente do agente, de
+# compare_assets, de get_asset_analytics e da API. As entradas são indexadas pelo formato da
+# consulta mais a versão dos dados, então uma nova carga do ETL nunca serve resultados antigos:
+# as chaves antigas simplesmente deixam de ser usadas e saem pelo LRU.
+CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048"))
+CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def estimate_size(value) -> int:
+    """Estimativa aproximada (em bytes) do espaço ocupado por um resultado."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """Cache LRU thread-safe, limitado por número de entradas e por tamanho estimado."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute, cache_empty: bool = True):
+        """
+        Retorna o valor em cache para 'key' ou executa 'compute()' e armazena o resultado.
+        Com cache_empty=False, resultados vazios não são guardados (um ticker carregado depois da
+        primeira consulta passa a ser encontrado sem esperar uma nova versão dos dados).
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            return value
+        value = compute()
+        if cache_empty or value:
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Instância compartilhada por ferramentas e endpoints
+query_cache = QueryCache()
@@ -0,0 +1,127 @@
+import threading
+
+import numpy as np
+
+from .market_store import market_store, to_day
+
+# --- Índice de somas de prefixo para rankings por período ---
+# Todos os tickers são alinhados em um eixo comum de pregões (tickers x dias). Para cada métrica
+# somável guardamos a soma acumulada com uma coluna inicial de zeros, de modo que o total de qualquer
+# intervalo [i, j) é cum[:, j] - cum[:, i]: uma subtração por ticker, independente do tamanho do período.
+# Retorno e volatilidade usam o fechamento ajustado por proventos (como compare_assets e
+# get_asset_analytics); o volume financeiro usa o fechamento bruto, o preço efetivamente negociado.
+
+
+def _prefix_sum(values: np.ndarray) -> np.ndarray:
+    cum = np.zeros((values.shape[0], values.shape[1] + 1), dtype=np.float64)
+    np.cumsum(values, axis=1, out=cum[:, 1:])
+    return cum
+
+
+class RangeIndex:
+    """Somas acumuladas por ticker sobre um eixo de pregões compartilhado."""
+
+    def __init__(self, all_series: dict):
+        self.tickers = np.array(sorted(all_series))
+        self.axis = np.unique(np.concatenate([all_series[t].date for t in self.tickers])) \
+            if len(self.tickers) else np.array([], dtype='datetime64[D]')
+
+        shape = (len(self.tickers), len(self.axis))
+        close = np.full(shape, np.nan)
+        adj_close = np.full(shape, np.nan)
+        volume = np.full(shape, np.nan)
+        log_return = np.zeros(shape)
+        has_return = np.zeros(shape)
+
+        for row, ticker in enumerate(self.tickers):
+            s = all_series[ticker]
+            cols = np.searchsorted(self.axis, s.date)
+            adjusted = s.adjusted()['close']
+            close[row, cols] = s['close']
+            adj_close[row, cols] = adjusted
+            volume[row, cols] = s['volume']
+
+            # Retornos logarítmicos (ajustados) entre pregões válidos consecutivos do próprio ticker,
+            # registrados na data do pregão mais recente do par
+            valid = ~(np.isnan(s['close']) | np.isnan(s['volume']))
+            valid_cols, valid_close = cols[valid], adjusted[valid]
+            if len(valid_close) > 1:
+                log_return[row, valid_cols[1:]] = np.log(valid_close[1:] / valid_close[:-1])
+                has_return[row, valid_cols[1:]] = 1
+
+        valid = ~(np.isnan(close) | np.isnan(volume))
+        self.adj_close = adj_close
+        self.cum_volume = _prefix_sum(np.where(valid, volume, 0.0))
+        self.cum_financial_volume = _prefix_sum(np.where(valid, close * volume, 0.0))
+        self.cum_sessions = _prefix_sum(valid.astype(np.float64))
+        self.cum_log_return = _prefix_sum(log_return)
+        self.cum_log_return_sq = _prefix_sum(log_return ** 2)
+        self.cum_return_count = _prefix_sum(has_return)
+
+        # Para cada (ticker, dia): índice do próximo pregão válido (ou len(axis)) e do anterior (ou -1)
+        positions = np.arange(len(self.axis))
+        self.prev_valid = np.maximum.accumulate(np.where(valid, positions, -1), axis=1)
+        self.next_valid = np.minimum.accumulate(np.where(valid, positions, len(self.axis))[:, ::-1], axis=1)[:, ::-1]
+
+    def bounds(self, start_date: str, end_date: str) -> tuple:
+        """Converte o período (inclusivo) em um intervalo [i, j) do eixo de pregões."""
+        i = int(np.searchsorted(self.axis, to_day(start_date), side='left'))
+        j = int(np.searchsorted(self.axis, to_day(end_date), side='right'))
+        return i, j
+
+    def _range_total(self, cum: np.ndarray, i: int, j: int) -> np.ndarray:
+        return cum[:, j] - cum[:, i]
+
+    def sessions(self, i: int, j: int) -> np.ndarray:
+        return self._range_total(self.cum_sessions, i, j)
+
+    def volume(self, i: int, j: int) -> np.ndarray:
+        return self._range_total(self.cum_volume, i, j)
+
+    def financial_volume(self, i: int, j: int) -> np.ndarray:
+        return self._range_total(self.cum_financial_volume, i, j)
+
+    def average_turnover(self, i: int, j: int) -> np.ndarray:
+        """Volume financeiro médio por pregão negociado no período."""
+        sessions = self.sessions(i, j)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(sessions > 0, self.financial_volume(i, j) / sessions, np.nan)
+
+    def period_return(self, i: int, j: int) -> np.ndarray:
+        """Retorno (ajustado por proventos) entre o primeiro e o último fechamento válidos de cada ticker no período."""
+        rows = np.arange(len(self.tickers))
+        first = self.next_valid[:, i] if i < len(self.axis) else np.full(len(rows), len(self.axis))
+        last = self.prev_valid[:, j - 1] if j > 0 else np.full(len(rows), -1)
+        has_data = (first < j) & (last >= i) & (first < last)
+        result = np.full(len(rows), np.nan)
+        result[has_data] = self.adj_close[rows[has_data], last[has_data]] / self.adj_close[rows[has_data], first[has_data]] - 1
+        return result
+
+    def volatility(self, i: int, j: int) -> np.ndarray:
+        """Volatilidade anualizada dos retornos diários cujos dois pregões estão dentro do período."""
+        rows = np.arange(len(self.tickers))
+        first = self.next_valid[:, i] if i < len(self.axis) else np.full(len(rows), len(self.axis))
+        # Ignora o retorno registrado no primeiro pregão do período, que depende de um preço anterior a ele
+        start = np.minimum(first + 1, j)
+        n = self.cum_return_count[:, j] - self.cum_return_count[rows, start]
+        s1 = self.cum_log_return[:, j] - self.cum_log_return[rows, start]
+        s2 = self.cum_log_return_sq[:, j] - self.cum_log_return_sq[rows, start]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = np.where(n > 1, (s2 - s1 ** 2 / n) / (n - 1), np.nan)
+        return np.sqrt(np.maximum(variance, 0.0)) * np.sqrt(252)
+
+
+_lock = threading.Lock()
+_index: RangeIndex | None = None
+_index_version = None
+
+
+def get_range_index() -> RangeIndex:
+    """Retorna o índice do snapshot atual do armazenamento local, reconstruindo-o apenas quando os dados mudam."""
+    global _index, _index_version
+    version = market_store.version
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = RangeIndex(market_store.all_series())
+            _index_version = version
+        return _index
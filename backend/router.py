@@ -0,0 +1,135 @@
+import re
+import unicodedata
+
+import pandas as pd
+
+from .tool_cache import tool_result_cache
+from .tools.data_retrieval_tools import get_stock_data, get_market_summary, list_available_tickers
+from .tools.analysis_tools import get_asset_analytics
+
+# --- Roteador determinístico de perguntas simples ---
+# Boa parte das perguntas tem uma ferramenta óbvia e argumentos explícitos ("preço da PETR4 hoje",
+# "volume total da bolsa em 2024-09-18", "quais tickers você tem"). Essas perguntas são reconhecidas
+# por padrões, respondidas chamando a ferramenta diretamente (pelo mesmo cache de resultados do
+# agente) e formatadas por um modelo de texto, sem nenhuma chamada ao LLM. Qualquer dúvida (mais de
+# um ticker, período, comparação, termos fora do padrão, resposta de erro da ferramenta) devolve None
+# e a pergunta segue para o agente.
+
+TICKER_PATTERN = re.compile(r"\b([a-z]{4}\d{1,2})(\.sa)?\b")
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+BR_DATE_PATTERN = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+
+# Termos que indicam período, comparação, projeção ou opinião: a pergunta vai para o agente
+COMMON_BLOCKERS = re.compile(
+    r"compar|versus|\bvs\b|\bx\b|projec|previs|futur|volatil|cone|grafico|historic|ontem|semana|\bmes\b|\bmeses\b|\banos?\b|"
+    r"\bdias?\b|desde|entre|periodo|por que|porque|deveria|recomend|comprar|vender|melhor|pior|ranking|"
+    r"\bmaior|\bmenor|\bmais\b|\bmenos\b|subiram|cairam|retorno|performance|intraday|minuto"
+)
+PRICE_TERMS = re.compile(r"\bpreco\b|\bcotacao\b|\bquanto (esta|ta|vale|custa|fechou)|\bvalor\b|\bfechamento\b")
+PRICE_BLOCKERS = re.compile(r"\brsi\b|media|indicador|analise|variacao|\bsubiu\b|\bcaiu\b|\bmedio\b|dividend|valor de mercado")
+ANALYTICS_TERMS = re.compile(r"\brsi\b|sobrecomprad|sobrevendid|indicadores tecnicos|analise tecnica")
+SUMMARY_TERMS = re.compile(r"volume (financeiro )?total|resumo do (mercado|pregao|dia)|volume (negociado )?(da|na) (bolsa|b3)")
+TICKER_LIST_TERMS = re.compile(
+    r"(quais|que|liste|listar|lista (de|dos|das)|mostre)\b.*\b(tickers?|acoes|ativos|papeis|empresas)\b.*"
+    r"\b(tem|possui|disponiveis|conhece|acesso|cobre)\b"
+)
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+
+def _tickers(text: str) -> list:
+    return list(dict.fromkeys(f"{match.group(1).upper()}.SA" for match in TICKER_PATTERN.finditer(text)))
+
+
+def _dates(text: str) -> list:
+    found = [(y, m, d) for y, m, d in ISO_DATE_PATTERN.findall(text)]
+    found += [(y, m, d) for d, m, y in BR_DATE_PATTERN.findall(text)]
+    dates = []
+    for year, month, day in found:
+        try:
+            dates.append(pd.Timestamp(int(year), int(month), int(day)).strftime('%Y-%m-%d'))
+        except ValueError:
+            return []
+    return list(dict.fromkeys(dates))
+
+
+def _format_money(value: float) -> str:
+    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+# Ferramentas com o mesmo cache de resultados usado pelo agente
+_stock_data = tool_result_cache.wrap(get_stock_data)
+_market_summary = tool_result_cache.wrap(get_market_summary)
+_ticker_list = tool_result_cache.wrap(list_available_tickers)
+_asset_analytics = tool_result_cache.wrap(get_asset_analytics)
+
+
+# --- Intenções ---
+
+def _price_answer(ticker: str) -> str | None:
+    records = _stock_data.invoke({"ticker": ticker})
+    # Texto em vez de registros é uma mensagem de erro (ex: ticker sem dados)
+    if isinstance(records, str) or not records:
+        return None
+    latest = records[0]
+    parts = [f"O fechamento mais recente de **{ticker}** foi de **{_format_money(latest['close'])}**, "
+             f"no pregão de {latest['date']}"]
+    if len(records) > 1 and records[1].get('close'):
+        change = latest['close'] / records[1]['close'] - 1
+        parts.append(f" ({f'{change:+.2%}'.replace('.', ',')} em relação ao pregão anterior)")
+    parts.append(".")
+    if latest.get('open') is not None:
+        parts.append(f"\n- **Abertura:** {_format_money(latest['open'])}\n- **Máxima:** {_format_money(latest['high'])}"
+                     f"\n- **Mínima:** {_format_money(latest['low'])}")
+    if latest.get('volume') is not None:
+        parts.append(f"\n- **Volume:** {int(latest['volume']):,} ações".replace(",", "."))
+        parts.append(f" ({_format_money(latest['volume_financeiro'])} negociados)")
+    return "".join(parts)
+
+
+def _summary_answer(date: str) -> str | None:
+    result = _market_summary.invoke({"date": date})
+    return result["analysis"] if isinstance(result, dict) else None
+
+
+def _tickers_answer() -> str | None:
+    result = _ticker_list.invoke({})
+    return None if result.startswith("Ocorreu um erro") else result
+
+
+def _analytics_answer(ticker: str) -> str | None:
+    result = _asset_analytics.invoke({"ticker": ticker})
+    return result if result.startswith("Análise técnica") else None
+
+
+def route_query(question: str) -> str | None:
+    """
+    Responde sem o LLM as perguntas simples reconhecidas com segurança.
+    Retorna a resposta em texto, ou None quando a pergunta deve seguir para o agente.
+    """
+    text = _normalize(question)
+    if COMMON_BLOCKERS.search(text):
+        return None
+
+    tickers, dates = _tickers(text), _dates(text)
+    try:
+        if len(tickers) == 1 and not dates and PRICE_TERMS.search(text) and not PRICE_BLOCKERS.search(text):
+            intent, answer = "preço", _price_answer(tickers[0])
+        elif len(tickers) == 1 and not dates and ANALYTICS_TERMS.search(text):
+            intent, answer = "indicadores", _analytics_answer(tickers[0])
+        elif not tickers and len(dates) == 1 and SUMMARY_TERMS.search(text):
+            intent, answer = "resumo do mercado", _summary_answer(dates[0])
+        elif not tickers and not dates and TICKER_LIST_TERMS.search(text):
+            intent, answer = "lista de tickers", _tickers_answer()
+        else:
+            return None
+    except Exception as e:
+        print(f"⚠️ Roteador: falha ao responder diretamente ({e}); seguindo para o agente.")
+        return None
+
+    if answer is not None:
+        print(f"⚡ Pergunta respondida pelo roteador (intenção: {intent}), sem chamar o agente.")
+    return answer
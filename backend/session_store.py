@@ -0,0 +1,164 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# --- Histórico de conversa por sessão, limitado ---
+# Cada pergunta reenviava ao modelo o histórico inteiro da sessão, que crescia sem limite, assim como
+# o número de sessões em memória. Aqui:
+#   - sessões inativas por mais de SESSION_IDLE_TTL_SECONDS são descartadas, e acima de
+#     SESSION_MAX_SESSIONS sai a usada há mais tempo (LRU);
+#   - cada sessão tem um orçamento de SESSION_TOKEN_BUDGET tokens: os turnos mais antigos que não
+#     cabem nele são condensados em um resumo curto (primeiras frases da pergunta e da resposta),
+#     que ocupa no máximo um quarto do orçamento, e o resumo mais antigo é descartado quando não cabe.
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "3600"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "3000"))
+SUMMARY_QUESTION_CHARS, SUMMARY_ANSWER_CHARS = 150, 300
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Tokens do texto no tokenizador do gpt-4o-mini; sem ele (ex: sem rede para baixá-lo), ~4 caracteres por token."""
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                print(f"⚠️ Tokenizador indisponível ({e}). Usando estimativa de tokens por caracteres.")
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + "…"
+
+
+class _Session:
+    def __init__(self):
+        self.turns = deque()  # (pergunta, resposta, tokens)
+        self.summary = deque()  # (linha, tokens)
+        self.turn_tokens = 0
+        self.summary_tokens = 0
+        self.last_access = time.monotonic()
+
+    @property
+    def tokens(self) -> int:
+        return self.turn_tokens + self.summary_tokens
+
+    def messages(self) -> list:
+        messages = []
+        if self.summary:
+            lines = "\n".join(line for line, _ in self.summary)
+            messages.append(SystemMessage(content=f"Resumo dos turnos anteriores desta conversa:\n{lines}"))
+        for question, answer, _ in self.turns:
+            messages.extend([HumanMessage(content=question), AIMessage(content=answer)])
+        return messages
+
+
+class SessionStore:
+    """Histórico de conversa por sessão com expiração por inatividade, LRU e orçamento de tokens."""
+
+    def __init__(self, idle_ttl_seconds: int = SESSION_IDLE_TTL_SECONDS, max_sessions: int = SESSION_MAX_SESSIONS,
+                 token_budget: int = SESSION_TOKEN_BUDGET):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+        self.condensed_turns = 0
+
+    def _evict(self):
+        # As sessões ficam em ordem de último acesso, então as inativas estão sempre no início
+        now = time.monotonic()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access <= self.idle_ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def _touch(self, session_id: str, create: bool) -> _Session | None:
+        self._evict()
+        session = self._sessions.get(session_id)
+        if session is None and create:
+            session = self._sessions[session_id] = _Session()
+        if session is not None:
+            session.last_access = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _condense(self, session: _Session):
+        # O turno mais recente é mantido inteiro, mesmo que sozinho passe do orçamento
+        while session.tokens > self.token_budget and len(session.turns) > 1:
+            question, answer, tokens = session.turns.popleft()
+            session.turn_tokens -= tokens
+            line = f"- Usuário: {_shorten(question, SUMMARY_QUESTION_CHARS)} | Assistente: {_shorten(answer, SUMMARY_ANSWER_CHARS)}"
+            line_tokens = count_tokens(line)
+            session.summary.append((line, line_tokens))
+            session.summary_tokens += line_tokens
+            self.condensed_turns += 1
+            while session.summary and session.summary_tokens > self.token_budget // 4:
+                session.summary_tokens -= session.summary.popleft()[1]
+
+    def history(self, session_id: str) -> list:
+        """Mensagens a enviar ao modelo para a sessão (resumo dos turnos antigos seguido dos recentes)."""
+        with self._lock:
+            session = self._touch(session_id, create=False)
+            return session.messages() if session is not None else []
+
+    def append_turn(self, session_id: str, question: str, answer):
+        """Registra um turno (pergunta e resposta) e aplica o orçamento de tokens da sessão."""
+        answer = answer if isinstance(answer, str) else str(answer)
+        tokens = count_tokens(question) + count_tokens(answer)
+        with self._lock:
+            session = self._touch(session_id, create=True)
+            session.turns.append((question, answer, tokens))
+            session.turn_tokens += tokens
+            self._condense(session)
+
+    def clear(self, session_id: str | None = None):
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._evict()
+            sessions = list(self._sessions.values())
+            text_bytes = sum(
+                sys.getsizeof(q) + sys.getsizeof(a) for s in sessions for q, a, _ in s.turns
+            ) + sum(sys.getsizeof(line) for s in sessions for line, _ in s.summary)
+            return {
+                "sessions": len(sessions),
+                "turns": sum(len(s.turns) for s in sessions),
+                "tokens": sum(s.tokens for s in sessions),
+                "max_session_tokens": max((s.tokens for s in sessions), default=0),
+                "bytes": text_bytes,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "condensed_turns": self.condensed_turns,
+                "token_budget": self.token_budget,
+            }
+
+
+# Instância compartilhada pelas consultas ao agente
+session_store = SessionStore()
@@ -0,0 +1,99 @@
+from typing import Iterator
+
+import numpy as np
+
+from .config import supabase
+
+# --- Leitura paginada e em streaming de 'acoes_historico' ---
+# O PostgREST limita a quantidade de linhas por resposta, então um único .execute() pode truncar
+# o resultado silenciosamente. Este leitor percorre a tabela com paginação por chave (keyset) em
+# (ticker, date): cada página pede as linhas estritamente após a última chave recebida. Ao contrário
+# de OFFSET, o custo de cada página não cresce com a posição e o limite do servidor não causa perdas.
+CHUNK_SIZE = 1000
+NUMERIC_COLUMNS = ("open", "high", "low", "close", "volume", "adj_close")
+
+
+def _quote(value: str) -> str:
+    # Valores entre aspas permitem caracteres reservados do PostgREST (como '.' em 'PETR4.SA')
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+def _to_columns(rows: list, columns: tuple) -> dict:
+    chunk = {
+        'ticker': np.array([row['ticker'] for row in rows], dtype=object),
+        'date': np.array([str(row['date'])[:10] for row in rows], dtype='datetime64[D]'),
+    }
+    for name in columns:
+        if name in NUMERIC_COLUMNS:
+            chunk[name] = np.array([np.nan if row[name] is None else row[name] for row in rows], dtype=np.float64)
+        elif name not in chunk:
+            chunk[name] = np.array([row[name] for row in rows], dtype=object)
+    return chunk
+
+
+def iter_acoes_historico(
+    columns: tuple = NUMERIC_COLUMNS,
+    tickers: list | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[dict]:
+    """
+    Percorre 'acoes_historico' em ordem de (ticker, date), gerando blocos colunares.
+
+    Args:
+        columns: Colunas a buscar além de 'ticker' e 'date' (sempre incluídas, pois formam a chave).
+        tickers: Filtro opcional de tickers (usa 'in').
+        start_date / end_date: Filtros opcionais de período (inclusivos), no formato 'AAAA-MM-DD'.
+        chunk_size: Tamanho de página pedido ao servidor.
+
+    Yields:
+        dict: Um bloco por página, com arrays NumPy por coluna ('ticker' e 'date' incluídos).
+    """
+    select = ", ".join(['ticker', 'date'] + [c for c in columns if c not in ('ticker', 'date')])
+    last_key = None
+
+    while True:
+        query = supabase.table('acoes_historico').select(select)
+        if tickers is not None:
+            query = query.in_('ticker', list(tickers))
+        if start_date:
+            query = query.gte('date', start_date)
+        if end_date:
+            query = query.lte('date', end_date)
+        if last_key is not None:
+            ticker, date = last_key
+            query = query.or_(f"ticker.gt.{_quote(ticker)},and(ticker.eq.{_quote(ticker)},date.gt.{date})")
+
+        response = query.order('ticker').order('date').limit(chunk_size).execute()
+        if not response.data:
+            return
+
+        last_row = response.data[-1]
+        last_key = (last_row['ticker'], str(last_row['date'])[:10])
+        yield _to_columns(response.data, columns)
+
+
+def iter_ticker_histories(**kwargs) -> Iterator[tuple]:
+    """
+    Agrupa os blocos de iter_acoes_historico por ticker, gerando (ticker, colunas) um ticker por vez.
+    A memória fica limitada ao histórico de um único ticker, independentemente do tamanho da tabela.
+    """
+    current, parts = None, []
+
+    def flush():
+        return current, {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+    for chunk in iter_acoes_historico(**kwargs):
+        boundaries = np.flatnonzero(chunk['ticker'][1:] != chunk['ticker'][:-1]) + 1
+        for piece_start, piece_end in zip(np.r_[0, boundaries], np.r_[boundaries, len(chunk['ticker'])]):
+            ticker = chunk['ticker'][piece_start]
+            piece = {name: values[piece_start:piece_end] for name, values in chunk.items()}
+            if current is not None and ticker != current:
+                yield flush()
+                parts = []
+            current = ticker
+            parts.append(piece)
+
+    if parts:
+        yield flush()
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from langchain.agents import BaseMultiActionAgent
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.tools import Tool
+
+from backend import concurrent_executor
+from backend.concurrent_executor import ConcurrentAgentExecutor
+
+# O executor sobrescreve métodos internos do AgentExecutor (_iter_next_step e _perform_agent_action),
+# então estes testes protegem o comportamento contra mudanças de versão do LangChain: as chamadas de
+# um mesmo passo precisam rodar sobrepostas e as observações voltar na ordem pedida pelo modelo.
+
+TOOL_SECONDS = 0.3
+
+
+class ScriptedAgent(BaseMultiActionAgent):
+    """Agente roteirizado: pede todas as ações de uma vez no primeiro passo e termina no segundo."""
+
+    actions: list
+
+    @property
+    def input_keys(self):
+        return ["input"]
+
+    def plan(self, intermediate_steps, callbacks=None, **kwargs):
+        if not intermediate_steps:
+            return self.actions
+        return AgentFinish({"output": "ok"}, log="")
+
+    async def aplan(self, intermediate_steps, callbacks=None, **kwargs):
+        return self.plan(intermediate_steps, callbacks, **kwargs)
+
+
+def _slow_tool(name: str, intervals: dict, lock: threading.Lock) -> Tool:
+    def run(query: str) -> str:
+        start = time.perf_counter()
+        # O primeiro pedido demora mais, para que terminar fora de ordem não mude a ordem dos resultados
+        time.sleep(TOOL_SECONDS * (2 if query == "a" else 1))
+        with lock:
+            intervals[query] = (start, time.perf_counter())
+        return f"{name}:{query}"
+
+    return Tool(name=name, func=run, description=f"Ferramenta lenta {name}.")
+
+
+def _run(queries: list) -> tuple:
+    intervals, lock = {}, threading.Lock()
+    tool = _slow_tool("lenta", intervals, lock)
+    actions = [AgentAction(tool="lenta", tool_input=q, log="") for q in queries]
+    executor = ConcurrentAgentExecutor(agent=ScriptedAgent(actions=actions), tools=[tool],
+                                       return_intermediate_steps=True)
+    start = time.perf_counter()
+    result = executor.invoke({"input": "pergunta"})
+    return result, intervals, time.perf_counter() - start
+
+
+def test_observations_keep_requested_order():
+    result, _, _ = _run(["a", "b", "c"])
+
+    assert result["output"] == "ok"
+    assert [action.tool_input for action, _ in result["intermediate_steps"]] == ["a", "b", "c"]
+    assert [observation for _, observation in result["intermediate_steps"]] == ["lenta:a", "lenta:b", "lenta:c"]
+
+
+def test_tool_calls_from_one_step_overlap():
+    _, intervals, elapsed = _run(["a", "b", "c"])
+
+    # Todas as chamadas começaram antes de qualquer uma terminar
+    assert max(start for start, _ in intervals.values()) < min(end for _, end in intervals.values())
+    # O passo leva o tempo da chamada mais lenta (2x), e não a soma (4x)
+    assert elapsed < TOOL_SECONDS * 3
+
+
+def test_single_action_runs_inline(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(concurrent_executor._tool_pool, "submit",
+                        lambda *args, **kwargs: submitted.append(args) or None)
+
+    result, _, _ = _run(["b"])
+
+    assert [observation for _, observation in result["intermediate_steps"]] == ["lenta:b"]
+    assert submitted == []
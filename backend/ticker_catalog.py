@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+
+from .config import supabase
+from .dataset_version import current_dataset_version
+from .market_store import market_store, format_day
+from .query_cache import query_cache
+
+# --- Catálogo de tickers ---
+# Mantido pelo ETL (etl/catalog.py) na tabela 'ticker_catalog': uma linha por ticker com primeira e
+# última data, quantidade de linhas e horário da última atualização. Ler o catálogo custa uma consulta
+# pequena e de tamanho fixo, em vez de varrer 'acoes_historico' inteira.
+CATALOG_TABLE = 'ticker_catalog'
+
+
+def _catalog_from_store() -> list:
+    """Monta o catálogo a partir do armazenamento local, caso a tabela ainda não tenha sido populada."""
+    updated_at = datetime.fromtimestamp(market_store.synced_at, timezone.utc).isoformat()
+    return [
+        {
+            "ticker": ticker,
+            "first_date": format_day(series.date[0]),
+            "last_date": format_day(series.date[-1]),
+            "row_count": len(series),
+            "updated_at": updated_at,
+        }
+        for ticker, series in sorted(market_store.all_series().items())
+        if len(series)
+    ]
+
+
+def _load_catalog() -> list:
+    try:
+        response = supabase.table(CATALOG_TABLE) \
+            .select("ticker, first_date, last_date, row_count, updated_at") \
+            .order('ticker') \
+            .execute()
+        if response.data:
+            return response.data
+        print("⚠️ Catálogo de tickers vazio. Usando o armazenamento local.")
+    except Exception as e:
+        print(f"⚠️ Não foi possível ler o catálogo de tickers ({e}). Usando o armazenamento local.")
+    return _catalog_from_store()
+
+
+def get_ticker_catalog() -> list:
+    """Retorna o catálogo de tickers (ordenado por ticker), em cache até a próxima carga do ETL."""
+    return query_cache.get_or_compute(('ticker_catalog', current_dataset_version()), _load_catalog)
@@ -0,0 +1,148 @@
+import functools
+import inspect
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from .dataset_version import current_dataset_version
+from .market_store import market_store
+from .query_cache import QueryCache
+
+# --- Memoização dos resultados das ferramentas do agente ---
+# O prompt pede ao modelo que não repita chamadas, mas nada garantia isso: cada chamada refazia a
+# consulta, na mesma execução, em turnos seguintes e entre usuários diferentes. Cada ferramenta do
+# agente é envolvida por um cache indexado pelo nome da ferramenta, pelos argumentos normalizados
+# (ticker limpo, datas no formato 'AAAA-MM-DD', valores padrão preenchidos) e pelas versões dos dados:
+# a do snapshot servido pelo armazenamento local e a publicada pelo ETL, que também vale para as
+# ferramentas que leem tabelas remotas (resumo diário, catálogo), mesmo que a ressincronização do
+# armazenamento local falhe. Chamadas idênticas simultâneas esperam a primeira terminar.
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+TOOL_CACHE_TTL_SECONDS = int(os.getenv("TOOL_CACHE_TTL_SECONDS", "3600"))
+
+# Ferramentas cujo resultado não depende só dos dados (hora atual) ou que têm efeito colateral
+UNCACHED_TOOLS = {"get_current_datetime", "notify_developer_of_missing_tool"}
+# As ferramentas devolvem falhas inesperadas como texto com este prefixo; essas respostas não são guardadas
+TRANSIENT_ERROR_PREFIX = "Ocorreu um erro"
+
+
+def _clean_ticker(value) -> str:
+    match = re.search(r"([A-Z0-9]+\.SA)", str(value).upper())
+    return match.group(1) if match else str(value).strip().upper()
+
+
+def _clean_date(value):
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return pd.Timestamp(str(value).strip()).strftime('%Y-%m-%d')
+    except ValueError:
+        return str(value).strip()
+
+
+def normalize_arguments(tool_name: str, arguments: dict) -> tuple:
+    """Forma canônica dos argumentos de uma chamada, usada na chave do cache."""
+    normalized = {}
+    for name, value in arguments.items():
+        if name == 'ticker':
+            value = _clean_ticker(value)
+        elif name == 'tickers':
+            value = tuple(dict.fromkeys(_clean_ticker(t) for t in value))
+        elif name == 'date' or name.endswith('_date'):
+            value = _clean_date(value)
+        elif isinstance(value, str):
+            value = value.strip()
+        normalized[name] = value
+
+    # get_stock_data ignora um período incompleto e devolve os pregões mais recentes
+    if tool_name == 'get_stock_data' and not (normalized.get('start_date') and normalized.get('end_date')):
+        normalized['start_date'] = normalized['end_date'] = None
+    return tuple(sorted(normalized.items()))
+
+
+class ToolResultCache:
+    """Cache LRU com validade (TTL) dos resultados das ferramentas, com contadores por ferramenta."""
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES, ttl_seconds: int = TOOL_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._cache = QueryCache(max_entries=max_entries)
+        self._counters: dict[str, dict] = {}
+        self._in_flight: dict[tuple, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, tool_name: str, outcome: str):
+        with self._lock:
+            counters = self._counters.setdefault(tool_name, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def _lookup(self, key):
+        entry = self._cache.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry
+
+    def call(self, tool_name: str, arguments: dict, compute):
+        """Retorna o resultado em cache para a chamada ou executa compute() e guarda o resultado."""
+        key = (tool_name, market_store.version, current_dataset_version(), normalize_arguments(tool_name, arguments))
+        while True:
+            entry = self._lookup(key)
+            if entry is not None:
+                self._count(tool_name, "hits")
+                return entry[0]
+            with self._lock:
+                waiting = self._in_flight.get(key)
+                if waiting is None:
+                    self._in_flight[key] = threading.Event()
+                    break
+            # Outra thread está calculando a mesma chamada: espera e relê o cache
+            waiting.wait()
+
+        self._count(tool_name, "misses")
+        try:
+            value = compute()
+            if not (isinstance(value, str) and value.startswith(TRANSIENT_ERROR_PREFIX)):
+                self._cache.put(key, (value, time.monotonic() + self.ttl_seconds))
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key).set()
+
+    def wrap(self, tool):
+        """Retorna uma cópia da ferramenta LangChain com o resultado memoizado (ou a própria, se não cacheável)."""
+        if tool.name in UNCACHED_TOOLS:
+            return tool
+        original = tool.func
+        signature = inspect.signature(original)
+
+        @functools.wraps(original)
+        def memoized(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return self.call(tool.name, dict(bound.arguments), lambda: original(*args, **kwargs))
+
+        return tool.model_copy(update={"func": memoized})
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            tools = {name: dict(counters) for name, counters in self._counters.items()}
+        hits = sum(c["hits"] for c in tools.values())
+        misses = sum(c["misses"] for c in tools.values())
+        cache = self._cache.stats()
+        return {
+            "entries": cache["entries"],
+            "bytes": cache["bytes"],
+            "evictions": cache["evictions"],
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "tools": tools,
+        }
+
+
+# Instância compartilhada pelas ferramentas do agente
+tool_result_cache = ToolResultCache()
@@ -1,10 +1,20 @@
+import re
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 from langchain.agents import tool
 from typing import List
 
-# Importa a ferramenta de busca de dados para ser reutilizada aqui
-from .data_retrieval_tools import get_stock_data
+# Importa o motor de indicadores e a matriz de preços compartilhados
+from ..indicators import get_indicator_snapshot
+from ..indicator_state import get_daily_indicators, RSI_PERIOD, SMA_PERIOD
+from ..price_matrix import fetch_price_matrix
+
+
+def _clean_ticker(ticker: str) -> str:
+    """Normaliza o ticker para o formato do banco (ex: "petr4.sa" -> "PETR4.SA")."""
+    match = re.search(r"([A-Z0-9]+\.SA)", str(ticker).upper())
+    return match.group(1) if match else str(ticker).upper()
+
 
 # --- Ferramentas de Análise Técnica e Comparativa ---
 
@@ -17,28 +27,25 @@ def get_asset_analytics(ticker: str, rsi_period: int = 14, sma_period: int = 21)
     """
     print(f"🤖 Ferramenta 'get_asset_analytics' chamada para {ticker} com RSI({rsi_period}) e SMA({sma_period}).")
 
-    # 1. Obter os dados usando a função da ferramenta existente diretamente
-    historical_data = get_stock_data.func(ticker=ticker)
+    cleaned_ticker = _clean_ticker(ticker)
+
+    # 1. Nos períodos padrão, ler o estado incremental do ticker (O(1)); em outros períodos,
+    #    ler a saída do motor vetorizado (calculada uma vez para todo o universo por versão dos dados)
+    if rsi_period == RSI_PERIOD and sma_period == SMA_PERIOD:
+        latest = get_daily_indicators(cleaned_ticker)
+    else:
+        latest = get_indicator_snapshot(rsi_period=rsi_period, sma_period=sma_period).latest(cleaned_ticker)
     
-    if isinstance(historical_data, str) and "Nenhum dado encontrado" in historical_data:
+    if latest is None:
         return f"Não foi possível calcular os indicadores para {ticker} porque não foram encontrados dados históricos."
 
-    if not isinstance(historical_data, list) or len(historical_data) < sma_period:
+    if np.isnan(latest['sma']) or np.isnan(latest['rsi']):
          return f"Dados históricos insuficientes para {ticker} para calcular a SMA de {sma_period} dias."
 
-    # 2. Converter para DataFrame do Pandas e preparar os dados
-    df = pd.DataFrame(historical_data)
-    df = df.sort_values(by='date', ascending=True) # Garante a ordem cronológica
-    df.set_index('date', inplace=True)
-    
-    # 3. Calcular os indicadores usando pandas_ta
-    df.ta.rsi(length=rsi_period, append=True)
-    df.ta.sma(length=sma_period, append=True)
-    
-    # 4. Obter os valores mais recentes
-    latest_rsi = df[f'RSI_{rsi_period}'].iloc[-1]
-    latest_sma = df[f'SMA_{sma_period}'].iloc[-1]
-    latest_close = df['close'].iloc[-1]
+    # 2. Obter os valores mais recentes
+    latest_rsi = latest['rsi']
+    latest_sma = latest['sma']
+    latest_close = latest['close']
     
     # 5. Gerar uma análise textual
     rsi_interpretation = "neutro"
@@ -53,11 +60,19 @@ def get_asset_analytics(ticker: str, rsi_period: int = 14, sma_period: int = 21)
 
     # Constrói a resposta em Markdown de forma mais limpa
     analysis_parts = [
-        f"Análise técnica para **{ticker}**:",
+        f"Análise técnica para **{cleaned_ticker}**:",
         f"- **Preço de Fechamento Mais Recente:** R$ {latest_close:,.2f}",
         f"- **Média Móvel Simples ({sma_period} dias):** R$ {latest_sma:,.2f}. O preço atual está {sma_interpretation} da média.",
         f"- **Índice de Força Relativa (RSI, {rsi_period} dias):** O ativo está em território {rsi_interpretation}"
     ]
+    if not np.isnan(latest['macd_signal']):
+        macd_direction = "acima" if latest['macd'] > latest['macd_signal'] else "abaixo"
+        analysis_parts.append(f"- **MACD (12, 26, 9):** {latest['macd']:.2f}, {macd_direction} da linha de sinal ({latest['macd_signal']:.2f}).")
+    if not np.isnan(latest['bb_upper']):
+        analysis_parts.append(f"- **Bandas de Bollinger (20, 2):** de R$ {latest['bb_lower']:,.2f} a R$ {latest['bb_upper']:,.2f}.")
+    if not np.isnan(latest['atr']):
+        analysis_parts.append(f"- **ATR (14 dias):** R$ {latest['atr']:,.2f} de amplitude média diária.")
+    analysis_parts.append(f"(Dados até {latest['date']}.)")
     analysis = "\n".join(analysis_parts)
     
     return analysis
@@ -70,35 +85,37 @@ def compare_assets(tickers: List[str], start_date: str, end_date: str) -> str:
     """
     print(f"🤖 Ferramenta 'compare_assets' chamada para {tickers} entre {start_date} e {end_date}.")
     
-    all_data = {}
+    # Normaliza os tickers (ex: "petr4.sa" -> "PETR4.SA") e remove duplicados mantendo a ordem
+    cleaned_tickers = []
     for ticker in tickers:
-        # Chama a função interna da ferramenta diretamente
-        data = get_stock_data.func(ticker=ticker, start_date=start_date, end_date=end_date)
-        if isinstance(data, list) and data:
-            df = pd.DataFrame(data)
-            df['date'] = pd.to_datetime(df['date'])
-            df.set_index('date', inplace=True)
-            all_data[ticker] = df['close']
+        cleaned = _clean_ticker(ticker)
+        if cleaned not in cleaned_tickers:
+            cleaned_tickers.append(cleaned)
+
+    # Uma única leitura para todos os tickers, já alinhada por data e ajustada por proventos
+    dates, found_tickers, prices = fetch_price_matrix(cleaned_tickers, start_date, end_date, adjusted=True)
     
-    if len(all_data) < 2:
+    if len(found_tickers) < 2:
         return "Não foi possível realizar a comparação pois dados suficientes foram encontrados para menos de dois dos tickers solicitados."
 
-    # Cria um único DataFrame com o preço de fechamento de todos os ativos
-    comparison_df = pd.DataFrame(all_data).sort_index()
-    comparison_df.dropna(inplace=True) # Garante que só temos datas onde todos os ativos negociaram
+    # Garante que só temos datas onde todos os ativos negociaram
+    prices = prices[~np.isnan(prices).any(axis=1)]
+
+    if len(prices) < 2:
+        return "Não foi possível realizar a comparação pois os ativos não têm pregões em comum suficientes no período."
 
     # 1. Cálculo de Performance
-    performance = (comparison_df.iloc[-1] / comparison_df.iloc[0]) - 1
+    performance = pd.Series(prices[-1] / prices[0] - 1, index=found_tickers)
     
     # 2. Cálculo de Volatilidade (desvio padrão dos retornos diários)
-    returns = comparison_df.pct_change()
-    volatility = returns.std() * (252**0.5) # Volatilidade anualizada
+    returns = prices[1:] / prices[:-1] - 1
+    volatility = pd.Series(returns.std(axis=0, ddof=1) * (252**0.5), index=found_tickers) # Volatilidade anualizada
 
     # 3. Cálculo de Correlação
-    correlation_matrix = returns.corr()
+    correlation_matrix = pd.DataFrame(np.corrcoef(returns, rowvar=False), index=found_tickers, columns=found_tickers)
 
     # 4. Montar a análise final
-    analysis = f"Análise Comparativa entre {', '.join(tickers)} de {start_date} a {end_date}:\n\n"
+    analysis = f"Análise Comparativa entre {', '.join(found_tickers)} de {start_date} a {end_date}:\n\n"
     
     analysis += "**Performance no Período:**\n"
     for ticker, perf in performance.items():
@@ -115,3 +132,36 @@ def compare_assets(tickers: List[str], start_date: str, end_date: str) -> str:
     analysis += f"**Conclusão:** No período analisado, **{winner}** teve a melhor performance com um retorno de **{performance[winner]:+.2%}**."
     
     return analysis
+
+
+@tool
+def screen_technical_signals(rsi_period: int = 14, sma_period: int = 21, top_n: int = 10) -> str:
+    """
+    Varre todas as ações disponíveis e lista as que estão sobrecompradas (RSI acima de 70) ou sobrevendidas (RSI abaixo de 30),
+    além de quantas estão acima ou abaixo da sua média móvel simples.
+    Use esta ferramenta para perguntas sobre o mercado inteiro, como "quais ações estão sobrecompradas?" ou "quantas ações estão acima da média de 21 dias?".
+    """
+    print(f"🤖 Ferramenta 'screen_technical_signals' chamada com RSI({rsi_period}), SMA({sma_period}) e top_n={top_n}.")
+
+    snapshot = get_indicator_snapshot(rsi_period=rsi_period, sma_period=sma_period)
+    rsi_values = pd.Series(snapshot.column('rsi')).dropna()
+    close = pd.Series(snapshot.column('close'))
+    sma_values = pd.Series(snapshot.column('sma')).dropna()
+
+    if rsi_values.empty:
+        return "Não há dados suficientes para calcular os indicadores do mercado."
+
+    overbought = rsi_values[rsi_values > 70].sort_values(ascending=False).head(top_n)
+    oversold = rsi_values[rsi_values < 30].sort_values().head(top_n)
+    above_sma = int((close[sma_values.index] > sma_values).sum())
+
+    def _format(series: pd.Series) -> str:
+        return ", ".join(f"{ticker} ({value:.2f})" for ticker, value in series.items()) or "nenhuma"
+
+    analysis_parts = [
+        f"Varredura técnica de {len(rsi_values)} ações:",
+        f"- **Sobrecompradas (RSI {rsi_period} > 70):** {_format(overbought)}",
+        f"- **Sobrevendidas (RSI {rsi_period} < 30):** {_format(oversold)}",
+        f"- **Acima da SMA de {sma_period} dias:** {above_sma} de {len(sma_values)} ações.",
+    ]
+    return "\n".join(analysis_parts)
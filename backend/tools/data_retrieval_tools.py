@@ -1,15 +1,19 @@
 import re
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
 from langchain.agents import tool
 from datetime import datetime
 import pytz
 
-# --- Importar a configuração centralizada ---
+# --- Importar o armazenamento local (sincronizado com o Supabase) ---
 # Esta importação assume que a estrutura de pastas permite a referência relativa.
 # Se executado como um script autônomo, pode precisar de ajuste no sys.path.
-from ..config import supabase
+from ..market_store import market_store, format_day
+from ..query_cache import query_cache
+from ..ticker_catalog import get_ticker_catalog
+from ..market_summary import get_market_day
+from ..range_index import get_range_index
+from ..volatility_cone import get_volatility_cone_data
 
 
 # --- Ferramentas de Busca e Recuperação de Dados ---
@@ -33,38 +37,39 @@ def get_stock_data(ticker: str, start_date: str | None = None, end_date: str | N
     print(f"✨ Ticker limpo para a consulta: {cleaned_ticker}")
     
     try:
-        query = supabase.table('acoes_historico').select("date, open, high, low, close, volume").eq('ticker', cleaned_ticker)
-
-        # Lógica de busca aprimorada
-        if start_date and end_date:
-            query = query.gte('date', start_date).lte('date', end_date)
-        
-        response = query.order('date', desc=True).limit(252).execute()
-
-        # Se nenhum dado for encontrado para o período específico, busque o mais recente
-        if not response.data:
-            print(f"⚠️ Nenhum dado para '{cleaned_ticker}' no período. Buscando o pregão mais recente...")
-            fallback_response = supabase.table('acoes_historico') \
-                .select("date, open, high, low, close, volume") \
-                .eq('ticker', cleaned_ticker) \
-                .order('date', desc=True) \
-                .limit(1) \
-                .execute()
-            
-            if not fallback_response.data:
-                return f"Nenhum dado encontrado para o ticker {cleaned_ticker}."
-            
-            response = fallback_response
-            print(f"✅ Encontrado dado mais recente em: {response.data[0]['date']}")
-
-
-        df = pd.DataFrame(response.data)
-        df['volume_financeiro'] = df['close'] * df['volume']
-        return df.to_dict(orient='records')
+        # Consultas sem período completo retornam sempre os pregões mais recentes
+        if not (start_date and end_date):
+            start_date = end_date = None
+
+        cache_key = ('get_stock_data', market_store.version, cleaned_ticker, start_date, end_date)
+        return query_cache.get_or_compute(
+            cache_key, lambda: _build_stock_records(cleaned_ticker, start_date, end_date)
+        )
         
     except Exception as e:
         return f"Ocorreu um erro ao buscar os dados: {e}"
 
+
+def _build_stock_records(cleaned_ticker: str, start_date: str | None, end_date: str | None):
+    """Monta os registros OHLCV (mais recentes primeiro) de um ticker a partir do armazenamento local."""
+    series = market_store.series(cleaned_ticker)
+    if series is None or not len(series):
+        return f"Nenhum dado encontrado para o ticker {cleaned_ticker}."
+
+    # Lógica de busca aprimorada
+    selected = series.between(start_date, end_date) if start_date and end_date else series
+    selected = selected.tail(252)
+
+    # Se nenhum dado for encontrado para o período específico, busque o mais recente
+    if not len(selected):
+        print(f"⚠️ Nenhum dado para '{cleaned_ticker}' no período. Buscando o pregão mais recente...")
+        selected = series.tail(1)
+        print(f"✅ Encontrado dado mais recente em: {format_day(selected.date[0])}")
+
+    df = pd.DataFrame(selected.to_records(descending=True))
+    df['volume_financeiro'] = df['close'] * df['volume']
+    return df.to_dict(orient='records')
+
 @tool
 def get_volatility_cone(ticker: str, days_to_predict: int = 30):
     """
@@ -80,57 +85,8 @@ def get_volatility_cone(ticker: str, days_to_predict: int = 30):
     cleaned_ticker = match.group(1)
 
     try:
-        response = supabase.table('acoes_historico').select("date, close") \
-            .eq('ticker', cleaned_ticker) \
-            .order('date', desc=False) \
-            .limit(252) \
-            .execute()
-
-        if not response.data or len(response.data) < 20:
-            return f"Dados históricos insuficientes para calcular a volatilidade para {cleaned_ticker}. São necessários pelo menos 20 dias."
-
-        df = pd.DataFrame(response.data)
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', inplace=True)
-        
-        df['log_return'] = np.log(df['close'] / df['close'].shift(1))
-        
-        annual_volatility = df['log_return'].std() * np.sqrt(252)
-        
-        X = np.arange(len(df)).reshape(-1, 1)
-        y = df['close'].values
-        
-        model = LinearRegression()
-        model.fit(X, y)
-        
-        last_date = df.index[-1]
-        future_dates = pd.to_datetime([last_date + pd.DateOffset(days=i) for i in range(1, days_to_predict + 1)])
-        future_X = np.arange(len(df), len(df) + days_to_predict).reshape(-1, 1)
-        
-        future_prices = model.predict(future_X)
-        
-        historical_data = df.reset_index()[['date', 'close']].to_dict(orient='records')
-
-        cone_data = []
-        for i in range(days_to_predict):
-            days_ahead = i + 1
-            std_dev = annual_volatility * np.sqrt(days_ahead / 252)
-            price = future_prices[i]
-            
-            cone_data.append({
-                'date': future_dates[i].strftime('%Y-%m-%d'),
-                'predicted_price': price,
-                'upper_bound_95': price * (1 + 1.96 * std_dev),
-                'lower_bound_95': price * (1 - 1.96 * std_dev),
-                'upper_bound_70': price * (1 + 1.04 * std_dev),
-                'lower_bound_70': price * (1 - 1.04 * std_dev),
-            })
-
-        return {
-            "historical": historical_data,
-            "cone": cone_data,
-            "analysis": f"A volatilidade anualizada calculada para {cleaned_ticker} é de {annual_volatility:.2%}. Com base na tendência linear, projetamos os preços para os próximos {days_to_predict} dias com bandas de confiança de 70% e 95%."
-        }
+        # O cone é calculado uma vez por ticker, horizonte e versão dos dados
+        return get_volatility_cone_data(cleaned_ticker, days_to_predict)
 
     except Exception as e:
         return f"Ocorreu um erro ao calcular o cone de volatilidade: {e}"
@@ -139,48 +95,42 @@ def get_volatility_cone(ticker: str, days_to_predict: int = 30):
 @tool
 def get_market_summary(date: str):
     """
-    Calcula o volume financeiro total negociado em um dia específico.
-    Se não encontrar dados para a data fornecida, busca automaticamente o último dia com dados disponíveis e informa o usuário.
+    Calcula o volume financeiro total negociado em um dia específico, o volume total e quantas ações subiram ou caíram.
+    Se não houver pregão na data fornecida, usa automaticamente o pregão anterior mais próximo e informa o usuário.
     Use para perguntas sobre o mercado geral, como 'volume total da bolsa'. Formato da data: 'AAAA-MM-DD'.
     """
     print(f"🤖 Ferramenta 'get_market_summary' chamada para a data: {date}")
 
     try:
-        response = supabase.table('acoes_historico').select("date, close, volume").eq('date', date).execute()
-
-        # Lógica de fallback se a data específica não retornar dados
-        if not response.data:
-            print(f"⚠️ Nenhum dado de mercado encontrado para {date}. Buscando a data mais recente...")
-            latest_date_response = supabase.table('acoes_historico').select("date").order('date', desc=True).limit(1).execute()
-            
-            if not latest_date_response.data:
-                return "Não há nenhum dado histórico no banco de dados."
-            
-            latest_date = latest_date_response.data[0]['date']
-            print(f"✅ Última data com dados encontrada: {latest_date}")
-            
-            response = supabase.table('acoes_historico').select("date, close, volume").eq('date', latest_date).execute()
-            date = latest_date # Atualiza a data para a que foi realmente usada
-
-        df = pd.DataFrame(response.data)
-        df.dropna(subset=['close', 'volume'], inplace=True)
-
-        if df.empty:
-            return f"Os dados para {date} estão incompletos e não foi possível calcular o volume."
-
-        total_volume_financeiro = (df['close'] * df['volume']).sum()
-        formatted_volume = f"R$ {total_volume_financeiro:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-        analysis_text = f"O volume financeiro total negociado em {date}, com base em {len(df)} tickers, foi de {formatted_volume}."
+        summary = get_market_day(date)
+
+        if summary is None:
+            return f"Não há nenhum dado histórico no banco de dados até {date}."
+
+        session_date = str(summary['date'])
+        if summary['tickers_count'] == 0:
+            return f"Os dados para {session_date} estão incompletos e não foi possível calcular o volume."
+
+        formatted_volume = f"R$ {summary['total_volume_financeiro']:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        formatted_shares = f"{int(summary['total_volume']):,}".replace(",", ".")
+
+        analysis_text = (
+            f"O volume financeiro total negociado em {session_date}, com base em {summary['tickers_count']} tickers, foi de {formatted_volume} "
+            f"({formatted_shares} ações). {summary['advancers']} ações fecharam em alta e {summary['decliners']} em baixa."
+        )
         
         # Adiciona um aviso se a data usada for diferente da solicitada
-        if date != locals().get('original_date', date):
-             analysis_text = f"Não foram encontrados dados para a data solicitada. O resumo do último pregão disponível ({date}) é o seguinte: " + analysis_text
+        if session_date != date:
+             print(f"⚠️ Nenhum dado de mercado encontrado para {date}. Usando o pregão anterior mais próximo: {session_date}")
+             analysis_text = f"Não foram encontrados dados para a data solicitada. O resumo do pregão anterior mais próximo ({session_date}) é o seguinte: " + analysis_text
 
         return {
-            "date": date,
+            "date": session_date,
             "total_volume_financeiro": formatted_volume,
-            "tickers_considerados": len(df),
+            "total_volume": formatted_shares,
+            "tickers_considerados": summary['tickers_count'],
+            "altas": summary['advancers'],
+            "baixas": summary['decliners'],
             "analysis": analysis_text
         }
         
@@ -192,42 +142,33 @@ def get_market_summary(date: str):
 def get_top_stocks_by_criteria(start_date: str, end_date: str, criteria: str = 'volume_financeiro', top_n: int = 5):
     """
     Analisa todas as ações em um período e retorna um ranking das 'top_n' melhores com base em um critério.
-    Use esta ferramenta para perguntas comparativas ou de ranking, como 'qual ação teve o maior volume' ou 'quais as 5 ações com maior volume financeiro'.
-    O critério pode ser 'volume_financeiro' ou 'volume'.
+    Use esta ferramenta para perguntas comparativas ou de ranking, como 'qual ação teve o maior volume', 'quais as 5 ações com maior volume financeiro' ou 'quais ações mais subiram'.
+    O critério pode ser 'volume_financeiro', 'volume', 'retorno' (variação do preço no período), 'volatilidade' (anualizada) ou 'giro_medio' (volume financeiro médio por pregão).
     As datas devem estar no formato 'AAAA-MM-DD'.
     """
     print(f"🤖 Ferramenta 'get_top_stocks_by_criteria' chamada com: start_date={start_date}, end_date={end_date}, criteria={criteria}, top_n={top_n}")
 
-    if criteria not in ['volume_financeiro', 'volume']:
-        return f"Critério '{criteria}' inválido. Use 'volume_financeiro' ou 'volume'."
+    if criteria not in RANKING_CRITERIA:
+        return f"Critério '{criteria}' inválido. Use um destes: {', '.join(RANKING_CRITERIA)}."
 
     try:
-        response = supabase.table('acoes_historico') \
-            .select("ticker, close, volume") \
-            .gte('date', start_date) \
-            .lte('date', end_date) \
-            .execute()
+        index = get_range_index()
+        i, j = index.bounds(start_date, end_date)
 
-        if not response.data:
+        if i >= j:
             return f"Nenhum dado encontrado no período de {start_date} a {end_date}."
 
-        df = pd.DataFrame(response.data)
-        df.dropna(subset=['close', 'volume'], inplace=True)
+        values = RANKING_CRITERIA[criteria](index, i, j)
+        available = ~np.isnan(values) & (index.sessions(i, j) > 0)
 
-        if df.empty:
+        if not available.any():
             return "Os dados para o período estão incompletos."
 
-        if criteria == 'volume_financeiro':
-            df['criteria_value'] = df['close'] * df['volume']
-        else:
-            df['criteria_value'] = df['volume']
-
-        ranking = df.groupby('ticker')['criteria_value'].sum().sort_values(ascending=False).head(top_n)
+        ranking = pd.Series(values[available], index=index.tickers[available]).sort_values(ascending=False).head(top_n)
 
         ranking_list = []
         for ticker, value in ranking.items():
-            formatted_value = f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") if criteria == 'volume_financeiro' else f"{int(value):,}".replace(",",".")
-            ranking_list.append(f"{ticker}: {formatted_value}")
+            ranking_list.append(f"{ticker}: {_format_ranking_value(criteria, value)}")
 
         return {
             "period": f"{start_date} a {end_date}",
@@ -240,6 +181,26 @@ def get_top_stocks_by_criteria(start_date: str, end_date: str, criteria: str = '
         return f"Ocorreu um erro ao gerar o ranking: {e}"
 
 
+# Cada critério de ranking é calculado sobre o índice de somas de prefixo para o intervalo [i, j)
+RANKING_CRITERIA = {
+    'volume_financeiro': lambda index, i, j: index.financial_volume(i, j),
+    'volume': lambda index, i, j: index.volume(i, j),
+    'retorno': lambda index, i, j: index.period_return(i, j),
+    'volatilidade': lambda index, i, j: index.volatility(i, j),
+    'giro_medio': lambda index, i, j: index.average_turnover(i, j),
+}
+
+
+def _format_ranking_value(criteria: str, value: float) -> str:
+    if criteria in ('volume_financeiro', 'giro_medio'):
+        return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    if criteria == 'retorno':
+        return f"{value:+.2%}"
+    if criteria == 'volatilidade':
+        return f"{value:.2%}"
+    return f"{int(value):,}".replace(",",".")
+
+
 @tool
 def get_current_datetime() -> str:
     """Retorna a data e hora atuais no fuso horário de São Paulo (America/Sao_Paulo), incluindo o dia da semana."""
@@ -263,14 +224,16 @@ def list_available_tickers() -> str:
     """
     print("🤖 Ferramenta 'list_available_tickers' chamada.")
     try:
-        response = supabase.table('acoes_historico').select('ticker').execute()
+        catalog = get_ticker_catalog()
 
-        if not response.data:
+        if not catalog:
             return "Não foram encontrados tickers de ações no banco de dados."
-            
-        tickers = sorted(list(set(item['ticker'] for item in response.data)))
         
-        return f"Tenho acesso aos dados históricos dos seguintes {len(tickers)} tickers: {', '.join(tickers)}."
+        tickers = [entry['ticker'] for entry in catalog]
+        first_date = min(entry['first_date'] for entry in catalog)
+        last_date = max(entry['last_date'] for entry in catalog)
+        
+        return f"Tenho acesso aos dados históricos dos seguintes {len(tickers)} tickers: {', '.join(tickers)}. Os dados cobrem o período de {first_date} a {last_date}."
 
     except Exception as e:
         print(f"🔥 Erro ao listar tickers: {e}")
@@ -0,0 +1,86 @@
+import numpy as np
+
+from .market_store import market_store, format_day
+from .query_cache import query_cache
+
+# --- Serviço de cone de volatilidade ---
+# A tendência é uma regressão linear simples do preço de fechamento contra o índice do pregão,
+# resolvida em forma fechada, e todas as bandas do cone são calculadas de uma vez como vetores.
+# Como o resultado só muda quando chegam novos pregões, ele fica em cache por
+# (ticker, horizonte, versão do armazenamento local).
+LOOKBACK_SESSIONS = 252
+MIN_SESSIONS = 20
+Z_95, Z_70 = 1.96, 1.04
+
+
+def _linear_trend(y: np.ndarray) -> tuple:
+    """Coeficientes (inclinação, intercepto) de mínimos quadrados de y contra 0..n-1."""
+    x = np.arange(len(y), dtype=float)
+    x_mean, y_mean = x.mean(), y.mean()
+    slope = np.dot(x - x_mean, y - y_mean) / np.dot(x - x_mean, x - x_mean)
+    return slope, y_mean - slope * x_mean
+
+
+def compute_volatility_cone(ticker: str, dates: np.ndarray, close: np.ndarray, days_to_predict: int) -> dict:
+    """Monta o cone (histórico, projeção e análise) a partir de datas e fechamentos em ordem crescente."""
+    annual_volatility = np.std(np.diff(np.log(close)), ddof=1) * np.sqrt(252)
+    slope, intercept = _linear_trend(close)
+
+    horizons = np.arange(1, days_to_predict + 1)
+    future_dates = np.datetime64(dates[-1], 'D') + horizons
+    predicted = intercept + slope * (len(close) - 1 + horizons)
+    std_dev = annual_volatility * np.sqrt(horizons / 252)
+
+    columns = {
+        'date': np.datetime_as_string(future_dates, unit='D'),
+        'predicted_price': predicted,
+        'upper_bound_95': predicted * (1 + Z_95 * std_dev),
+        'lower_bound_95': predicted * (1 - Z_95 * std_dev),
+        'upper_bound_70': predicted * (1 + Z_70 * std_dev),
+        'lower_bound_70': predicted * (1 - Z_70 * std_dev),
+    }
+    cone = [dict(zip(columns, row)) for row in zip(*(v.tolist() for v in columns.values()))]
+    historical = [{'date': format_day(d), 'close': c} for d, c in zip(dates, close.tolist())]
+
+    return {
+        "historical": historical,
+        "cone": cone,
+        "analysis": f"A volatilidade anualizada calculada para {ticker} é de {annual_volatility:.2%}. Com base na tendência linear, projetamos os preços para os próximos {days_to_predict} dias com bandas de confiança de 70% e 95%."
+    }
+
+
+def _build_cone(ticker: str, days_to_predict: int) -> dict | str:
+    series = market_store.series(ticker)
+    # Retornos sobre o fechamento ajustado por proventos, materializado pelo ETL
+    series = series.adjusted().tail(LOOKBACK_SESSIONS) if series is not None else None
+    if series is not None:
+        valid = ~np.isnan(series['close'])
+        dates, close = series.date[valid], series['close'][valid]
+
+    if series is None or len(close) < MIN_SESSIONS:
+        return f"Dados históricos insuficientes para calcular a volatilidade para {ticker}. São necessários pelo menos {MIN_SESSIONS} dias."
+
+    return compute_volatility_cone(ticker, dates, close, days_to_predict)
+
+
+def get_volatility_cone_data(ticker: str, days_to_predict: int = 30) -> dict | str:
+    """
+    Retorna o cone de volatilidade de um ticker já normalizado (ex: "PETR4.SA"),
+    ou uma mensagem de erro se não houver dados suficientes.
+    """
+    return query_cache.get_or_compute(
+        ('volatility_cone', market_store.version, ticker, days_to_predict),
+        lambda: _build_cone(ticker, days_to_predict),
+    )
+
+
+def get_volatility_cones(tickers: list, days_to_predict: int = 30) -> tuple:
+    """Versão em lote: retorna ({ticker: cone}, {ticker: mensagem de erro})."""
+    cones, errors = {}, {}
+    for ticker in tickers:
+        result = get_volatility_cone_data(ticker, days_to_predict)
+        if isinstance(result, str):
+            errors[ticker] = result
+        else:
+            cones[ticker] = result
+    return cones, errors
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+# --- Eventos corporativos e preço ajustado ---
+# O yfinance (sem ajuste automático) entrega o fechamento já corrigido pelos desdobramentos, mais as
+# colunas 'Dividends' e 'Stock Splits'. Guardamos esses eventos em 'acoes_historico' e materializamos
+# 'adj_close' = close * adj_factor, em que adj_factor de cada pregão é o produto, sobre os dividendos
+# com data ex posterior a ele, de (1 - dividendo / fechamento do pregão anterior à data ex), a mesma
+# convenção do Yahoo. Assim as análises leem o preço ajustado pronto, sem nenhum cálculo na consulta.
+#
+# Como o fator de um pregão depende só dos eventos posteriores a ele, uma carga incremental sem eventos
+# novos não altera nenhuma linha já gravada. Um evento novo (dividendo ou desdobramento) muda o fator de
+# todo o histórico anterior do ticker (e, no desdobramento, o próprio fechamento), então só esse ticker
+# é baixado e regravado por completo (etl/pipeline.py).
+ACTION_COLUMNS = ("dividend", "split_ratio")
+
+
+def adjustment_factors(close: np.ndarray, dividend: np.ndarray) -> np.ndarray:
+    """Fator de ajuste por pregão, calculado em uma passada vetorizada (produto acumulado reverso)."""
+    previous_close = np.r_[np.nan, close[:-1]]
+    valid = (dividend > 0) & (previous_close > 0)
+    multiplier = np.where(valid, 1.0 - dividend / np.where(valid, previous_close, 1.0), 1.0)
+    # Produto dos multiplicadores de todos os eventos estritamente posteriores a cada pregão
+    return np.r_[np.cumprod(multiplier[::-1])[::-1][1:], 1.0]
+
+
+def apply_adjustments(df: pd.DataFrame) -> pd.DataFrame:
+    """Preenche 'adj_factor' e 'adj_close' de um histórico em ordem cronológica com preços brutos."""
+    factor = adjustment_factors(df["close"].to_numpy(dtype=np.float64), df["dividend"].to_numpy(dtype=np.float64))
+    df["adj_factor"] = factor
+    df["adj_close"] = df["close"].to_numpy(dtype=np.float64) * factor
+    return df
+
+
+def has_new_actions(df: pd.DataFrame, last_date: str | None) -> bool:
+    """
+    Indica se um download bruto do yfinance (índice de datas) traz dividendo ou desdobramento com data
+    posterior à última já gravada, o que exige recalcular o histórico completo do ticker.
+    """
+    if df.empty or not last_date:
+        return False
+    actions = (df.get("Dividends", 0) > 0) | (df.get("Stock Splits", 0) > 0)
+    if not np.any(actions):
+        return False
+    dates = df.index[np.asarray(actions)].strftime("%Y-%m-%d")
+    return bool((dates > str(last_date)[:10]).any())
@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+
+from parallel import RateLimiter, throttle
+
+CATALOG_TABLE = 'ticker_catalog'
+
+
+def update_ticker_catalog(supabase, ticker: str, limiter: RateLimiter | None = None):
+    """
+    Atualiza a entrada de um ticker no catálogo ('ticker_catalog') após uma carga.
+    Os valores são lidos do próprio banco, então o catálogo fica correto tanto para cargas
+    completas (delete + insert) quanto para cargas que apenas acrescentam linhas.
+
+    Args:
+        supabase: Cliente Supabase já inicializado.
+        ticker (str): O código do ativo (ex: "PETR4.SA").
+        limiter (RateLimiter, opcional): Limitador aplicado a cada requisição ao host "supabase".
+    """
+    try:
+        throttle(limiter, 'supabase')
+        first = supabase.table('acoes_historico').select("date", count='exact') \
+            .eq('ticker', ticker).order('date', desc=False).limit(1).execute()
+        if not first.data:
+            throttle(limiter, 'supabase')
+            supabase.table(CATALOG_TABLE).delete().eq('ticker', ticker).execute()
+            return
+
+        throttle(limiter, 'supabase')
+        last = supabase.table('acoes_historico').select("date") \
+            .eq('ticker', ticker).order('date', desc=True).limit(1).execute()
+
+        throttle(limiter, 'supabase')
+        supabase.table(CATALOG_TABLE).upsert({
+            "ticker": ticker,
+            "first_date": first.data[0]['date'],
+            "last_date": last.data[0]['date'],
+            "row_count": first.count,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }).execute()
+    except Exception as e:
+        print(f"⚠️ Não foi possível atualizar o catálogo para {ticker}: {e}")
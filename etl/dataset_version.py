@@ -0,0 +1,31 @@
+import time
+from datetime import datetime, timezone
+
+from parallel import RateLimiter, throttle
+
+VERSION_TABLE = 'etl_dataset_version'
+
+
+def bump_dataset_version(supabase, source: str, limiter: RateLimiter | None = None):
+    """
+    Publica uma nova versão do conjunto de dados após uma carga concluída.
+    O backend usa essa versão para invalidar seus caches e ressincronizar o armazenamento local.
+
+    Args:
+        supabase: Cliente Supabase já inicializado.
+        source (str): Nome do script que concluiu a carga (ex: "extracao.py").
+        limiter (RateLimiter, opcional): Limitador do host "supabase".
+    """
+    version = int(time.time() * 1000)
+    try:
+        throttle(limiter, 'supabase')
+        supabase.table(VERSION_TABLE).upsert({
+            "id": 1,
+            "version": version,
+            "source": source,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }).execute()
+        print(f"🔖 Nova versão dos dados publicada: {version} ({source}).")
+    except Exception as e:
+        # A carga em si já foi concluída; apenas avisamos que os caches do backend expirarão pelo TTL.
+        print(f"⚠️ Não foi possível publicar a versão dos dados: {e}")
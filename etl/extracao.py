@@ -1,8 +1,9 @@
+import argparse
 import os
-import yfinance as yf
-import pandas as pd
 from dotenv import load_dotenv
 from supabase import create_client, Client
+from incremental import read_high_water_marks, incremental_start, OVERLAP_DAYS
+from pipeline import run_etl, extract_stage, transform_stage, load_stage
 
 # --- 1. Carregar Variáveis de Ambiente ---
 # Garante que o script encontre o .env na raiz do projeto
@@ -44,78 +45,66 @@ ibovespa_tickers = [
 ]
 
 
-def extrair_e_carregar_dados():
+def _estagios(incremental: bool, workers_extracao: int = 1, workers_carga: int = 1) -> list:
     """
-    Função principal que busca dados históricos de uma lista de tickers
-    e os insere no banco de dados Supabase.
+    Estágios do pipeline para a carga dos últimos 5 anos: completa (apaga e regrava o histórico de
+    cada ticker) ou incremental (só os pregões após a última data gravada, com upsert).
     """
-    print(f"🚀 Iniciando extração para {len(ibovespa_tickers)} tickers...")
-    
-    sucessos = 0
-    falhas = []
+    datas_iniciais, marcas = {}, {}
+    if incremental:
+        marcas = read_high_water_marks(supabase, ibovespa_tickers)
+        datas_iniciais = {ticker: incremental_start(data) for ticker, data in marcas.items()}
+        print(f"📌 {len(marcas)} tickers já têm histórico; baixando apenas a partir da última data gravada "
+              f"(com {OVERLAP_DAYS} dias de sobreposição para revisões).")
 
-    for ticker in ibovespa_tickers:
-        print(f"\n🔄 Processando ticker: {ticker}...")
-        try:
-            # --- Extração (E) ---
-            # Baixa o histórico de dados dos últimos 5 anos
-            dados = yf.download(ticker, period="5y", progress=False)
+    return [
+        # yf.Ticker(...).history usa uma sessão por instância, o que permite downloads em paralelo
+        extract_stage(datas_iniciais, period="5y", auto_adjust=False, workers=workers_extracao, last_dates=marcas),
+        transform_stage(),
+        # Tickers sem histórico gravado recebem carga completa mesmo no modo incremental (upsert)
+        load_stage(supabase, replace=not incremental, workers=workers_carga),
+    ]
 
-            if dados.empty:
-                print(f"⚠️  Nenhum dado encontrado para {ticker}. Pulando.")
-                falhas.append(ticker)
-                continue
 
-            # --- Transformação (T) ---
-            df = pd.DataFrame(dados)
-            df.reset_index(inplace=True)
-            df.rename(columns={
-                "Date": "date",
-                "Open": "open",
-                "High": "high",
-                "Low": "low",
-                "Close": "close",
-                "Adj Close": "adj_close",
-                "Volume": "volume"
-            }, inplace=True)
-            
-            # Adiciona a coluna 'ticker'
-            df["ticker"] = ticker
-            
-            # Converte a coluna de data para string no formato ISO 8601
-            df['date'] = df['date'].dt.strftime('%Y-%m-%d')
-            
-            # Converte o dataframe para uma lista de dicionários (formato esperado pelo Supabase)
-            dados_para_inserir = df.to_dict(orient='records')
-
-            # --- Carga (L) ---
-            # Deleta dados existentes para o ticker para evitar duplicatas
-            print(f"🗑️  Limpando dados antigos para {ticker}...")
-            supabase.table("acoes_historico").delete().eq("ticker", ticker).execute()
-            
-            # Insere os novos dados
-            print(f"💾 Inserindo {len(dados_para_inserir)} registros para {ticker}...")
-            _, count = supabase.table("acoes_historico").insert(dados_para_inserir).execute()
+def extrair_e_carregar_dados(incremental: bool = False):
+    """
+    Função principal que busca dados históricos de uma lista de tickers
+    e os insere no banco de dados Supabase.
+    Com incremental=True, baixa apenas os pregões após a última data gravada de cada ticker
+    (mais uma pequena sobreposição) e os grava com upsert, sem apagar o histórico.
+    """
+    print(f"🚀 Iniciando extração para {len(ibovespa_tickers)} tickers...")
+    return run_etl(ibovespa_tickers, supabase, _estagios(incremental),
+                   source="extracao.py" + (" --incremental" if incremental else ""))
 
-            if count:
-                 print(f"✅ Sucesso! {len(dados_para_inserir)} registros inseridos para {ticker}.")
-                 sucessos += 1
-            else:
-                 print(f"❌ Falha ao inserir dados para {ticker}.")
-                 falhas.append(ticker)
 
-        except Exception as e:
-            print(f"🔥 ERRO GERAL ao processar {ticker}: {e}")
-            falhas.append(ticker)
-    
-    print("\n--- Relatório Final ---")
-    print(f"Total de tickers processados: {len(ibovespa_tickers)}")
-    print(f"✅ Sucessos: {sucessos}")
-    print(f"❌ Falhas: {len(falhas)}")
-    if falhas:
-        print(f"Tickers com falha: {', '.join(falhas)}")
-    print("--- Fim da Execução ---")
+def extrair_e_carregar_dados_concorrente(workers_extracao: int = 8, workers_carga: int = 4,
+                                         downloads_por_segundo: float = 4, escritas_por_segundo: float = 10,
+                                         incremental: bool = False):
+    """
+    Mesma carga de extrair_e_carregar_dados, mas com vários downloads e cargas simultâneos, limite de
+    taxa por host e novas tentativas com backoff. O tempo total passa a ser limitado pela banda
+    disponível, e não pela soma das latências de cada ticker.
+    """
+    print(f"🚀 Iniciando extração concorrente para {len(ibovespa_tickers)} tickers "
+          f"({workers_extracao} downloads e {workers_carga} cargas simultâneos)...")
+    return run_etl(
+        ibovespa_tickers, supabase, _estagios(incremental, workers_extracao, workers_carga),
+        source="extracao.py --concorrente" + (" --incremental" if incremental else ""),
+        queue_size=max(workers_extracao, workers_carga),
+        rates={"yfinance": downloads_por_segundo, "supabase": escritas_por_segundo},
+    )
 
 
 if __name__ == "__main__":
-    extrair_e_carregar_dados()
+    parser = argparse.ArgumentParser(description="Carga do histórico de 5 anos dos tickers do IBOVESPA.")
+    parser.add_argument("--concorrente", action="store_true", help="Baixa e carrega vários tickers em paralelo.")
+    parser.add_argument("--incremental", action="store_true", help="Baixa só os pregões após a última data gravada e grava com upsert.")
+    parser.add_argument("--workers-extracao", type=int, default=8)
+    parser.add_argument("--workers-carga", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.concorrente:
+        extrair_e_carregar_dados_concorrente(args.workers_extracao, args.workers_carga, incremental=args.incremental)
+    else:
+        extrair_e_carregar_dados(incremental=args.incremental)
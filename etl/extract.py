@@ -1,20 +1,34 @@
 import yfinance as yf
 import pandas as pd
+from raw_cache import raw_cache
 
-def extract_data(ticker: str) -> pd.DataFrame:
+def extract_data(ticker: str, start_date: str | None = None, period: str = "max", auto_adjust: bool = True,
+                 refresh: bool = False) -> pd.DataFrame:
     """
     Extrai o histórico de dados de um ticker usando a biblioteca yfinance.
 
     Args:
         ticker (str): O código do ativo (ex: "PETR4.SA").
+        start_date (str | None): Se informado ('AAAA-MM-DD'), baixa apenas a partir dessa data.
+        period (str): Período baixado quando não há start_date (ex: "max", "5y").
+        auto_adjust (bool): Se False, mantém os preços brutos e a coluna 'Adj Close'.
+        refresh (bool): Se True, baixa de novo mesmo com uma resposta ainda fresca no cache local.
 
     Returns:
         pd.DataFrame: DataFrame do Pandas com os dados históricos.
                        Retorna um DataFrame vazio se o ticker for inválido.
     """
     stock = yf.Ticker(ticker)
-    # Baixa o histórico de dados completo
-    hist = stock.history(period="max")
+    # Baixa o histórico de dados completo (ou só a partir de start_date, na carga incremental),
+    # passando pelo cache local de respostas brutas (etl/raw_cache.py)
+    if start_date:
+        params = {"ticker": ticker, "start": start_date, "auto_adjust": auto_adjust}
+        hist = raw_cache.fetch(params, lambda: stock.history(start=start_date, auto_adjust=auto_adjust),
+                               refresh)
+    else:
+        params = {"ticker": ticker, "period": period, "auto_adjust": auto_adjust}
+        hist = raw_cache.fetch(params, lambda: stock.history(period=period, auto_adjust=auto_adjust),
+                               refresh)
     
     if hist.empty:
         print(f"Não foram encontrados dados para o ticker: {ticker}")
@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from catalog import CATALOG_TABLE
+
+# Dias corridos rebaixados antes da última data gravada, para capturar revisões recentes do provedor
+OVERLAP_DAYS = 7
+
+
+def read_high_water_marks(supabase, tickers: list) -> dict:
+    """
+    Retorna a última data gravada de cada ticker ({ticker: 'AAAA-MM-DD'}), lida do catálogo em uma
+    única consulta. Tickers fora do catálogo são consultados direto em 'acoes_historico'; tickers sem
+    nenhuma linha ficam de fora do resultado (e recebem carga completa).
+
+    Args:
+        supabase: Cliente Supabase já inicializado.
+        tickers (list): Tickers a consultar.
+    """
+    marks = {}
+    try:
+        response = supabase.table(CATALOG_TABLE).select("ticker, last_date").in_('ticker', tickers).execute()
+        marks = {row['ticker']: row['last_date'] for row in response.data or []}
+    except Exception as e:
+        print(f"⚠️ Não foi possível ler o catálogo ({e}). Consultando 'acoes_historico' por ticker.")
+
+    for ticker in tickers:
+        if ticker in marks:
+            continue
+        last = supabase.table('acoes_historico').select("date") \
+            .eq('ticker', ticker).order('date', desc=True).limit(1).execute()
+        if last.data:
+            marks[ticker] = last.data[0]['date']
+    return marks
+
+
+def incremental_start(last_date: str | None, overlap_days: int = OVERLAP_DAYS) -> str | None:
+    """Primeira data a baixar: a última gravada menos a janela de sobreposição (None = carga completa)."""
+    if not last_date:
+        return None
+    return (date.fromisoformat(str(last_date)[:10]) - timedelta(days=overlap_days)).isoformat()
@@ -1,47 +1,130 @@
+import json
 import os
+import time
 import pandas as pd
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from dataset_version import bump_dataset_version
+from catalog import update_ticker_catalog
+from market_summary import update_market_daily_summary
+from parallel import RateLimiter, retry_with_backoff
 
-def load_data(df: pd.DataFrame):
+CONFLICT_COLUMNS = 'ticker,date'
+# Tamanho alvo de cada requisição de upsert; o número de linhas por lote é derivado dele
+TARGET_CHUNK_BYTES = int(os.getenv("ETL_CHUNK_BYTES", str(512 * 1024)))
+MIN_CHUNK_ROWS, MAX_CHUNK_ROWS = 100, 5000
+
+_client: Client | None = None
+
+
+def get_supabase_client() -> Client | None:
+    """Cliente Supabase criado na primeira chamada e reutilizado nas seguintes (None sem credenciais)."""
+    global _client
+    if _client is None:
+        load_dotenv()
+        supabase_url = os.getenv("SUPABASE_URL")
+        supabase_key = os.getenv("SUPABASE_KEY")
+        if not supabase_url or not supabase_key:
+            print("Erro: As variáveis de ambiente SUPABASE_URL e SUPABASE_KEY não foram definidas.")
+            return None
+        _client = create_client(supabase_url, supabase_key)
+    return _client
+
+
+def _chunk_rows(df: pd.DataFrame, sample_size: int = 50) -> int:
+    """Linhas por lote para que cada requisição fique perto de TARGET_CHUNK_BYTES (estimado por uma amostra em JSON)."""
+    sample = _records(df.head(sample_size))
+    bytes_per_row = max(len(json.dumps(sample, default=str)) / max(len(sample), 1), 1)
+    return int(min(max(TARGET_CHUNK_BYTES // bytes_per_row, MIN_CHUNK_ROWS), MAX_CHUNK_ROWS))
+
+
+def _records(df: pd.DataFrame) -> list:
+    """Converte um trecho do DataFrame em registros JSON-compatíveis (NaN vira null)."""
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+def bulk_upsert(supabase, df: pd.DataFrame, table: str = 'acoes_historico', on_conflict: str = CONFLICT_COLUMNS,
+                chunk_rows: int | None = None, attempts: int = 3, base_delay: float = 1.0,
+                limiter: RateLimiter | None = None, record: dict | None = None) -> dict:
     """
-    Carrega os dados de um DataFrame para a tabela 'acoes_historico' no Supabase.
+    Grava o DataFrame em lotes com upsert sobre 'on_conflict' (idempotente: repetir a carga não duplica linhas).
+    Os registros de cada lote são gerados só na hora do envio, e cada lote é repetido de forma
+    independente com backoff exponencial. Se algum lote falhar em todas as tentativas, os demais
+    ainda são enviados e, ao final, é levantado um RuntimeError com os intervalos de linhas que
+    faltaram; como a carga é idempotente, basta executá-la de novo para retomar.
+    Cada requisição passa pelo 'limiter' do host "supabase", se informado, e cada tentativa
+    incrementa record['attempts'], se informado.
+
+    Returns:
+        dict: 'rows', 'chunks', 'chunk_rows', 'seconds' e 'rows_per_second'.
+    """
+    chunk_rows = chunk_rows or _chunk_rows(df)
+    start_time = time.perf_counter()
+    written, chunks, failed = 0, 0, []
+
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        try:
+            retry_with_backoff(
+                lambda: supabase.table(table).upsert(_records(chunk), on_conflict=on_conflict).execute(),
+                "supabase", limiter, attempts, base_delay, record,
+            )
+            written += len(chunk)
+            chunks += 1
+        except Exception as e:
+            print(f"🔥 Lote de linhas {start}-{start + len(chunk) - 1} falhou após {attempts} tentativas: {e}")
+            failed.append((start, start + len(chunk) - 1))
+
+    seconds = time.perf_counter() - start_time
+    report = {
+        "rows": written,
+        "chunks": chunks,
+        "chunk_rows": chunk_rows,
+        "seconds": seconds,
+        "rows_per_second": written / seconds if seconds > 0 else float('inf'),
+    }
+    print(f"📦 {written} registros gravados em '{table}' em {seconds:.1f}s "
+          f"({report['rows_per_second']:,.0f} linhas/s, {chunks} lotes de até {chunk_rows} linhas).")
+    if failed:
+        raise RuntimeError(f"{len(failed)} lote(s) não gravado(s) (linhas {', '.join(f'{a}-{b}' for a, b in failed)}).")
+    return report
+
+
+def load_data(df: pd.DataFrame) -> int:
+    """
+    Carrega os dados de um DataFrame para a tabela 'acoes_historico' no Supabase, em lotes com upsert
+    sobre (ticker, date). A carga é idempotente: executá-la de novo atualiza as mesmas linhas em vez de
+    duplicá-las, então também serve para retomar uma carga interrompida.
 
     Args:
         df (pd.DataFrame): DataFrame transformado e pronto para ser carregado.
+
+    Returns:
+        int: Quantidade de registros gravados (0 em caso de falha).
     """
     if df.empty:
         print("DataFrame vazio. Nenhum dado para carregar.")
-        return
+        return 0
 
-    # 1. Carregar variáveis de ambiente do arquivo .env
-    load_dotenv()
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_KEY")
+    try:
+        # 1. Obter o cliente Supabase (criado uma vez a partir do .env)
+        supabase = get_supabase_client()
+        if supabase is None:
+            return 0
 
-    if not supabase_url or not supabase_key:
-        print("Erro: As variáveis de ambiente SUPABASE_URL e SUPABASE_KEY não foram definidas.")
-        return
+        # 2. Gravar em lotes com upsert (cada lote com suas próprias novas tentativas)
+        report = bulk_upsert(supabase, df)
 
-    try:
-        # 2. Inicializar o cliente Supabase
-        supabase: Client = create_client(supabase_url, supabase_key)
-
-        # 3. Converter DataFrame para lista de dicionários
-        data_to_insert = df.to_dict(orient='records')
-
-        # 4. Inserir os dados na tabela
-        # A biblioteca do Supabase lida com a inserção em lotes
-        response = supabase.table('acoes_historico').insert(data_to_insert).execute()
-        
-        # Verifica se houve algum erro na resposta da API
-        if hasattr(response, 'error') and response.error:
-            print(f"Erro ao inserir dados: {response.error}")
-        else:
-            print(f"{len(data_to_insert)} registros inseridos com sucesso na tabela 'acoes_historico'.")
+        # 3. Atualizar as tabelas auxiliares e publicar a nova versão dos dados
+        for ticker in df['ticker'].unique():
+            update_ticker_catalog(supabase, ticker)
+        update_market_daily_summary(supabase, since_date=df['date'].min())
+        bump_dataset_version(supabase, source="load.py")
+        return report["rows"]
 
     except Exception as e:
         print(f"Ocorreu uma exceção: {e}")
+        return 0
 
 if __name__ == '__main__':
     # Exemplo de uso para teste
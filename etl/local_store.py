@@ -0,0 +1,178 @@
+import operator
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# --- Armazenamento local no lugar do Supabase ---
+# Implementa, em memória, o subconjunto da API do cliente Supabase usado pelo ETL (table, select com
+# count, eq, in_, gte, lte, or_, order, limit, range, upsert com on_conflict, delete e execute), para que o
+# pipeline rode sem rede na reprodução offline (etl/replay.py). As chaves primárias seguem o schema.sql.
+PRIMARY_KEYS = {
+    "acoes_historico": ("ticker", "date"),
+    "ticker_catalog": ("ticker",),
+    "market_daily_summary": ("date",),
+    "etl_dataset_version": ("id",),
+}
+
+
+# Operadores aceitos nas condições de or_ (comparação textual, como em gte/lte)
+_OPERATORS = {"eq": operator.eq, "gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+
+def _split_top_level(text: str) -> list:
+    """Separa 'a,and(b,c),d' nas vírgulas de primeiro nível (fora de parênteses e de aspas)."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"' and (i == 0 or text[i - 1] != "\\"):
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _parse_condition(text: str):
+    """Converte uma condição do PostgREST ('col.op.valor', 'and(...)' ou 'or(...)') em um predicado."""
+    for group, combine in (("and(", all), ("or(", any)):
+        if text.startswith(group) and text.endswith(")"):
+            predicates = [_parse_condition(part) for part in _split_top_level(text[len(group):-1])]
+            return lambda row: combine(p(row) for p in predicates)
+    column, op, value = text.split(".", 2)
+    if value.startswith('"') and value.endswith('"'):
+        value = value[1:-1].replace('\\"', '"')
+    compare = _OPERATORS[op]
+    return lambda row: row.get(column) is not None and compare(str(row[column]), value)
+
+
+class LocalResponse:
+    def __init__(self, data: list, count: int | None = None):
+        self.data = data
+        self.count = count
+
+
+class LocalQuery:
+    """Consulta encadeável sobre uma tabela do LocalSupabase (executada só em execute())."""
+
+    def __init__(self, store: "LocalSupabase", table: str):
+        self._store = store
+        self._table = table
+        self._action = "select"
+        self._columns = None
+        self._count = None
+        self._payload = None
+        self._on_conflict = None
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = 0
+
+    def select(self, columns: str = "*", count: str | None = None):
+        self._columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        self._count = count
+        return self
+
+    def upsert(self, payload, on_conflict: str | None = None):
+        self._action = "upsert"
+        self._payload = payload if isinstance(payload, list) else [payload]
+        self._on_conflict = on_conflict
+        return self
+
+    def delete(self):
+        self._action = "delete"
+        return self
+
+    def eq(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column: str, values):
+        values = set(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def gte(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) is not None and str(row[column]) >= str(value))
+        return self
+
+    def lte(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) is not None and str(row[column]) <= str(value))
+        return self
+
+    def or_(self, filters: str):
+        self._filters.append(_parse_condition(f"or({filters})"))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def execute(self) -> LocalResponse:
+        return self._store._execute(self)
+
+
+class LocalSupabase:
+    """Substituto local do cliente Supabase: tabelas em memória, indexadas pela chave primária."""
+
+    def __init__(self, primary_keys: dict | None = None):
+        self.primary_keys = primary_keys or PRIMARY_KEYS
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    def _key(self, table: str, row: dict, on_conflict: str | None):
+        columns = [c.strip() for c in on_conflict.split(",")] if on_conflict else self.primary_keys.get(table)
+        if not columns:
+            raise ValueError(f"Tabela '{table}' sem chave primária conhecida para o upsert.")
+        return tuple(str(row.get(c)) for c in columns)
+
+    def _execute(self, query: LocalQuery) -> LocalResponse:
+        with self._lock:
+            rows = self.tables.setdefault(query._table, {})
+            if query._action == "upsert":
+                for row in query._payload:
+                    key = self._key(query._table, row, query._on_conflict)
+                    rows[key] = {**rows.get(key, {}), **row}
+                return LocalResponse(query._payload)
+
+            matches = [(k, r) for k, r in rows.items() if all(f(r) for f in query._filters)]
+            if query._action == "delete":
+                for key, _ in matches:
+                    del rows[key]
+                return LocalResponse([r for _, r in matches])
+
+            result = [r for _, r in matches]
+            for column, desc in reversed(query._order):
+                result.sort(key=lambda r: (r.get(column) is None, str(r.get(column))), reverse=desc)
+            count = len(result) if query._count else None
+            end = None if query._limit is None else query._offset + query._limit
+            result = result[query._offset:end]
+            if query._columns:
+                result = [{c: r.get(c) for c in query._columns} for r in result]
+            return LocalResponse([dict(r) for r in result], count)
+
+    def to_frame(self, table: str) -> pd.DataFrame:
+        """Conteúdo de uma tabela como DataFrame."""
+        return pd.DataFrame(list(self.tables.get(table, {}).values()))
+
+    def dump(self, directory: Path):
+        """Grava cada tabela como Parquet em 'directory', para inspeção depois da reprodução."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for table in self.tables:
+            self.to_frame(table).to_parquet(directory / f"{table}.parquet")
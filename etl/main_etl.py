@@ -1,43 +1,50 @@
-from extract import extract_data
-from transform import transform_data
-from load import load_data
+import sys
+from load import get_supabase_client
+from incremental import read_high_water_marks, incremental_start
+from pipeline import run_etl, extract_stage, transform_stage, load_stage
 
-def run_etl_pipeline(tickers: list):
+def run_etl_pipeline(tickers: list, concurrent: bool = False, extract_workers: int = 8, load_workers: int = 4,
+                     incremental: bool = False):
     """
     Executa o pipeline de ETL (Extract, Transform, Load) para uma lista de tickers.
+    Os três estágios rodam ligados por filas limitadas (etl/pipeline.py): o download de um ticker
+    acontece enquanto o anterior é transformado e gravado.
 
     Args:
         tickers (list): Uma lista de códigos de ativos (ex: ["PETR4.SA", "VALE3.SA"]).
+        concurrent (bool): Se True, usa vários downloads e cargas simultâneos (limite de taxa por host
+                           e novas tentativas com backoff).
+        extract_workers / load_workers (int): Threads de extração e de carga no modo concorrente.
+        incremental (bool): Se True, baixa apenas os pregões após a última data gravada de cada ticker
+                            (com uma pequena sobreposição para revisões) e os grava com upsert.
+
+    Returns:
+        list: Relatório por ticker ('status', 'rows', 'attempts', 'error', tempos por estágio).
     """
     print("🚀 Iniciando pipeline de ETL...")
 
-    for ticker in tickers:
-        print(f"\n--- Processando ticker: {ticker} ---")
+    supabase = get_supabase_client()
+    if supabase is None:
+        return []
 
-        # 1. Extração
-        print("Fase 1: Extraindo dados...")
-        raw_data = extract_data(ticker)
+    start_dates, marks = {}, {}
+    if incremental:
+        marks = read_high_water_marks(supabase, tickers)
+        start_dates = {ticker: incremental_start(date) for ticker, date in marks.items()}
 
-        if raw_data.empty:
-            print(f"Não foi possível extrair dados para {ticker}. Pulando para o próximo.")
-            continue
-
-        # 2. Transformação
-        print("Fase 2: Transformando dados...")
-        transformed_data = transform_data(raw_data)
-
-        if transformed_data.empty:
-            print(f"Transformação resultou em dados vazios para {ticker}. Pulando para o próximo.")
-            continue
-
-        # 3. Carga
-        print("Fase 3: Carregando dados para o Supabase...")
+    workers = (extract_workers, load_workers) if concurrent else (1, 1)
+    stages = [
+        # Preços brutos: o fechamento ajustado é calculado pelo ETL a partir dos eventos corporativos
+        extract_stage(start_dates, period="max", auto_adjust=False, workers=workers[0], last_dates=marks),
         # Para evitar sobrecarregar o banco, vamos carregar os últimos 365 dias
-        load_data(transformed_data.tail(365))
-        
-        print(f"--- Finalizado processamento para: {ticker} ---")
+        # (na carga incremental, só os pregões baixados a partir da última data gravada)
+        transform_stage(max_rows=365, start_dates=start_dates),
+        load_stage(supabase, workers=workers[1]),
+    ]
+    report = run_etl(tickers, supabase, stages, source="main_etl.py", queue_size=max(workers))
 
-    print("\n✅ Pipeline de ETL concluído com sucesso!")
+    print("\n✅ Pipeline de ETL concluído!")
+    return report
 
 if __name__ == '__main__':
     # Lista de tickers para popular o banco de dados
@@ -51,4 +58,4 @@ if __name__ == '__main__':
         "WEGE3.SA"   # WEG
     ]
 
-    run_etl_pipeline(target_tickers)
+    run_etl_pipeline(target_tickers, concurrent="--concorrente" in sys.argv, incremental="--incremental" in sys.argv)
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from parallel import RateLimiter, throttle
+
+SUMMARY_TABLE = 'market_daily_summary'
+PAGE_SIZE = 1000
+# Dias corridos lidos antes de 'since_date' para obter o fechamento anterior de cada ticker
+PREVIOUS_CLOSE_LOOKBACK_DAYS = 15
+
+
+def _quote(value: str) -> str:
+    # Valores entre aspas permitem caracteres reservados do PostgREST (como '.' em 'PETR4.SA')
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+def _fetch_rows_since(supabase, start_date: str, limiter: RateLimiter | None = None) -> pd.DataFrame:
+    # Paginação por chave (ticker, date), como em backend/supabase_reader.py: cada página pede as linhas
+    # estritamente após a última recebida, então gravações simultâneas do ETL não fazem pular nem repetir
+    # linhas, e o custo de cada página não cresce com a posição (ao contrário de OFFSET)
+    rows = []
+    last_key = None
+    while True:
+        throttle(limiter, 'supabase')
+        query = supabase.table('acoes_historico') \
+            .select("ticker, date, close, volume") \
+            .gte('date', start_date)
+        if last_key is not None:
+            ticker, date = last_key
+            query = query.or_(f"ticker.gt.{_quote(ticker)},and(ticker.eq.{_quote(ticker)},date.gt.{date})")
+        response = query.order('ticker').order('date').limit(PAGE_SIZE).execute()
+        if not response.data:
+            break
+        rows.extend(response.data)
+        last_key = (response.data[-1]['ticker'], str(response.data[-1]['date'])[:10])
+    return pd.DataFrame(rows, columns=['ticker', 'date', 'close', 'volume'])
+
+
+def compute_daily_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega as linhas de 'acoes_historico' por data: volume financeiro total, volume total,
+    quantidade de tickers e quantos fecharam em alta, em baixa ou estáveis em relação ao pregão anterior.
+
+    Args:
+        df (pd.DataFrame): Linhas com as colunas 'ticker', 'date', 'close' e 'volume'.
+
+    Returns:
+        pd.DataFrame: Uma linha por data, pronta para ser gravada em 'market_daily_summary'.
+    """
+    df = df.sort_values(['ticker', 'date'])
+    change = df['close'] - df.groupby('ticker')['close'].shift(1)
+    df = df.assign(
+        volume_financeiro=df['close'] * df['volume'],
+        advancers=change > 0,
+        decliners=change < 0,
+        unchanged=change == 0,
+    ).dropna(subset=['close', 'volume'])
+
+    grouped = df.groupby('date')
+    summary = pd.DataFrame({
+        'total_volume_financeiro': grouped['volume_financeiro'].sum(),
+        'total_volume': grouped['volume'].sum().astype('int64'),
+        'tickers_count': grouped['ticker'].count(),
+        'advancers': grouped['advancers'].sum(),
+        'decliners': grouped['decliners'].sum(),
+        'unchanged': grouped['unchanged'].sum(),
+    }).reset_index()
+    return summary
+
+
+def update_market_daily_summary(supabase, since_date: str, limiter: RateLimiter | None = None):
+    """
+    Recalcula o resumo diário do mercado a partir de 'since_date' (inclusive) e grava em 'market_daily_summary'.
+    Apenas as datas afetadas pela carga são recalculadas; as anteriores permanecem intactas.
+
+    Args:
+        supabase: Cliente Supabase já inicializado.
+        since_date (str): Data mais antiga carregada, no formato 'AAAA-MM-DD'.
+        limiter (RateLimiter, opcional): Limitador aplicado a cada requisição ao host "supabase".
+    """
+    try:
+        lookback_start = (pd.Timestamp(since_date) - timedelta(days=PREVIOUS_CLOSE_LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+        rows = _fetch_rows_since(supabase, lookback_start, limiter)
+        if rows.empty:
+            return
+
+        summary = compute_daily_summary(rows)
+        summary = summary[summary['date'] >= since_date].assign(updated_at=datetime.now(timezone.utc).isoformat())
+
+        records = summary.to_dict(orient='records')
+        for i in range(0, len(records), PAGE_SIZE):
+            throttle(limiter, 'supabase')
+            supabase.table(SUMMARY_TABLE).upsert(records[i:i + PAGE_SIZE]).execute()
+        print(f"📊 Resumo diário do mercado atualizado para {len(records)} pregões desde {since_date}.")
+    except Exception as e:
+        print(f"⚠️ Não foi possível atualizar o resumo diário do mercado: {e}")
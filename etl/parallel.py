@@ -0,0 +1,54 @@
+import random
+import threading
+import time
+
+# --- Controle de concorrência do ETL ---
+# Cada host externo (yfinance, Supabase) tem seu próprio limitador de taxa, e cada chamada é
+# repetida com backoff exponencial antes de o ticker ser marcado como falha. Usado pelos estágios
+# do pipeline (etl/pipeline.py) e pela carga em lotes (etl/load.py).
+
+
+class RateLimiter:
+    """Limita as requisições por host a 'rate' por segundo (intervalo mínimo entre inícios de chamadas)."""
+
+    def __init__(self, rates: dict):
+        self._interval = {host: 1.0 / rate for host, rate in rates.items() if rate}
+        self._next_slot = {host: 0.0 for host in self._interval}
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str):
+        if host not in self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot[host])
+            self._next_slot[host] = slot + self._interval[host]
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def throttle(limiter: RateLimiter | None, host: str):
+    """Espera a vez do host no limitador (sem limitador, não espera)."""
+    if limiter is not None:
+        limiter.acquire(host)
+
+
+def retry_with_backoff(fn, host: str, limiter: RateLimiter | None, attempts: int = 3, base_delay: float = 1.0,
+                       record: dict | None = None):
+    """
+    Executa fn() respeitando o limite do host, repetindo em caso de exceção com espera exponencial
+    (base_delay, 2x, 4x...) e um pouco de aleatoriedade. Se 'record' for informado, cada tentativa
+    incrementa record['attempts'].
+    """
+    for attempt in range(1, attempts + 1):
+        throttle(limiter, host)
+        if record is not None:
+            record["attempts"] += 1
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = base_delay * 2 ** (attempt - 1) * (1 + random.random() * 0.25)
+            print(f"⏳ Falha em {host} ({e}). Nova tentativa {attempt + 1}/{attempts} em {delay:.1f}s...")
+            time.sleep(delay)
@@ -0,0 +1,312 @@
+import queue
+import sys
+import threading
+import time
+from typing import Iterable, Iterator
+
+from extract import extract_data
+from transform import transform_data
+from load import bulk_upsert
+from catalog import update_ticker_catalog
+from market_summary import update_market_daily_summary
+from dataset_version import bump_dataset_version
+from parallel import RateLimiter, retry_with_backoff
+from adjustments import has_new_actions
+
+try:
+    # Só existe em sistemas Unix; no Windows o pico de memória do processo não é exibido
+    import resource
+except ImportError:
+    resource = None
+
+# --- Pipeline de ETL em estágios ---
+# Extração, transformação e carga são estágios independentes ligados por filas limitadas. Cada
+# estágio roda em suas próprias threads e consome os tickers à medida que o estágio anterior os
+# entrega, então o download do próximo ticker acontece enquanto o anterior é gravado, e as filas
+# limitadas impedem que a extração acumule DataFrames em memória mais rápido do que a carga grava.
+# Cada estágio registra tempo ocupado, tempo de espera, linhas de entrada/saída e o pico de memória
+# dos DataFrames em processamento.
+
+_END = object()
+# Requisições por segundo por host quando run_etl não recebe 'rates'
+DEFAULT_RATES = {"yfinance": 4, "supabase": 10}
+
+
+def _frame_bytes(item: dict) -> int:
+    df = item.get("df")
+    return int(df.memory_usage(deep=True).sum()) if df is not None else 0
+
+
+def _frame_rows(item: dict) -> int:
+    df = item.get("df")
+    return len(df) if df is not None else item.get("rows", 0)
+
+
+class StageMetrics:
+    """Métricas acumuladas de um estágio (somadas entre as threads do estágio)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.items = 0
+        self.errors = 0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.in_flight_bytes = 0
+        self.peak_bytes = 0
+        self._lock = threading.Lock()
+
+    def start(self, item: dict, waited: float) -> int:
+        size = _frame_bytes(item)
+        with self._lock:
+            self.wait_seconds += waited
+            self.rows_in += _frame_rows(item)
+            self.in_flight_bytes += size
+            self.peak_bytes = max(self.peak_bytes, self.in_flight_bytes)
+        return size
+
+    def finish(self, item: dict, input_bytes: int, busy: float, failed: bool):
+        output_bytes = _frame_bytes(item)
+        with self._lock:
+            self.busy_seconds += busy
+            self.items += 1
+            self.errors += failed
+            self.rows_out += 0 if failed else _frame_rows(item)
+            self.peak_bytes = max(self.peak_bytes, self.in_flight_bytes + output_bytes)
+            self.in_flight_bytes -= input_bytes
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "errors": self.errors,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "busy_seconds": self.busy_seconds,
+            "wait_seconds": self.wait_seconds,
+            "peak_mb": self.peak_bytes / 1024 ** 2,
+        }
+
+
+class Stage:
+    """
+    Um estágio do pipeline: fn(item) recebe o item de um ticker (dict com 'ticker', 'df' e o relatório)
+    e o altera no lugar. Chamadas a serviços externos podem ser limitadas por 'host' e repetidas com
+    backoff ('attempts'). Itens já marcados com 'status' (falha ou sem dados) passam direto.
+
+    Com per_request=True, fn faz várias requisições ao host e aplica a cada uma o limite e as novas
+    tentativas (via call() ou passando 'limiter' adiante); fn inteira não é repetida, então há um
+    único nível de novas tentativas e nenhuma requisição já concluída é refeita.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1, host: str | None = None, attempts: int = 1,
+                 base_delay: float = 1.0, per_request: bool = False):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.host = host
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.per_request = per_request
+        self.limiter = None  # Definido pelo Pipeline que executa o estágio
+        self.metrics = StageMetrics(name)
+
+    def call(self, fn, item: dict | None = None):
+        """Executa uma requisição ao host do estágio com o limite de taxa e as novas tentativas."""
+        return retry_with_backoff(fn, self.host, self.limiter, self.attempts, self.base_delay, item)
+
+
+class Pipeline:
+    """Liga os estágios por filas limitadas e entrega os itens concluídos como um gerador."""
+
+    def __init__(self, stages: list, queue_size: int = 4, rates: dict | None = None):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.limiter = RateLimiter(rates or {})
+        self.seconds = 0.0
+        for stage in stages:
+            stage.limiter = self.limiter
+
+    def _worker(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue, remaining: list, lock: threading.Lock):
+        while True:
+            wait_start = time.perf_counter()
+            item = inbox.get()
+            if item is _END:
+                # Devolve o marcador para as outras threads do estágio; a última a sair avisa o próximo estágio
+                inbox.put(_END)
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    outbox.put(_END)
+                return
+
+            if item.get("status"):
+                outbox.put(item)
+                continue
+
+            input_bytes = stage.metrics.start(item, time.perf_counter() - wait_start)
+            busy_start = time.perf_counter()
+            failed = False
+            try:
+                if stage.per_request or not stage.host:
+                    stage.fn(item)
+                else:
+                    stage.call(lambda: stage.fn(item), item)
+                item[f"{stage.name}_seconds"] = time.perf_counter() - busy_start
+            except Exception as e:
+                failed = True
+                item.update(status="falha", error=f"{stage.name}: {e}", df=None)
+                print(f"🔥 Falha no estágio '{stage.name}' para {item['ticker']}: {e}")
+            stage.metrics.finish(item, input_bytes, time.perf_counter() - busy_start, failed)
+            outbox.put(item)
+
+    def run(self, tickers: Iterable[str]) -> Iterator[dict]:
+        """Processa os tickers e gera o relatório de cada um assim que ele sai do último estágio."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+        for stage, inbox, outbox in zip(self.stages, queues, queues[1:]):
+            remaining, lock = [stage.workers], threading.Lock()
+            for i in range(stage.workers):
+                threads.append(threading.Thread(target=self._worker, args=(stage, inbox, outbox, remaining, lock),
+                                                name=f"etl-{stage.name}-{i}", daemon=True))
+
+        def _feed():
+            for ticker in tickers:
+                queues[0].put({"ticker": ticker, "df": None, "status": None, "rows": 0, "attempts": 0,
+                               "error": None, "min_date": None, "full_history": False})
+            queues[0].put(_END)
+
+        threads.append(threading.Thread(target=_feed, name="etl-feed", daemon=True))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        while (item := queues[-1].get()) is not _END:
+            item.pop("df", None)
+            item["status"] = item["status"] or "ok"
+            yield item
+        self.seconds = time.perf_counter() - start
+
+    def print_metrics(self):
+        """Imprime as métricas de cada estágio e o pico de memória do processo."""
+        print("\n--- Métricas do Pipeline ---")
+        for stage in self.stages:
+            m = stage.metrics.as_dict()
+            print(f"  {m['stage']:<10} itens={m['items']:<4} erros={m['errors']:<3} "
+                  f"linhas {m['rows_in']:>8} → {m['rows_out']:<8} ocupado={m['busy_seconds']:7.1f}s "
+                  f"espera={m['wait_seconds']:7.1f}s pico={m['peak_mb']:.1f} MB")
+        if resource is None:
+            print(f"  Tempo total: {self.seconds:.1f}s")
+            return
+        # ru_maxrss é em KB no Linux e em bytes no macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+        print(f"  Tempo total: {self.seconds:.1f}s | Pico de memória do processo: {max_rss:.0f} MB")
+
+
+# --- Estágios padrão do ETL de 'acoes_historico' ---
+
+def extract_stage(start_dates: dict | None = None, period: str = "max", auto_adjust: bool = False,
+                  workers: int = 1, last_dates: dict | None = None) -> Stage:
+    """
+    Baixa o histórico (ou só a partir de start_dates[ticker], na carga incremental). Se o trecho
+    incremental trouxer um evento corporativo posterior a last_dates[ticker], o ajuste de todo o
+    histórico anterior do ticker muda, então o histórico completo dele é baixado de novo
+    (item['full_history']) e regravado pelo estágio de carga.
+    """
+    start_dates = start_dates or {}
+    last_dates = last_dates or {}
+
+    def _extract(item):
+        ticker = item["ticker"]
+        start_date = start_dates.get(ticker)
+        item["df"] = extract_data(ticker, start_date=start_date, period=period, auto_adjust=auto_adjust)
+        if start_date and has_new_actions(item["df"], last_dates.get(ticker)):
+            print(f"🔄 Novo evento corporativo para {ticker}; recalculando o histórico completo do ticker.")
+            item["df"] = extract_data(ticker, period=period, auto_adjust=auto_adjust, refresh=True)
+            item["full_history"] = True
+        if item["df"].empty:
+            item.update(status="sem_dados", df=None)
+
+    return Stage("extract", _extract, workers=workers, host="yfinance", attempts=3)
+
+
+def transform_stage(max_rows: int | None = None, start_dates: dict | None = None) -> Stage:
+    """
+    Padroniza as colunas e calcula o fechamento ajustado; na carga completa (sem data inicial ou com
+    o histórico recalculado), mantém só os últimos 'max_rows' pregões.
+    """
+    start_dates = start_dates or {}
+
+    def _transform(item):
+        df = transform_data(item["df"])
+        if max_rows and (not start_dates.get(item["ticker"]) or item.get("full_history")):
+            df = df.tail(max_rows)
+        if df.empty:
+            item.update(status="sem_dados", df=None)
+            return
+        item["df"] = df
+        item["min_date"] = df["date"].min()
+
+    return Stage("transform", _transform)
+
+
+def load_stage(supabase, replace: bool = False, workers: int = 1) -> Stage:
+    """
+    Grava em lotes com upsert e atualiza o catálogo. O histórico do ticker é apagado antes se
+    replace=True ou se ele foi recalculado por completo após um evento corporativo. Cada requisição
+    (o delete, cada lote e as do catálogo) passa pelo limitador do Supabase, e só o delete e os lotes
+    são repetidos em caso de falha.
+    """
+
+    def _load(item):
+        if replace or item.get("full_history"):
+            stage.call(lambda: supabase.table("acoes_historico").delete().eq("ticker", item["ticker"]).execute(), item)
+        item["rows"] = bulk_upsert(supabase, item["df"], attempts=stage.attempts, base_delay=stage.base_delay,
+                                   limiter=stage.limiter, record=item)["rows"]
+        update_ticker_catalog(supabase, item["ticker"], limiter=stage.limiter)
+        item["df"] = None
+
+    stage = Stage("load", _load, workers=workers, host="supabase", attempts=3, per_request=True)
+    return stage
+
+
+def run_etl(tickers: list, supabase, stages: list, source: str, queue_size: int = 4,
+            rates: dict | None = None) -> list:
+    """
+    Executa o pipeline, atualiza o resumo diário e publica a nova versão dos dados uma única vez ao fim,
+    imprime o relatório por ticker e as métricas por estágio e retorna o relatório.
+    """
+    # rates=None usa os limites padrão; um dict vazio significa nenhum limite (ex: reprodução offline)
+    rates = DEFAULT_RATES if rates is None else rates
+    pipeline = Pipeline(stages, queue_size=queue_size, rates=rates)
+    report = []
+    for item in pipeline.run(tickers):
+        if item["status"] == "ok":
+            print(f"✅ {item['ticker']}: {item['rows']} registros gravados.")
+        report.append(item)
+
+    loaded = [r for r in report if r["status"] == "ok" and r["rows"]]
+    if loaded:
+        update_market_daily_summary(supabase, since_date=min(r["min_date"] for r in loaded), limiter=pipeline.limiter)
+        bump_dataset_version(supabase, source=source, limiter=pipeline.limiter)
+
+    order = {ticker: i for i, ticker in enumerate(tickers)}
+    report.sort(key=lambda r: order[r["ticker"]])
+    print_report(report)
+    pipeline.print_metrics()
+    return report
+
+
+def print_report(report: list):
+    """Imprime o relatório final por ticker."""
+    sucessos = [r for r in report if r["status"] == "ok"]
+    falhas = [r for r in report if r["status"] != "ok"]
+    print("\n--- Relatório Final ---")
+    print(f"Total de tickers processados: {len(report)}")
+    print(f"✅ Sucessos: {len(sucessos)} ({sum(r['rows'] for r in sucessos)} registros)")
+    print(f"❌ Falhas: {len(falhas)}")
+    for r in falhas:
+        print(f"  - {r['ticker']}: {r['status']} ({r['error'] or 'sem detalhes'}, {r['attempts']} tentativas)")
+    print("--- Fim da Execução ---")
@@ -0,0 +1,133 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# --- Cache local das respostas brutas do provedor ---
+# Cada download do yfinance é gravado como Parquet comprimido em 'objects/<sha256 do conteúdo>.parquet'
+# (endereçado pelo conteúdo: respostas idênticas ocupam um único arquivo) e referenciado por
+# 'refs/<sha256 dos parâmetros>.json', que guarda os parâmetros da requisição e quando ela foi feita.
+#
+# Modos (ETL_RAW_CACHE):
+#   on      - usa a resposta em cache se ainda estiver fresca; senão baixa e grava (padrão)
+#   refresh - sempre baixa e grava
+#   offline - só lê do cache, sem acesso à rede (uma ausência vira DataFrame vazio)
+#   off     - não lê nem grava
+#
+# Regras de frescor (modo 'on'): downloads com data final explícita no passado não expiram; os demais
+# ("até hoje") expiram após ETL_RAW_CACHE_TTL_HOURS horas.
+CACHE_DIR = Path(os.getenv("ETL_RAW_CACHE_DIR", Path(__file__).resolve().parent / ".cache" / "raw"))
+CACHE_MODE = os.getenv("ETL_RAW_CACHE", "on")
+TTL_HOURS = float(os.getenv("ETL_RAW_CACHE_TTL_HOURS", "12"))
+MODES = ("on", "refresh", "offline", "off")
+
+
+class RawCache:
+    """Cache de respostas brutas do provedor, indexado pelos parâmetros e armazenado pelo conteúdo."""
+
+    def __init__(self, root: Path = CACHE_DIR, mode: str = CACHE_MODE, ttl_hours: float = TTL_HOURS):
+        self.root = Path(root)
+        self.ttl_seconds = ttl_hours * 3600
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.set_mode(mode)
+
+    def set_mode(self, mode: str):
+        if mode not in MODES:
+            raise ValueError(f"Modo de cache inválido: {mode}. Use um destes: {', '.join(MODES)}.")
+        self.mode = mode
+
+    @staticmethod
+    def request_key(params: dict) -> str:
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _ref_path(self, key: str) -> Path:
+        return self.root / "refs" / f"{key}.json"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / f"{digest}.parquet"
+
+    def _is_fresh(self, ref: dict) -> bool:
+        if self.mode == "offline":
+            return True
+        end = ref["params"].get("end")
+        if end and pd.Timestamp(end).date() < pd.Timestamp.now().date():
+            return True
+        return time.time() - ref["fetched_at"] < self.ttl_seconds
+
+    def read(self, params: dict) -> pd.DataFrame | None:
+        """Resposta em cache para os parâmetros, ou None se não houver (ou não estiver fresca)."""
+        ref_path = self._ref_path(self.request_key(params))
+        if not ref_path.exists():
+            return None
+        ref = json.loads(ref_path.read_text())
+        if not self._is_fresh(ref):
+            return None
+        object_path = self._object_path(ref["object"])
+        if not object_path.exists():
+            return None
+        return pd.read_parquet(object_path)
+
+    def write(self, params: dict, df: pd.DataFrame):
+        """Grava a resposta como Parquet comprimido endereçado pelo conteúdo e atualiza a referência."""
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, compression="zstd")
+        content = buffer.getvalue()
+        digest = hashlib.sha256(content).hexdigest()
+
+        object_path = self._object_path(digest)
+        ref_path = self._ref_path(self.request_key(params))
+        with self._lock:
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            ref_path.parent.mkdir(parents=True, exist_ok=True)
+            if not object_path.exists():
+                tmp_path = object_path.with_suffix(".tmp")
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, object_path)
+            ref = {"params": params, "object": digest, "fetched_at": time.time(), "rows": len(df)}
+            tmp_path = ref_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(ref, default=str))
+            os.replace(tmp_path, ref_path)
+
+    def fetch(self, params: dict, download, refresh: bool = False) -> pd.DataFrame:
+        """
+        Retorna a resposta para 'params' conforme o modo: do cache, ou chamando download() e gravando.
+        Com refresh=True, ignora a resposta em cache no modo 'on' (como no modo 'refresh').
+        Respostas vazias não são gravadas (podem ser falhas temporárias do provedor).
+        """
+        if self.mode == "offline" or (self.mode == "on" and not refresh):
+            cached = self.read(params)
+            if cached is not None:
+                with self._lock:
+                    self.hits += 1
+                return cached
+            if self.mode == "offline":
+                with self._lock:
+                    self.misses += 1
+                print(f"⚠️  Sem resposta em cache para {params.get('ticker')} (modo offline).")
+                return pd.DataFrame()
+
+        with self._lock:
+            self.misses += 1
+        df = download()
+        if self.mode != "off" and not df.empty:
+            self.write(params, df)
+        return df
+
+    def cached_tickers(self, **params) -> list:
+        """Tickers com resposta em cache cujos parâmetros incluem 'params' (ex: period="5y")."""
+        tickers = set()
+        for ref_path in (self.root / "refs").glob("*.json"):
+            ref_params = json.loads(ref_path.read_text())["params"]
+            if all(ref_params.get(k) == v for k, v in params.items()):
+                tickers.add(ref_params["ticker"])
+        return sorted(tickers)
+
+
+raw_cache = RawCache()
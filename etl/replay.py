@@ -0,0 +1,62 @@
+import argparse
+
+from raw_cache import raw_cache
+from local_store import LocalSupabase
+from pipeline import run_etl, extract_stage, transform_stage, load_stage
+
+# --- Reprodução offline do ETL ---
+# Roda o pipeline completo (extração, transformação e carga) a partir das respostas brutas guardadas
+# em etl/raw_cache.py, gravando em um LocalSupabase em memória. Não acessa o yfinance nem o Supabase,
+# então serve para depurar transformações, medir o pipeline e repetir uma carga de forma determinística.
+
+
+def replay_etl(tickers: list | None = None, period: str = "5y", auto_adjust: bool = False,
+               max_rows: int | None = None, workers: int = 1, output_dir: str | None = None):
+    """
+    Executa o pipeline em modo offline sobre o cache de respostas brutas.
+
+    Args:
+        tickers (list | None): Tickers a reproduzir (padrão: todos com resposta em cache para 'period').
+        period / auto_adjust: Devem coincidir com os da carga que preencheu o cache
+                              (extracao.py usa "5y" e main_etl.py usa "max", ambos sem ajuste).
+        max_rows (int | None): Mantém só os últimos 'max_rows' pregões de cada ticker (como main_etl.py).
+        workers (int): Threads de extração e de carga.
+        output_dir (str | None): Se informado, grava as tabelas resultantes como Parquet nesse diretório.
+
+    Returns:
+        tuple: (relatório por ticker, LocalSupabase com as tabelas carregadas).
+    """
+    raw_cache.set_mode("offline")
+    tickers = tickers or raw_cache.cached_tickers(period=period, auto_adjust=auto_adjust)
+    if not tickers:
+        print(f"⚠️ Nenhuma resposta em cache para period={period}, auto_adjust={auto_adjust}.")
+        return [], None
+
+    print(f"🔁 Reproduzindo o ETL offline para {len(tickers)} tickers a partir de {raw_cache.root}...")
+    store = LocalSupabase()
+    stages = [
+        extract_stage(period=period, auto_adjust=auto_adjust, workers=workers),
+        transform_stage(max_rows=max_rows),
+        load_stage(store, replace=True, workers=workers),
+    ]
+    # Sem limite de taxa: nenhuma chamada sai da máquina
+    report = run_etl(tickers, store, stages, source="replay.py", queue_size=max(workers, 1), rates={})
+    print(f"📁 Cache: {raw_cache.hits} respostas lidas, {raw_cache.misses} ausentes.")
+
+    if output_dir:
+        store.dump(output_dir)
+        print(f"💾 Tabelas gravadas em {output_dir}.")
+    return report, store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproduz o ETL a partir do cache local, sem rede.")
+    parser.add_argument("tickers", nargs="*", help="Tickers a reproduzir (padrão: todos em cache).")
+    parser.add_argument("--period", default="5y")
+    parser.add_argument("--auto-adjust", action="store_true")
+    parser.add_argument("--max-rows", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--saida", default=None, help="Diretório onde gravar as tabelas resultantes (Parquet).")
+    args = parser.parse_args()
+
+    replay_etl(args.tickers, args.period, args.auto_adjust, args.max_rows, args.workers, args.saida)
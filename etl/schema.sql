@@ -0,0 +1,49 @@
+-- Tabelas auxiliares mantidas pelo ETL, além de 'acoes_historico'.
+-- Execute no editor SQL do Supabase.
+
+-- Versão do conjunto de dados: atualizada ao fim de cada carga (etl/dataset_version.py).
+-- O backend compara essa versão para invalidar caches e ressincronizar o armazenamento local.
+create table if not exists etl_dataset_version (
+    id smallint primary key,
+    version bigint not null,
+    source text,
+    updated_at timestamptz not null default now()
+);
+
+-- Catálogo de tickers: uma linha por ticker, atualizada após cada carga (etl/catalog.py).
+-- Evita varrer 'acoes_historico' inteira para listar os tickers disponíveis.
+create table if not exists ticker_catalog (
+    ticker text primary key,
+    first_date date not null,
+    last_date date not null,
+    row_count integer not null,
+    updated_at timestamptz not null default now()
+);
+
+-- Resumo diário do mercado: agregados por pregão, recalculados incrementalmente a partir da
+-- data mais antiga de cada carga (etl/market_summary.py).
+create table if not exists market_daily_summary (
+    date date primary key,
+    total_volume_financeiro double precision not null,
+    total_volume bigint not null,
+    tickers_count integer not null,
+    advancers integer not null,
+    decliners integer not null,
+    unchanged integer not null,
+    updated_at timestamptz not null default now()
+);
+
+-- Chave natural de 'acoes_historico': permite a carga incremental com upsert sobre (ticker, date)
+-- (etl/load.py). Se houver duplicatas de cargas antigas, remova-as antes de criar o índice:
+--   delete from acoes_historico a using acoes_historico b
+--   where a.ticker = b.ticker and a.date = b.date and a.ctid < b.ctid;
+create unique index if not exists acoes_historico_ticker_date_key on acoes_historico (ticker, date);
+
+-- Eventos corporativos e fechamento ajustado de 'acoes_historico' (etl/adjustments.py):
+-- 'close' é o fechamento bruto (já corrigido por desdobramentos pelo provedor), 'dividend' e
+-- 'split_ratio' são os eventos do pregão (0 quando não há) e 'adj_close' = close * adj_factor,
+-- recalculado pelo ETL para todo o histórico do ticker quando chega um evento novo.
+alter table acoes_historico add column if not exists adj_close double precision;
+alter table acoes_historico add column if not exists dividend double precision not null default 0;
+alter table acoes_historico add column if not exists split_ratio double precision not null default 0;
+alter table acoes_historico add column if not exists adj_factor double precision not null default 1;
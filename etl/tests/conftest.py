@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos do ETL se importam como irmãos (ex: 'from pipeline import run_etl'), como ao rodar de dentro de etl/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from pipeline import DEFAULT_RATES
+from raw_cache import raw_cache
+from replay import replay_etl
+
+TICKERS = ["ABEV3.SA", "ITUB4.SA", "PETR4.SA", "VALE3.SA"]
+ROWS = 300
+
+
+def _raw_history(seed: int) -> pd.DataFrame:
+    # Mesmo formato do yfinance sem ajuste automático
+    rng = np.random.default_rng(seed)
+    close = 20 + np.cumsum(rng.normal(0, 0.2, ROWS))
+    index = pd.date_range("2023-01-02", periods=ROWS, freq="B", tz="America/Sao_Paulo", name="Date")
+    return pd.DataFrame({
+        "Open": close, "High": close + 0.1, "Low": close - 0.1, "Close": close, "Adj Close": close,
+        "Volume": rng.integers(1_000, 10_000, ROWS), "Dividends": 0.0, "Stock Splits": 0.0,
+    }, index=index)
+
+
+def test_replay_runs_without_rate_limits(tmp_path, monkeypatch):
+    monkeypatch.setattr(raw_cache, "root", tmp_path)
+    for seed, ticker in enumerate(TICKERS):
+        raw_cache.write({"ticker": ticker, "period": "5y", "auto_adjust": False}, _raw_history(seed))
+
+    report, store = replay_etl(TICKERS)
+
+    assert [r["status"] for r in report] == ["ok"] * len(TICKERS)
+    assert len(store.to_frame("acoes_historico")) == ROWS * len(TICKERS)
+    # Cada ticker faz ao menos 3 requisições ao Supabase na carga (delete, upsert e catálogo); com os
+    # limites padrão, só a espera do limitador já somaria isto ao tempo ocupado do estágio de carga
+    throttled_seconds = 3 * len(TICKERS) / DEFAULT_RATES["supabase"]
+    assert sum(r["load_seconds"] for r in report) < throttled_seconds / 3
@@ -1,4 +1,5 @@
 import pandas as pd
+from adjustments import apply_adjustments
 
 def transform_data(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -23,13 +24,27 @@ def transform_data(df: pd.DataFrame) -> pd.DataFrame:
         'High': 'high',
         'Low': 'low',
         'Close': 'close',
-        'Volume': 'volume'
+        'Adj Close': 'adj_close',
+        'Volume': 'volume',
+        'Dividends': 'dividend',
+        'Stock Splits': 'split_ratio'
     }, inplace=True)
 
-    # 3. Selecionar apenas as colunas que vamos inserir no banco
-    # Removemos 'Dividends' e 'Stock Splits' que não estão na nossa tabela
-    columns_to_keep = ['date', 'open', 'high', 'low', 'close', 'volume', 'ticker']
-    df_transformed = df_transformed[columns_to_keep]
+    # 3. Selecionar apenas as colunas que vamos inserir no banco, mantendo os eventos corporativos
+    columns_to_keep = ['date', 'open', 'high', 'low', 'close', 'adj_close', 'volume', 'dividend', 'split_ratio', 'ticker']
+    df_transformed = df_transformed[[c for c in columns_to_keep if c in df_transformed.columns]].copy()
+    for column in ('dividend', 'split_ratio'):
+        if column not in df_transformed.columns:
+            df_transformed[column] = 0.0
+
+    # 'Adj Close' só vem quando a extração é feita sem ajuste automático: os preços são brutos e o
+    # fechamento ajustado é recalculado a partir dos dividendos (etl/adjustments.py). Com ajuste
+    # automático, o fechamento já vem ajustado.
+    if 'adj_close' in df_transformed.columns:
+        df_transformed = apply_adjustments(df_transformed)
+    else:
+        df_transformed['adj_factor'] = 1.0
+        df_transformed['adj_close'] = df_transformed['close']
 
     # 4. Formatar a data para o formato YYYY-MM-DD
     df_transformed['date'] = df_transformed['date'].dt.strftime('%Y-%m-%d')
@@ -58,11 +58,37 @@ interface QueryRequestBody {
   session_id: string;
 }
 
+// --- Leitura do stream SSE de /api/v1/query/stream (POST, por isso fetch em vez de EventSource) ---
+async function readQueryStream(
+  response: Response,
+  onEvent: (event: string, data: Record<string, unknown>) => void
+) {
+  const reader = response.body!.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    // Cada evento termina com uma linha em branco
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = block.match(/^event: (.*)$/m)?.[1];
+      const data = block.match(/^data: (.*)$/m)?.[1];
+      if (event && data) onEvent(event, JSON.parse(data));
+      boundary = buffer.indexOf('\n\n');
+    }
+  }
+}
+
 export default function Home() {
   const [query, setQuery] = useState('');
   const [messages, setMessages] = useState<Message[]>([]); // Armazena todo o chat
   const [sessionId, setSessionId] = useState<string>('');
   const [isLoading, setIsLoading] = useState(false);
+  const [toolStatus, setToolStatus] = useState<string | null>(null); // Ferramenta em execução pelo agente
 
   // Gera um ID de sessão único quando o componente é montado
   useEffect(() => {
@@ -87,7 +113,7 @@ export default function Home() {
     const containsKeyword = keywords.some(keyword => query.toLowerCase().includes(keyword));
     const tickerMatch = query.match(/([A-Z0-9]+\.SA)/i);
 
-    let apiEndpoint = `${API_BASE_URL}/api/v1/query`;
+    let apiEndpoint = `${API_BASE_URL}/api/v1/query/stream`;
     let requestBody: QueryRequestBody | null = { question: query, session_id: sessionId };
     let requestMethod = 'POST';
 
@@ -122,6 +148,42 @@ export default function Home() {
         throw new Error(errorData.detail || `Erro na API: ${response.statusText}`);
       }
 
+      if (requestMethod === 'POST') {
+        // Resposta do agente em streaming: a mensagem aparece e cresce à medida que os trechos chegam
+        let started = false;
+        const updateIaMessage = (update: (message: Message) => Message) => {
+          if (!started) {
+            started = true;
+            setMessages(prevMessages => [...prevMessages, update({ sender: 'ia', text: '' })]);
+          } else {
+            setMessages(prevMessages => [...prevMessages.slice(0, -1), update(prevMessages[prevMessages.length - 1])]);
+          }
+        };
+
+        await readQueryStream(response, (event, data) => {
+          if (event === 'tool-start') {
+            setToolStatus(String(data.tool));
+          } else if (event === 'tool-end') {
+            setToolStatus(null);
+          } else if (event === 'token') {
+            updateIaMessage(message => ({ ...message, text: message.text + data.text }));
+          } else if (event === 'done') {
+            const chartData = data.chart_data as ChartData | undefined;
+            const text = chartData ? chartData.analysis : String(data.answer ?? '');
+            const tickerMatchInAnswer = chartData ? null : text.match(/([A-Z0-9]+\.SA)/i);
+            updateIaMessage(message => ({
+              ...message,
+              text,
+              chartData: chartData ?? null,
+              realtimeTicker: tickerMatchInAnswer ? tickerMatchInAnswer[0].toUpperCase() : null,
+            }));
+          } else if (event === 'query-error') {
+            throw new Error(String(data.detail));
+          }
+        });
+        return;
+      }
+
       const data = await response.json();
       const iaMessage: Message = { sender: 'ia', text: '' };
 
@@ -154,6 +216,7 @@ export default function Home() {
       setMessages(prevMessages => [...prevMessages, errorMessage]);
     } finally {
       setIsLoading(false);
+      setToolStatus(null);
     }
   };
 
@@ -329,10 +392,10 @@ export default function Home() {
               generateChartConfig={generateChartConfig}
             />
           ))}
-           {isLoading && (
+           {isLoading && messages[messages.length - 1]?.sender !== 'ia' && (
             <div className="flex justify-start">
               <div className="p-4 rounded-lg bg-gray-700">
-                <p className="text-gray-400 italic">Analisando...</p>
+                <p className="text-gray-400 italic">{toolStatus ? `Consultando ${toolStatus}...` : 'Analisando...'}</p>
               </div>
             </div>
           )}
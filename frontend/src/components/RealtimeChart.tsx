@@ -14,6 +14,11 @@ type IntradayData = {
   labels: string[];
   price: number[];
   vwap: number[];
+  warning?: string; // A última atualização falhou; a série é a última recebida
+};
+
+type IntradayDelta = IntradayData & {
+  start: number;
 };
 
 const RealtimeChart = ({ ticker, isActive }: RealtimeChartProps) => {
@@ -25,42 +30,48 @@ const RealtimeChart = ({ ticker, isActive }: RealtimeChartProps) => {
   const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL;
 
   useEffect(() => {
-    // Se o gráfico não estiver ativo, não faça nada e limpe qualquer intervalo existente.
+    // Se o gráfico não estiver ativo, não faça nada (o stream anterior já foi fechado na limpeza do efeito).
     if (!isActive) {
       setStatus('Inativo');
       return;
     }
 
-    const fetchData = async () => {
-      setStatus('Carregando dados...');
-      try {
-        const response = await fetch(`${API_BASE_URL}/api/v1/intraday/${ticker}`);
-        
-        if (!response.ok) {
-          const errorData = await response.json();
-          throw new Error(errorData.detail || 'Erro ao buscar dados.');
-        }
+    // Stream SSE: a série completa chega uma vez ('snapshot') e depois só os candles novos ou alterados ('delta')
+    setStatus('Carregando dados...');
+    const source = new EventSource(`${API_BASE_URL}/api/v1/intraday/${ticker}/stream`);
 
-        const data: IntradayData = await response.json();
-        setChartData(data);
-        setStatus(`Dados para ${ticker} atualizados`);
-      } catch (error: unknown) { // Alterado de 'any' para 'unknown'
-        console.error("Erro no fetch:", error);
-        let errorMessageText = "Erro ao buscar dados.";
-        if (error instanceof Error) {
-          errorMessageText = `Erro: ${error.message}`;
-        }
-        setStatus(errorMessageText);
-      }
-    };
+    source.addEventListener('snapshot', (event) => {
+      const data: IntradayData = JSON.parse((event as MessageEvent).data);
+      setChartData({ labels: data.labels, price: data.price, vwap: data.vwap });
+      setStatus(data.warning ?? `Dados para ${ticker} atualizados`);
+    });
+
+    source.addEventListener('delta', (event) => {
+      const delta: IntradayDelta = JSON.parse((event as MessageEvent).data);
+      // Substitui os candles a partir de 'start' (o último pode ter sido alterado) e acrescenta os novos
+      setChartData(prev => ({
+        labels: [...prev.labels.slice(0, delta.start), ...delta.labels],
+        price: [...prev.price.slice(0, delta.start), ...delta.price],
+        vwap: [...prev.vwap.slice(0, delta.start), ...delta.vwap],
+      }));
+      setStatus(delta.warning ?? `Dados para ${ticker} atualizados`);
+    });
 
-    fetchData(); // Busca inicial
-    const intervalId = setInterval(fetchData, 60000); // Atualiza a cada 60 segundos
+    source.addEventListener('feed-error', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      setStatus(`Erro: ${data.error}`);
+    });
+
+    source.onerror = () => {
+      // O EventSource reconecta sozinho; ao reconectar o servidor envia um novo 'snapshot'
+      console.error(`Conexão do stream intraday de ${ticker} interrompida.`);
+      setStatus('Reconectando...');
+    };
 
-    // Limpa o intervalo quando o componente é desmontado OU quando se torna inativo
+    // Fecha o stream quando o componente é desmontado OU quando se torna inativo
     return () => {
-      console.log(`Limpando intervalo para o ticker: ${ticker}`);
-      clearInterval(intervalId);
+      console.log(`Fechando o stream para o ticker: ${ticker}`);
+      source.close();
     }
   }, [ticker, isActive]); // Re-executa o efeito se o ticker ou o estado de ativação mudar
 